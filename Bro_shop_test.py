@@ -1,12 +1,16 @@
 ﻿import os
+import copy
 import json
 import time
+import functools
+import hmac
 from datetime import datetime
 import pytz
 import unicodedata  # ← 正規化のために追加
 
 import gspread
-from flask import Flask, render_template, render_template_string, request, session, abort
+from flask import Flask, make_response, render_template, request, session, abort, g
+from jinja2 import FileSystemBytecodeCache
 import uuid
 from oauth2client.service_account import ServiceAccountCredentials
 
@@ -20,10 +24,43 @@ from linebot.exceptions import InvalidSignatureError
 from linebot.models import (
     MessageEvent, TextMessage, TextSendMessage, FlexSendMessage, PostbackEvent, PostbackAction
 )
+from linebot.models.send_messages import SendMessage
+
+import assets
+import change_feed
+import compression
+import conversation
+import dispatch
+import estimate_events
+import metrics
+import postal_index
+import quote_archive
+import quote_search
+import quote_store
+import tracing
+from metrics import InstrumentedProxy
+from sheets_quota import QuotaAwareProxy, budget_from_env, sheets_priority
+from ttl_cache import TTLCache
+from form_options import form_options
 
 app = Flask(__name__)
 app.secret_key = 'some_secret_key'  # セッションが必要
 
+# テンプレートのコンパイル結果をファイルに保存し、新しいワーカーでは再コンパイルしない
+# （JINJA_CACHE_DIR 未指定時は OS の一時ディレクトリ）
+JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR") or None
+if JINJA_CACHE_DIR:
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+# /static のファイルは ETag（Flask が付与）で再検証させつつ、一定時間はブラウザにキャッシュさせる
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = int(os.environ.get("STATIC_MAX_AGE", "3600"))
+
+# HTML・CSS・JS を gzip / Brotli で圧縮し、強い ETag で 304 を返す
+compression.init_app(app)
+# ビルド済みアセット（static/dist/、python assets.py build）の asset_url() と長期キャッシュ
+assets.init_app(app)
+
 # 正規化ユーティリティ（追加）
 def normalize_text(text):
     """
@@ -38,15 +75,30 @@ LINE_CHANNEL_SECRET = os.environ.get("LINE_CHANNEL_SECRET", "")
 LINE_CHANNEL_ACCESS_TOKEN = os.environ.get("LINE_CHANNEL_ACCESS_TOKEN", "")
 SERVICE_ACCOUNT_FILE = os.environ.get("GCP_SERVICE_ACCOUNT_JSON", "")
 SPREADSHEET_KEY = os.environ.get("SPREADSHEET_KEY", "")
+# 負荷試験用：LINE API の送信先（benchmarks/ 参照）
+LINE_API_ENDPOINT = os.environ.get("LINE_API_ENDPOINT", "https://api.line.me")
 
-line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
+# LINE API 呼び出しは /metrics で依存先ごとのレイテンシを計測する
+line_bot_api = InstrumentedProxy(LineBotApi(LINE_CHANNEL_ACCESS_TOKEN, endpoint=LINE_API_ENDPOINT), "line")
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
 
 
 # -----------------------
 # Google Sheets 接続
 # -----------------------
+# 1分あたりの読み書きクォータ（SHEETS_READ_QUOTA_PER_MIN / SHEETS_WRITE_QUOTA_PER_MIN）
+sheets_quota = budget_from_env()
+
+
 def get_gspread_client():
+    """
+    gspread クライアントを返す。
+    呼び出しはクォータ管理（待ち合わせ・429/5xx の再試行）と計測を経由する。
+    """
+    return QuotaAwareProxy(_authorize_gspread_client(), sheets_quota, (InstrumentedProxy,))
+
+
+def _authorize_gspread_client():
     """
     環境変数 SERVICE_ACCOUNT_FILE (JSONパス or JSON文字列) から認証情報を取り出し、
     gspread クライアントを返す
@@ -62,7 +114,22 @@ def get_gspread_client():
         "https://www.googleapis.com/auth/drive",
     ]
     credentials = ServiceAccountCredentials.from_json_keyfile_dict(service_account_dict, scope)
-    return gspread.authorize(credentials)
+    # Client → Spreadsheet → Worksheet の各呼び出しを計測する
+    return InstrumentedProxy(
+        gspread.authorize(credentials), "sheets", (gspread.Spreadsheet, gspread.Worksheet)
+    )
+
+
+def open_spreadsheet():
+    return get_gspread_client().open_by_key(SPREADSHEET_KEY)
+
+
+# 古い見積は月別シートへ移し、見積番号ごとに移動先のシートへ振り分ける（quote_archive.py）
+# （バックグラウンドの移動は start_background_jobs() で起動する）
+estimate_archive = quote_archive.QuoteArchive(open_spreadsheet)
+
+# 見積・カタログ請求の検索索引（書き込むたびに 1 行ずつ反映。/admin/search）
+search_index = quote_search.SearchIndex()
 
 
 def get_or_create_worksheet(sheet, title):
@@ -115,6 +182,7 @@ def write_to_spreadsheet_for_catalog(form_data: dict):
         form_data.get("other", ""),
     ]
     worksheet.append_row(new_row, value_input_option="USER_ENTERED")
+    search_index.index_catalog_request(new_row)
 
 
 # -----------------------
@@ -129,56 +197,10 @@ from PRICE_TABLE_2025 import (
 user_estimate_sessions = {}  # { user_id: {"step": n, "answers": {...}, "is_single": bool} }
 
 
-from PRICE_TABLE_2025 import PRICE_TABLE_GENERAL, PRICE_TABLE_STUDENT
-
-def calculate_estimate(estimate_data):
-    item_raw = estimate_data.get("item", "")
-    item = normalize_text(item_raw)
-    pattern_raw = estimate_data.get("pattern", "")
-    qty_text_raw = estimate_data.get("quantity", "")
-    user_type = estimate_data.get("user_type", "一般")
-
-    # ▼ パターン表記（パターンA → A）に変換
-    pattern = pattern_raw.replace("パターン", "").strip()
-
-    # ▼ 数量レンジの波ダッシュ表記に統一（～ → 〜）
-    qty_text = qty_text_raw.replace("～", "〜").strip()
-
-    # ▼ 数値換算マップ
-    quantity_map = {
-        "10〜19枚": 10, "20〜29枚": 20, "30〜39枚": 30,
-        "40〜49枚": 40, "50〜99枚": 50, "100枚以上": 100
-    }
-
-    quantity_value = quantity_map.get(qty_text, 1)
-
-    def get_quantity_range(qty):
-        if qty < 20:
-            return "10〜19枚"
-        elif qty < 30:
-            return "20〜29枚"
-        elif qty < 40:
-            return "30〜39枚"
-        elif qty < 50:
-            return "40〜49枚"
-        elif qty < 100:
-            return "50〜99枚"
-        else:
-            return "100枚以上"
-
-    quantity_range = get_quantity_range(quantity_value)
-
-    # ▼ 属性ごとにテーブル選択
-    price_table = PRICE_TABLE_STUDENT if user_type == "学生" else PRICE_TABLE_GENERAL
-
-    for row in price_table:
-        if row["item"] == item and row["pattern"] == pattern and row["quantity_range"] == quantity_range:
-            unit_price = row["unit_price"]
-            total_price = unit_price * quantity_value
-            return total_price, unit_price
-
-    # 見つからない場合
-    return 0, 0
+# 価格計算は pricing.py に集約（バッチ見積シミュレーションと共用）
+from pricing import calculate_estimate
+# 商品名の表記ゆれ・ボディ品番・画像は商品マスタで一元管理
+from products import PRODUCTS, get_product
 
 # -----------------------
 # ここからFlex Message定義
@@ -361,26 +383,13 @@ def flex_item_select():
 
     # 画像付きアイテムカテゴリ一覧
     now = datetime.now().strftime("%Y%m%d%H%M%S")
-    categories = [
-        ("Tシャツ系", [
-            ("ドライTシャツ", f"https://catalog-bot-zf1t.onrender.com/dry_tshirt.png?v={now}"),
-            ("ハイクオリティーTシャツ", f"https://catalog-bot-zf1t.onrender.com/high_quality_tshirt.png?v={now}"),
-            ("ドライロングTシャツ", f"https://catalog-bot-zf1t.onrender.com/dry_long_tshirt.png?v={now}"),
-            ("ドライポロシャツ", f"https://catalog-bot-zf1t.onrender.com/dry_polo.png?v={now}")
-        ]),
-        ("スポーツ系", [
-            ("ゲームシャツ", f"https://catalog-bot-zf1t.onrender.com/game_shirt.png?v={now}"),
-            ("ベースボールシャツ", f"https://catalog-bot-zf1t.onrender.com/baseball_shirt.png?v={now}"),
-            ("ストライプベースボールシャツ", f"https://catalog-bot-zf1t.onrender.com/stripe_baseball.png?v={now}"),
-            ("ストライプユニフォーム", f"https://catalog-bot-zf1t.onrender.com/stripe_uniform.png?v={now}")
-        ]),
-        ("トレーナー系", [
-            ("クールネックライトトレーナー", f"https://catalog-bot-zf1t.onrender.com/crew_trainer.png?v={now}"),
-            ("ジップアップライトトレーナー", f"https://catalog-bot-zf1t.onrender.com/zip_trainer.png?v={now}"),
-            ("フーディーライトトレーナー", f"https://catalog-bot-zf1t.onrender.com/hoodie_trainer.png?v={now}"),
-            ("バスケシャツ", f"https://catalog-bot-zf1t.onrender.com/basketball_shirt.png?v={now}")
-        ])
-    ]
+    # 商品マスタ（products.py）の並び順でカテゴリごとにまとめる
+    categories = {}
+    for product in PRODUCTS:
+        categories.setdefault(product.category, []).append(
+            (product.name, f"https://catalog-bot-zf1t.onrender.com/{product.thumbnail}?v={now}")
+        )
+    categories = list(categories.items())
     # 各カテゴリごとのBubble生成
     bubbles = [create_category_bubble(title, items) for title, items in categories]
 
@@ -400,6 +409,11 @@ def flex_pattern_select(product_name):
     patterns = ["A", "B", "C", "D", "E", "F"]
     bubbles = []
 
+    # 画像ファイル名は正規の商品名で作られているため、表記ゆれを解決してから使う
+    product = get_product(product_name)
+    if product:
+        product_name = product.name
+
     version = datetime.now().strftime("%Y%m%d%H%M%S")
 
     for p in patterns:
@@ -489,14 +503,44 @@ def flex_quantity():
 from datetime import datetime
 from linebot.models import FlexSendMessage
 
-def flex_estimate_result_with_image(estimate_data, total_price, unit_price, quote_number):
-    item_raw = estimate_data["item"]
-    item = normalize_text(item_raw)
-    pattern_raw = estimate_data.get("pattern", "")
+# 見積結果の画像は起動（デプロイ）ごとにバージョンを変え、LINE 側のキャッシュを更新させる
+ESTIMATE_IMAGE_VERSION = datetime.now().strftime("%Y%m%d%H%M%S")
+
+# 見積結果バブルの body.contents のうち、見積ごとに差し替える位置
+RESULT_QUOTE_NO_SLOT = 2     # 見積番号の行（box）
+RESULT_USER_TYPE_SLOT = 3
+RESULT_USAGE_DATE_SLOT = 4
+RESULT_QUANTITY_SLOT = 7
+RESULT_TOTAL_SLOT = 9
+RESULT_UNIT_PRICE_SLOT = 10
+
+
+class PrebuiltFlexMessage(SendMessage):
+    """
+    組み立て済みの JSON（dict）をそのまま送る Flex メッセージ。
+    FlexSendMessage のように dict → モデル → dict の変換をしない。
+    as_json_dict() の戻り値は雛形と入れ子の dict を共有するので、変更しないこと。
+    """
+
+    def __init__(self, alt_text, contents):
+        super().__init__()
+        self.type = "flex"
+        self.alt_text = alt_text
+        self.contents = contents
+        self._json = {"type": "flex", "altText": alt_text, "contents": contents}
+
+    def as_json_dict(self):
+        return self._json
+
+
+@functools.lru_cache(maxsize=256)
+def _estimate_result_skeleton(item_raw, pattern_raw):
+    """(商品, パターン) ごとの見積結果バブルの雛形（画像 URL・商品・パターンの行まで埋めたもの）"""
+    product = get_product(item_raw)
+    item = product.name if product else normalize_text(item_raw)
     pattern = pattern_raw.replace("パターン", "").strip()
 
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    image_url = f"https://catalog-bot-zf1t.onrender.com/{item}_{pattern}.png?v={timestamp}"
+    image_url = f"https://catalog-bot-zf1t.onrender.com/{item}_{pattern}.png?v={ESTIMATE_IMAGE_VERSION}"
     alt_text = f"{item}の見積結果"
 
     flex = {
@@ -518,7 +562,8 @@ def flex_estimate_result_with_image(estimate_data, total_price, unit_price, quot
                     "url": image_url,
                     "size": "full",
                     "aspectMode": "cover",
-                    "aspectRatio": "1:1"
+                    "aspectRatio": "1:1",
+                    "animated": False  # FlexSendMessage 経由と同じ JSON にする（SDK の既定値）
                 },
                 {
                     "type": "box",
@@ -526,17 +571,17 @@ def flex_estimate_result_with_image(estimate_data, total_price, unit_price, quot
                     "spacing": "sm",
                     "contents": [
                         {"type": "text", "text": "見積番号: ", "flex": 0},
-                        {"type": "text", "text": quote_number, "wrap": True, "color": "#0000FF"}
+                        {"type": "text", "text": "", "wrap": True, "color": "#0000FF"}
                     ]
                 },
-                {"type": "text", "text": f"属性: {estimate_data['user_type']}"},
-                {"type": "text", "text": f"使用日: {estimate_data['usage_date']}（{estimate_data['discount_type']}）"},
-                {"type": "text", "text": f"商品: {estimate_data['item']}"},
-                {"type": "text", "text": f"パターン: {estimate_data['pattern']}"},
-                {"type": "text", "text": f"枚数: {estimate_data['quantity']}"},
+                {"type": "text", "text": ""},  # 属性
+                {"type": "text", "text": ""},  # 使用日
+                {"type": "text", "text": f"商品: {item_raw}"},
+                {"type": "text", "text": f"パターン: {pattern_raw}"},
+                {"type": "text", "text": ""},  # 枚数
                 {"type": "separator"},
-                {"type": "text", "text": f"【合計金額】{total_price:,}", "weight": "bold"},
-                {"type": "text", "text": f"【1枚あたり】{unit_price:,}"},
+                {"type": "text", "text": "", "weight": "bold"},  # 合計金額
+                {"type": "text", "text": ""},  # 1枚あたり
                 {"type": "separator"},
                 {
                     "type": "text",
@@ -564,8 +609,28 @@ def flex_estimate_result_with_image(estimate_data, total_price, unit_price, quot
             ]
         }
     }
+    return alt_text, flex
+
+
+def flex_estimate_result_with_image(estimate_data, total_price, unit_price, quote_number):
+    alt_text, skeleton = _estimate_result_skeleton(estimate_data["item"], estimate_data.get("pattern", ""))
+
+    # 雛形は共有しているので、差し替える経路（bubble → body → contents → 該当の行）だけ複製する
+    body = skeleton["body"]
+    contents = list(body["contents"])
+    quote_row = contents[RESULT_QUOTE_NO_SLOT]
+    label, value = quote_row["contents"]
+    contents[RESULT_QUOTE_NO_SLOT] = {**quote_row, "contents": [label, {**value, "text": quote_number}]}
+    contents[RESULT_USER_TYPE_SLOT] = {"type": "text", "text": f"属性: {estimate_data['user_type']}"}
+    contents[RESULT_USAGE_DATE_SLOT] = {
+        "type": "text", "text": f"使用日: {estimate_data['usage_date']}（{estimate_data['discount_type']}）"
+    }
+    contents[RESULT_QUANTITY_SLOT] = {"type": "text", "text": f"枚数: {estimate_data['quantity']}"}
+    contents[RESULT_TOTAL_SLOT] = {"type": "text", "text": f"【合計金額】{total_price:,}", "weight": "bold"}
+    contents[RESULT_UNIT_PRICE_SLOT] = {"type": "text", "text": f"【1枚あたり】{unit_price:,}"}
 
-    return FlexSendMessage(alt_text=alt_text, contents=flex)
+    flex = {**skeleton, "body": {**body, "contents": contents}}
+    return PrebuiltFlexMessage(alt_text=alt_text, contents=flex)
 
 
 # -----------------------
@@ -612,106 +677,132 @@ def flex_inquiry():
 # -----------------------
 # 0) ハンドラ側でキャッチして動的 URL を返す
 # -----------------------
-@handler.add(PostbackEvent)
-def handle_postback(event):
-    data = event.postback.data or ""
-
-    # --- デザイン相談 or 個別相談 選択時の応答 ---------------
-    if data == "CONSULT_DESIGN":
-        # セッション初期化
-        if event.source.user_id in user_estimate_sessions:
-            del user_estimate_sessions[event.source.user_id]
-
-        message = (
-            "有人チャットに接続いたします。\n"
-            "ご検討中のデザインがございましたら、画像やイラストなどの資料をお送りくださいませ。\n\n"
-            "※当ショップの営業時間は【10:00～19:00】でございます。\n"
-            "営業時間外にいただいたお問い合わせにつきましては、確認でき次第、順次ご対応させていただきます。\n"
-            "何卒ご理解賜りますようお願い申し上げます。\n\n"
-            "その他ご要望やご不明点がございましたら、お気軽にメッセージをお送りくださいませ。\n"
-            "どうぞよろしくお願いいたします。"
-        )
-        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=message))
-        return
+def trace_line_event(name):
+    """
+    Webhook イベント 1 件ごとにスパンを作り、user_id を付与するデコレータ
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(event):
+            # line-bot-sdk は引数の数で destination を渡すか判定するため event のみ受け取る
+            with tracing.start_span(name):
+                tracing.add_trace_attributes(user_id=getattr(event.source, "user_id", ""))
+                return func(event)
+        return wrapper
+    return decorator
+
+
+# ポストバック（data の完全一致・接頭辞で振り分け。種類ごとの件数・処理時間は /metrics）
+postbacks = dispatch.PostbackRegistry()
+
+# ▼ 固定の応答は起動時に 1 度だけ組み立てておく
+CONSULT_DESIGN_MESSAGE = TextSendMessage(text=(
+    "有人チャットに接続いたします。\n"
+    "ご検討中のデザインがございましたら、画像やイラストなどの資料をお送りくださいませ。\n\n"
+    "※当ショップの営業時間は【10:00～19:00】でございます。\n"
+    "営業時間外にいただいたお問い合わせにつきましては、確認でき次第、順次ご対応させていただきます。\n"
+    "何卒ご理解賜りますようお願い申し上げます。\n\n"
+    "その他ご要望やご不明点がございましたら、お気軽にメッセージをお送りくださいませ。\n"
+    "どうぞよろしくお願いいたします。"
+))
+
+CONSULT_PERSONAL_MESSAGE = TextSendMessage(text=(
+    "スタッフによるチャット対応を開始いたします。\n"
+    "ご検討中の商品について、金額やデザインに関するご質問がございましたら、こちらからお気軽にご相談ください。\n\n"
+    "※当ショップの営業時間は【10:00～19:00】です。\n"
+    "営業時間外にいただいたお問い合わせにつきましては、確認でき次第、順次ご対応させていただきます。\n"
+    "あらかじめご了承くださいませ。\n\n"
+    "そのほか、ご要望やご不明点がございましたら、メッセージにてお知らせください。\n"
+    "よろしくお願いいたします。"
+))
+
+# WEBフォーム注文ボタン（uri はユーザーごとに差し替える）
+WEB_ORDER_BUBBLE = {
+    "type": "bubble",
+    # バブルの背景はデフォルト（白）のまま
+    "body": {
+        "type": "box",
+        "layout": "vertical",
+        "paddingAll": "16px",
+        "spacing": "sm",
+        "contents": [
+            {
+                "type": "text",
+                "text": "WEBフォームでの注文を開く",
+                "weight": "bold",
+                "size": "lg",
+                "align": "center",
+                "wrap": True,
+                "color": "#000000"          # 見出しテキストは黒
+            },
+            {
+                "type": "button",
+                "style": "primary",          # primary にすると文字は自動で白
+                "color": "#000000",          # ボタン背景をピンク
+                "height": "sm",
+                "action": {
+                    "type": "uri",
+                    "label": "開く",
+                    "uri": ""  # ユーザーごとに差し替える
+                }
+            }
+        ]
+    }
+}
 
-    if data == "CONSULT_PERSONAL":
-        # セッション初期化
-        if event.source.user_id in user_estimate_sessions:
-            del user_estimate_sessions[event.source.user_id]
-
-        message = (
-            "スタッフによるチャット対応を開始いたします。\n"
-            "ご検討中の商品について、金額やデザインに関するご質問がございましたら、こちらからお気軽にご相談ください。\n\n"
-            "※当ショップの営業時間は【10:00～19:00】です。\n"
-            "営業時間外にいただいたお問い合わせにつきましては、確認でき次第、順次ご対応させていただきます。\n"
-            "あらかじめご了承くださいませ。\n\n"
-            "そのほか、ご要望やご不明点がございましたら、メッセージにてお知らせください。\n"
-            "よろしくお願いいたします。"
-        )
-        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=message))
-        return
-    
-    # --- 注文確定 --------------------------------------------------
-    if data.startswith("CONFIRM_ORDER:"):
-        order_no = data.split(":",1)[1]
-        ok = mark_order_confirmed(order_no)          # ← 次で定義
-        line_bot_api.reply_message(
-            event.reply_token,
-            TextSendMessage(text=f"注文番号 {order_no} を確定しました！担当スタッフから追って納期などの詳細をご連絡します。")
-        )
-        return
 
-    # --- 今は注文しない -------------------------------------------
-    if data.startswith("CANCEL_ORDER:"):
-        order_no = data.split(":",1)[1]
-        ok = mark_order_confirmed(order_no, cancel=True) 
-        line_bot_api.reply_message(
-            event.reply_token,
-            TextSendMessage(text="ご注文は保留のままとなりました。別の商品にて再検討される場合はカンタン見積もしくはWEBフォームから再開してください。")
-        )
-        return
-    
-    if event.postback.data == "WEB_ORDER":
-        uid  = event.source.user_id
-        url  = f"https://bro-shop-test.onrender.com/web_order_form?uid={uid}"
+# --- デザイン相談 or 個別相談 選択時の応答 ---------------
+@postbacks.exact("CONSULT_DESIGN")
+def consult_design(event, data):
+    # セッション初期化
+    user_estimate_sessions.pop(event.source.user_id, None)
+    line_bot_api.reply_message(event.reply_token, CONSULT_DESIGN_MESSAGE)
 
-        flex = {
-            "type": "bubble",
-            # バブルの背景はデフォルト（白）のまま
-            "body": {
-                "type": "box",
-                "layout": "vertical",
-                "paddingAll": "16px",
-                "spacing": "sm",
-                "contents": [
-                    {
-                        "type": "text",
-                        "text": "WEBフォームでの注文を開く",
-                        "weight": "bold",
-                        "size": "lg",
-                        "align": "center",
-                        "wrap": True,
-                        "color": "#000000"          # 見出しテキストは黒
-                    },
-                    {
-                        "type": "button",
-                        "style": "primary",          # primary にすると文字は自動で白
-                        "color": "#000000",          # ボタン背景をピンク
-                        "height": "sm",
-                        "action": {
-                            "type": "uri",
-                            "label": "開く",
-                            "uri": url
-                        }
-                    }
-                ]
-            }
-        }
 
-        line_bot_api.reply_message(
-            event.reply_token,
-            FlexSendMessage(alt_text="WEBフォーム", contents=flex)
-        )
+@postbacks.exact("CONSULT_PERSONAL")
+def consult_personal(event, data):
+    # セッション初期化
+    user_estimate_sessions.pop(event.source.user_id, None)
+    line_bot_api.reply_message(event.reply_token, CONSULT_PERSONAL_MESSAGE)
+
+
+# --- 注文確定 --------------------------------------------------
+@postbacks.prefix("CONFIRM_ORDER:")
+def confirm_order(event, data, order_no):
+    ok = mark_order_confirmed(order_no)          # ← 次で定義
+    line_bot_api.reply_message(
+        event.reply_token,
+        TextSendMessage(text=f"注文番号 {order_no} を確定しました！担当スタッフから追って納期などの詳細をご連絡します。")
+    )
+
+
+# --- 今は注文しない -------------------------------------------
+@postbacks.prefix("CANCEL_ORDER:")
+def cancel_order(event, data, order_no):
+    ok = mark_order_confirmed(order_no, cancel=True)
+    line_bot_api.reply_message(
+        event.reply_token,
+        TextSendMessage(text="ご注文は保留のままとなりました。別の商品にて再検討される場合はカンタン見積もしくはWEBフォームから再開してください。")
+    )
+
+
+@postbacks.exact("WEB_ORDER")
+def web_order(event, data):
+    uid  = event.source.user_id
+    url  = f"https://bro-shop-test.onrender.com/web_order_form?uid={uid}"
+
+    flex = copy.deepcopy(WEB_ORDER_BUBBLE)
+    flex["body"]["contents"][1]["action"]["uri"] = url
+    line_bot_api.reply_message(
+        event.reply_token,
+        FlexSendMessage(alt_text="WEBフォーム", contents=flex)
+    )
+
+
+@handler.add(PostbackEvent)
+@trace_line_event("line.postback")
+def handle_postback(event):
+    postbacks.dispatch(event, event.postback.data or "")
 
 
 # -----------------------
@@ -723,7 +814,8 @@ def line_callback():
     body = request.get_data(as_text=True)
 
     try:
-        handler.handle(body, signature)
+        with tracing.start_span("line.callback"):
+            handler.handle(body, signature)
     except InvalidSignatureError:
         abort(400, "Invalid signature. Please check your channel access token/channel secret.")
 
@@ -732,57 +824,78 @@ def line_callback():
 # -----------------------
 # 2) LINE上でメッセージ受信時
 # -----------------------
+# テキストメッセージのコマンド（完全一致は dict、部分一致はまとめて 1 回の走査）
+message_router = dispatch.CommandRouter()
+
+
+# 1) お問い合わせ対応
+@message_router.command("お問い合わせ", priority=True)
+def reply_inquiry(event: MessageEvent, user_message: str):
+    line_bot_api.reply_message(
+        event.reply_token,
+        flex_inquiry()
+    )
+
+
+# 2) 有人チャット
+@message_router.command("#有人チャット", priority=True)
+def start_human_chat(event: MessageEvent, user_message: str):
+    # セッションを初期化しておく
+    user_estimate_sessions.pop(event.source.user_id, None)
+
+    reply_text = (
+        "有人チャットに接続いたします。\n"
+        "ご検討中のデザインを画像やイラストでお送りください。\n\n"
+        "※当ショップの営業時間は10：00～18：00となります。\n"
+        "営業時間外のお問い合わせにつきましては確認ができ次第の回答となります。\n"
+        "誠に恐れ入りますが、ご了承くださいませ。\n\n"
+        "その他ご要望などがございましたらメッセージでお送りくださいませ。\n"
+        "よろしくお願い致します。"
+    )
+    line_bot_api.reply_message(
+        event.reply_token,
+        TextSendMessage(text=reply_text)
+    )
+
+
+# 見積りフロー開始
+@message_router.command("カンタン見積り")
+def start_estimate(event: MessageEvent, user_message: str):
+    with tracing.start_span("estimate.start"):
+        start_estimate_flow(event)
+
+
+# カタログ案内
+@message_router.keyword("キャンペーン", "catalog")
+def reply_catalog_info(event: MessageEvent, user_message: str):
+    send_catalog_info(event)
+
+
 @handler.add(MessageEvent, message=TextMessage)
+@trace_line_event("line.message")
 def handle_message(event: MessageEvent):
     user_id = event.source.user_id
     user_message = event.message.text.strip()
+    command_key = message_router.normalize(user_message)
 
-    # 1) お問い合わせ対応
-    if user_message == "お問い合わせ":
-        line_bot_api.reply_message(
-            event.reply_token,
-            flex_inquiry()
-        )
+    # お問い合わせ・有人チャットは見積りフロー中でも優先する
+    command = message_router.route_priority(command_key)
+    if command is not None:
+        command(event, user_message)
         return
 
-    # 2) 有人チャット
-    if user_message == "#有人チャット":
-        # セッションを初期化しておく
-        if user_id in user_estimate_sessions:
-            del user_estimate_sessions[user_id]
-
-        reply_text = (
-            "有人チャットに接続いたします。\n"
-            "ご検討中のデザインを画像やイラストでお送りください。\n\n"
-            "※当ショップの営業時間は10：00～18：00となります。\n"
-            "営業時間外のお問い合わせにつきましては確認ができ次第の回答となります。\n"
-            "誠に恐れ入りますが、ご了承くださいませ。\n\n"
-            "その他ご要望などがございましたらメッセージでお送りくださいませ。\n"
-            "よろしくお願い致します。"
-        )
-        line_bot_api.reply_message(
-            event.reply_token,
-            TextSendMessage(text=reply_text)
-        )
-        return
-
-    # すでに見積りフロー中かどうか
-    if user_id in user_estimate_sessions and user_estimate_sessions[user_id]["step"] > 0:
-        process_estimate_flow(event, user_message)
+    # すでに見積りフロー中かどうか（フローには入力そのままを渡す）
+    session_data = user_estimate_sessions.get(user_id)
+    if session_data is not None and session_data["step"] > 0:
+        with tracing.start_span("estimate.step", step=session_data["step"]):
+            process_estimate_flow(event, user_message)
         return
 
-    # 見積りフロー開始
-    if user_message == "カンタン見積り":
-        start_estimate_flow(event)
-        return
-
-    # カタログ案内
-    if "キャンペーン" in user_message or "catalog" in user_message.lower():
-        send_catalog_info(event)
-        return
+    command = message_router.route(command_key)
+    if command is not None:
+        command(event, user_message)
 
     # その他のメッセージはスルー
-    return
 
 
 def send_catalog_info(event: MessageEvent):
@@ -813,145 +926,108 @@ def send_catalog_info(event: MessageEvent):
 # -----------------------
 def start_estimate_flow(event: MessageEvent):
     user_id = event.source.user_id
-    user_estimate_sessions[user_id] = {
-        "step": 1,
-        "answers": {},
-        "is_single": False
-    }
+    session_data, state = conversation_flows.start("estimate", is_single=False)
+    user_estimate_sessions[user_id] = session_data
+    estimate_log.emit(estimate_events.START, user_id)
 
     line_bot_api.reply_message(
         event.reply_token,
-        flex_user_type()
+        state.prompt(session_data["answers"])
     )
 
-ITEM_TO_BODY_CODE = {
-    "ゲームシャツ": "5927-01",
-    "ベースボールシャツ": "5982-01",
-    "ストライプベースボールシャツ": "5982-01",
-    "ストライプユニフォーム": "ZD16",
-    "バスケシャツ": "5992-01",
-    "ドライTシャツ": "300-ACT",
-    "ハイクオリティーTシャツ": "5001-01",
-    "ドライポロシャツ": "302-ADP",
-    "ドライロングTシャツ": "304-ALT",
-    "クールネックライトトレーナー": "219-MLC",
-    "ジップアップライトトレーナー": "217-MLZ",
-    "フーディーライトトレーナー": "216-MLH"   # 例：実際の型番を追記する必要あり
-}
+# 商品名 → ボディ品番（正規名のみ。表記ゆれは get_product() で解決する）
+ITEM_TO_BODY_CODE = {p.name: p.body_code for p in PRODUCTS}
 
+ESTIMATE_PATTERNS = ("パターンA", "パターンB", "パターンC", "パターンD", "パターンE", "パターンF")
+ESTIMATE_QUANTITIES = ("10～19枚", "20～29枚", "30～39枚", "40～49枚", "50～99枚", "100枚以上")
+ESTIMATE_ERROR_TEXT = "入力内容に誤りがあります。もう一度「カンタン見積り」からやり直してください。"
 
 
-def process_estimate_flow(event: MessageEvent, user_message: str):
-    user_id = event.source.user_id
-    if user_id not in user_estimate_sessions:
-        return
+def _resolve_product_name(user_message):
+    # 表記ゆれを正規の商品名にそろえて保存する
+    product = get_product(user_message)
+    return product.name if product else None
 
-    session_data = user_estimate_sessions[user_id]
-    step = session_data["step"]
-
-    if step == 1:
-        if user_message in ["学生", "一般"]:
-            session_data["answers"]["user_type"] = user_message
-            session_data["step"] = 2
-            line_bot_api.reply_message(event.reply_token, flex_usage_date())
-        else:
-            del user_estimate_sessions[user_id]
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text="入力内容に誤りがあります。もう一度「カンタン見積り」からやり直してください。"))
-        return
 
-    elif step == 2:
-        if user_message in ["14日目以降", "14日目以内"]:
-            session_data["answers"]["usage_date"] = user_message
-            session_data["answers"]["discount_type"] = "早割" if user_message == "14日目以降" else "通常"
-            session_data["step"] = 3
-            line_bot_api.reply_message(event.reply_token, flex_item_select())
-        else:
-            del user_estimate_sessions[user_id]
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text="入力内容に誤りがあります。もう一度「カンタン見積り」からやり直してください。"))
-        return
+def complete_estimate(event: MessageEvent, user_id: str, est_data: dict):
+    with tracing.start_span("estimate.calculate"):
+        total_price, unit_price = calculate_estimate(est_data)
+    estimate_log.emit(estimate_events.COMPLETE, user_id, answers=est_data, amount=total_price)
 
-    elif step == 3:
-        valid_products = [
-            "ドライTシャツ", "ハイクオリティーTシャツ", "ドライロングTシャツ", "ドライポロシャツ",
-            "ゲームシャツ", "ベースボールシャツ", "ストライプベースボールシャツ", "ストライプユニフォーム",
-            "クールネックライトトレーナー", "ジップアップライトトレーナー", "フーディーライトトレーナー", "バスケシャツ"
-        ]
-        if user_message in valid_products:
-            session_data["answers"]["item"] = user_message
-            session_data["step"] = 4
-            line_bot_api.reply_message(event.reply_token, flex_pattern_select(user_message))
-        else:
-            del user_estimate_sessions[user_id]
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text="入力内容に誤りがあります。もう一度「カンタン見積り」からやり直してください。"))
-        return
+    # ▼ 見積番号とフォームURL生成
+    quote_number = str(int(time.time()))
+    tracing.add_trace_attributes(quote_no=quote_number)
+    form_url = f"https://bro-shop-test.onrender.com/quotation_form?quote_no={quote_number}"
 
-    elif step == 4:
-        valid_patterns = ["パターンA", "パターンB", "パターンC", "パターンD", "パターンE", "パターンF"]
-        if user_message in valid_patterns:
-            session_data["answers"]["pattern"] = user_message
-            session_data["step"] = 5
-            line_bot_api.reply_message(event.reply_token, flex_quantity())
-        else:
-            del user_estimate_sessions[user_id]
-            line_bot_api.reply_message(event.reply_token, TextSendMessage(text="入力内容に誤りがあります。もう一度「カンタン見積り」からやり直してください。"))
-        return
+    # ▼ 書き込み用form_dataに変換
+    form_data = {
+        "quote_no": quote_number,
+        "user_id": user_id,
+        "attribute": est_data["user_type"],
+        "usage_date": f"{est_data['usage_date']}({est_data['discount_type']})",
+        "product_category": est_data["item"],
+        "pattern": est_data["pattern"],
+        "quantity": est_data["quantity"],
+        "total_price": total_price,   # ←文字列にせず数値で渡す
+        "unit_price": unit_price,
+        "print_position": "",  # オプション未使用
+        "print_color": "",  # オプション未使用
+        "print_size": "",  # オプション未使用
+        "print_design": "",  # オプション未使用
+        "form_url": form_url,
+        "body_name": est_data["item"],  # カンタン見積で選ばれた商品名
+        "body_code": get_product(est_data["item"]).body_code,
+    }
 
-    elif step == 5:
-        valid_choices = ["10～19枚", "20～29枚", "30～39枚", "40～49枚", "50～99枚", "100枚以上"]
-        if user_message in valid_choices:
-            session_data["answers"]["quantity"] = user_message
-            session_data["step"] = 6
-            est_data = session_data["answers"]
-            total_price, unit_price = calculate_estimate(est_data)
-
-            # ▼ 見積番号とフォームURL生成
-            quote_number = str(int(time.time()))
-            form_url = f"https://bro-shop-test.onrender.com/quotation_form?quote_no={quote_number}"
-
-            # ▼ 書き込み用form_dataに変換
-            form_data = {
-                "quote_no": quote_number,
-                "user_id": user_id,
-                "attribute": est_data["user_type"],
-                "usage_date": f"{est_data['usage_date']}({est_data['discount_type']})",
-                "product_category": est_data["item"],
-                "pattern": est_data["pattern"],
-                "quantity": est_data["quantity"],
-                "total_price": total_price,   # ←文字列にせず数値で渡す
-                "unit_price": unit_price,
-                "print_position": "",  # オプション未使用
-                "print_color": "",  # オプション未使用
-                "print_size": "",  # オプション未使用
-                "print_design": "",  # オプション未使用
-                "form_url": form_url,
-                "body_name": est_data["item"],  # カンタン見積で選ばれた商品名
-                "body_name": est_data["item"],
-                "body_code": ITEM_TO_BODY_CODE.get(est_data["item"], ""),
-            }
+    # ▼ 統合スプレッドシート書き込み
+    write_to_quotation_spreadsheet(form_data)
 
-            # ▼ 統合スプレッドシート書き込み
-            write_to_quotation_spreadsheet(form_data)
+    # ▼ Flex メッセージ送信
+    with tracing.start_span("estimate.build_result"):
+        flex_msg = flex_estimate_result_with_image(est_data, total_price, unit_price, quote_number)
+    line_bot_api.reply_message(event.reply_token, flex_msg)
 
-            # ▼ Flex メッセージ送信
-            flex_msg = flex_estimate_result_with_image(est_data, total_price, unit_price, quote_number)
-            line_bot_api.reply_message(event.reply_token, flex_msg)
 
-            del user_estimate_sessions[user_id]
-        else:
-            del user_estimate_sessions[user_id]
-            line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text="入力内容に誤りがあります。もう一度「カンタン見積り」からやり直してください。")
-            )
+# ▼ 見積りフローの定義（上から順に質問する）
+ESTIMATE_FLOW = conversation.Flow("estimate", [
+    conversation.State("user_type", ["学生", "一般"], lambda answers: flex_user_type()),
+    conversation.State(
+        "usage_date", ["14日目以降", "14日目以内"], lambda answers: flex_usage_date(),
+        derive={"discount_type": {"14日目以降": "早割", "14日目以内": "通常"}},
+    ),
+    conversation.State("item", _resolve_product_name, lambda answers: flex_item_select()),
+    conversation.State("pattern", ESTIMATE_PATTERNS, lambda answers: flex_pattern_select(answers["item"])),
+    conversation.State("quantity", ESTIMATE_QUANTITIES, lambda answers: flex_quantity()),
+], on_complete=complete_estimate)
 
-    else:
-        del user_estimate_sessions[user_id]
-        line_bot_api.reply_message(
-            event.reply_token,
-            TextSendMessage(text="入力内容に誤りがあります。もう一度「カンタン見積り」からやり直してください。")
-        )
-    return
+conversation_flows = conversation.FlowRegistry([ESTIMATE_FLOW], default="estimate")
+
+# ▼ 見積りフローの遷移ログ（集計は /admin/stats）
+estimate_log = estimate_events.EventLog(fields=tuple(state.key for state in ESTIMATE_FLOW.states[1:]))
+estimate_stats = estimate_events.EventStats(estimate_log)
+
+
+def process_estimate_flow(event: MessageEvent, user_message: str):
+    user_id = event.source.user_id
+    session_data = user_estimate_sessions.get(user_id)
+    if session_data is None:
+        return
 
+    step = session_data["step"]  # 今回答えた質問の番号
+    outcome = conversation_flows.advance(session_data, user_message)
+    if outcome.kind == conversation.NEXT:
+        estimate_log.emit(estimate_events.ANSWER, user_id, step=step, answers=outcome.answers)
+        # 次の質問を送る
+        line_bot_api.reply_message(event.reply_token, outcome.state.prompt(outcome.answers))
+        return
+
+    del user_estimate_sessions[user_id]
+    if outcome.kind == conversation.DONE:
+        estimate_log.emit(estimate_events.ANSWER, user_id, step=step, answers=outcome.answers)
+        outcome.flow.on_complete(event, user_id, outcome.answers)
+    else:
+        estimate_log.emit(estimate_events.INVALID, user_id, step=step)
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(text=ESTIMATE_ERROR_TEXT))
 
 
 # -----------------------
@@ -962,113 +1038,12 @@ def show_catalog_form():
     token = str(uuid.uuid4())
     session['catalog_form_token'] = token
 
-    html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>カタログ申込フォーム</title>
-    <style>
-        body {{
-            margin: 0;
-            padding: 0;
-            font-family: sans-serif;
-        }}
-        .container {{
-            max-width: 600px; 
-            margin: 0 auto;
-            padding: 1em;
-        }}
-        label {{
-            display: block;
-            margin-bottom: 0.5em;
-        }}
-        input[type=text], input[type=email], textarea {{
-            width: 100%;
-            padding: 0.5em;
-            margin-top: 0.3em;
-            box-sizing: border-box;
-        }}
-        input[type=submit] {{
-            padding: 0.7em 1em;
-            font-size: 1em;
-            margin-top: 1em;
-        }}
-    </style>
-    <script>
-    async function fetchAddress() {{
-        let pcRaw = document.getElementById('postal_code').value.trim();
-        pcRaw = pcRaw.replace('-', '');
-        if (pcRaw.length < 7) {{
-            return;
-        }}
-        try {{
-            const response = await fetch(`https://api.zipaddress.net/?zipcode=${{pcRaw}}`);
-            const data = await response.json();
-            if (data.code === 200) {{
-                // 都道府県・市区町村 部分だけを address_1 に自動入力
-                document.getElementById('address_1').value = data.data.fullAddress;
-            }}
-        }} catch (error) {{
-            console.log("住所検索失敗:", error);
-        }}
-    }}
-    </script>
-</head>
-<body>
-    <div class="container">
-      <h1>カタログ申込フォーム</h1>
-      <p>以下の項目をご記入の上、送信してください。</p>
-      <form action="/submit_form" method="post">
-          <!-- ワンタイムトークン -->
-          <input type="hidden" name="form_token" value="{token}">
-
-          <label>氏名（必須）:
-              <input type="text" name="name" required>
-          </label>
-
-          <label>郵便番号（必須）:<br>
-              <small>※自動で住所補完します。(ブラウザの場合)</small><br>
-              <input type="text" name="postal_code" id="postal_code" onkeyup="fetchAddress()" required>
-          </label>
-
-          <label>都道府県・市区町村（必須）:<br>
-              <small>※郵便番号入力後に自動補完されます。修正が必要な場合は上書きしてください。</small><br>
-              <input type="text" name="address_1" id="address_1" required>
-          </label>
-
-          <label>番地・部屋番号など（必須）:<br>
-              <small>※カタログ送付のために番地や部屋番号を含めた完全な住所の記入が必要です</small><br>
-              <input type="text" name="address_2" id="address_2" required>
-          </label>
-
-          <label>電話番号（必須）:
-              <input type="text" name="phone" required>
-          </label>
-
-          <label>メールアドレス（必須）:
-              <input type="email" name="email" required>
-          </label>
-
-          <label>Insta・TikTok名（必須）:
-              <input type="text" name="sns_account" required>
-          </label>
-
-          <label>2025年度に在籍予定の学校名と学年（未記入可）:
-              <input type="text" name="school_grade">
-          </label>
-
-          <label>その他（質問やご要望など）:
-              <textarea name="other" rows="4"></textarea>
-          </label>
-
-          <input type="submit" value="送信">
-      </form>
-    </div>
-</body>
-</html>
-"""
-    return render_template_string(html_content)
+    # トークン以外は固定なので、コンパイル済みテンプレートにトークンを差し込むだけにする。
+    # CSS/JS は /static から ETag・Cache-Control 付きで配信される
+    response = make_response(render_template("catalog_form.html", token=token))
+    # ワンタイムトークンを含むので HTML 自体はキャッシュさせない
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 
 # -----------------------
@@ -1105,6 +1080,145 @@ def submit_catalog_form():
 # カンタン見積管理HTMLの処理
 # -----------------------
 
+# 見積番号 → フォーム初期値のキャッシュ
+# 同じ見積番号のURLは何度も開かれるので、毎回シート全体を読み直さないようにする
+# シート上での直接の編集は変更検知（sheet_changes）で無効化するので、TTL は長めでよい
+prefill_cache = TTLCache(
+    "quotation_prefill",
+    maxsize=int(os.environ.get("PREFILL_CACHE_SIZE", "512")),
+    ttl=float(os.environ.get("PREFILL_CACHE_TTL", "300")),
+)
+
+
+def quotation_row_to_prefill(row):
+    """Simple Estimate_1 の1行（日本語列名）→ フォーム初期値（英語キー）"""
+    return {
+        "quote_no": row.get("見積番号", ""),
+        "user_id": row.get("ユーザーID", ""),
+        "attribute": row.get("属性", ""),
+        "usage_date": row.get("使用日(割引区分)", ""),
+        "product_category": row.get("商品カテゴリー", ""),
+        "pattern": row.get("パターン", ""),
+        "quantity": row.get("枚数", ""),
+        "total_price": row.get("合計金額", ""),
+        "unit_price": row.get("単価", ""),
+        "print_position": row.get("プリント位置", ""),
+        "print_color": row.get("プリントカラー", ""),
+        "print_size": row.get("プリントサイズ", ""),
+        "print_design": row.get("プリントデザイン", ""),
+        "form_url": row.get("見積番号管理WEBフォームURL", ""),
+
+        # ボディ情報
+        "body_code": row.get("ボディ品番", ""),
+        "body_name": row.get("ボディ商品名", ""),
+        "body_color_no": row.get("ボディカラーNo", ""),
+        "body_color": row.get("商品カラー", ""),
+        "size_count_SS": row.get("SS", ""),
+        "size_count_S": row.get("S", ""),
+        "size_count_M": row.get("M", ""),
+        "size_count_L": row.get("L", ""),
+        "size_count_XL": row.get("XL", ""),
+        "size_count_XXL": row.get("XXL", ""),
+        "size_count_XXXL": row.get("XXXL", ""),
+        "size_count_XXXXL": row.get("XXXXL", ""),
+
+        "order_count": row.get("注文数", ""),
+
+        # プリント箇所情報
+        "print_area_count": row.get("プリント箇所数", ""),
+        "print_position_1": row.get("プリント位置_1", ""),
+        "print_design_1": row.get("プリントデザイン_1", ""),
+        "print_color_count_1": row.get("プリントカラー数_1", ""),
+        "print_color_1": row.get("プリントカラー_1", ""),
+        "print_size_1": row.get("デザインサイズ_1", ""),
+
+        "print_position_2": row.get("プリント位置_2", ""),
+        "print_design_2": row.get("プリントデザイン_2", ""),
+        "print_color_count_2": row.get("プリントカラー数_2", ""),
+        "print_color_2": row.get("プリントカラー_2", ""),
+        "print_size_2": row.get("デザインサイズ_2", ""),
+
+        "print_position_3": row.get("プリント位置_3", ""),
+        "print_design_3": row.get("プリントデザイン_3", ""),
+        "print_color_count_3": row.get("プリントカラー数_3", ""),
+        "print_color_3": row.get("プリントカラー_3", ""),
+        "print_size_3": row.get("デザインサイズ_3", ""),
+
+        "print_position_4": row.get("プリント位置_4", ""),
+        "print_design_4": row.get("プリントデザイン_4", ""),
+        "print_color_count_4": row.get("プリントカラー数_4", ""),
+        "print_color_4": row.get("プリントカラー_4", ""),
+        "print_size_4": row.get("デザインサイズ_4", ""),
+        "jersey_number": row.get("背番号", ""),
+        "jersey_name": row.get("背ネーム", ""),
+        "jersey_number_color": row.get("背番号カラー", ""),
+        "jersey_name_color": row.get("背ネームカラー", ""),
+        "outline_enabled": row.get("フチ付き", ""),
+        "symbol": row.get("記号", ""),
+
+        # 加工・納期
+        "processing_method": row.get("加工方法", ""),
+        "delivery_date": row.get("納期", ""),
+        "payment_method": row.get("支払い方法", ""),
+
+        # 備考欄
+        "special_spec": row.get("特殊仕様", ""),
+        "requested_delivery": row.get("希望納期", ""),
+        "packaging": row.get("袋詰め有無", ""),
+        "other_notes": row.get("その他備考", "") or row.get("その他", ""),  # 旧名にも対応
+
+        # 確定後反映項目
+        "pattern_fee": row.get("パターン料金", ""),
+        "lot_size": row.get("枚数(ロット)", ""),
+        "shipping_fee": row.get("送料", ""),
+        "delivery_request_date": row.get("納期(希望日)", ""),
+
+        # 楽観的排他用（保存時に読込時点から更新されていないか確認する）
+        "row_version": str(quote_store.parse_version(row.get(quote_store.VERSION_HEADER, ""))),
+    }
+
+
+def load_quotation_prefill(quote_no):
+    # 初期値の読み込みは保存処理よりクォータの優先度を下げる
+    with sheets_priority("prefill"):
+        gc = get_gspread_client()
+        sh = gc.open_by_key(SPREADSHEET_KEY)
+        ws = estimate_archive.worksheet_for(sh, quote_no)
+        all_rows = ws.get_all_records()
+    for row in all_rows:
+        if str(row.get("見積番号")) == quote_no:
+            return quotation_row_to_prefill(row)
+    return {}
+
+
+# スプレッドシートの変更検知（change_feed.py）
+sheet_changes = change_feed.ChangeFeed(open_spreadsheet)
+
+
+@sheet_changes.on_change
+def refresh_cached_quotes(spreadsheet):
+    """
+    シートが更新されていたら、キャッシュ中の見積の行だけを読み直し、
+    内容が変わった（または行が無くなった）ものを捨てる。アーカイブの索引も読み直させる。
+    """
+    estimate_archive.invalidate_index()
+    by_sheet = {}
+    for quote_no, prefill in prefill_cache.items():
+        title = estimate_archive.locate(quote_no) or "Simple Estimate_1"
+        by_sheet.setdefault(title, {})[quote_no] = prefill
+
+    for title, cached in by_sheet.items():
+        header, rows = change_feed.fetch_rows(
+            spreadsheet.worksheet(title), cached, width=quote_store.ROW_WIDTH + 1
+        )
+        for quote_no, prefill in cached.items():
+            row = rows.get(quote_no)
+            fresh = quotation_row_to_prefill(dict(zip(header, row))) if row is not None else None
+            if fresh is None or change_feed.digest(fresh) != change_feed.digest(prefill):
+                prefill_cache.invalidate(quote_no)
+                change_feed.CHANGE_INVALIDATIONS.inc(cache=prefill_cache.name)
+
+
 @app.route("/quotation_form", methods=["GET"])
 def show_quotation_form():
     token = str(uuid.uuid4())
@@ -1115,106 +1229,61 @@ def show_quotation_form():
 
     if quote_no:
         try:
-            gc = get_gspread_client()
-            sh = gc.open_by_key(SPREADSHEET_KEY)
-            ws = sh.worksheet("Simple Estimate_1")
-            all_rows = ws.get_all_records()
-            for row in all_rows:
-                if str(row.get("見積番号")) == quote_no:
-                    # 日本語列名 → 英語キーの変換
-                    prefill_data = {
-                        "quote_no": row.get("見積番号", ""),
-                        "user_id": row.get("ユーザーID", ""),
-                        "attribute": row.get("属性", ""),
-                        "usage_date": row.get("使用日(割引区分)", ""),
-                        "product_category": row.get("商品カテゴリー", ""),
-                        "pattern": row.get("パターン", ""),
-                        "quantity": row.get("枚数", ""),
-                        "total_price": row.get("合計金額", ""),
-                        "unit_price": row.get("単価", ""),
-                        "print_position": row.get("プリント位置", ""),
-                        "print_color": row.get("プリントカラー", ""),
-                        "print_size": row.get("プリントサイズ", ""),
-                        "print_design": row.get("プリントデザイン", ""),
-                        "form_url": row.get("見積番号管理WEBフォームURL", ""),
-
-                        # ボディ情報
-                        "body_code": row.get("ボディ品番", ""),
-                        "body_name": row.get("ボディ商品名", ""),
-                        "body_color_no": row.get("ボディカラーNo", ""),
-                        "body_color": row.get("商品カラー", ""),
-                        "size_count_SS": row.get("SS", ""),
-                        "size_count_S": row.get("S", ""),
-                        "size_count_M": row.get("M", ""),
-                        "size_count_L": row.get("L", ""),
-                        "size_count_XL": row.get("XL", ""),
-                        "size_count_XXL": row.get("XXL", ""),
-                        "size_count_XXXL": row.get("XXXL", ""),
-                        "size_count_XXXXL": row.get("XXXXL", ""),
-
-                        "order_count": row.get("注文数", ""),
-
-                        # プリント箇所情報
-                        "print_area_count": row.get("プリント箇所数", ""),
-                        "print_position_1": row.get("プリント位置_1", ""),
-                        "print_design_1": row.get("プリントデザイン_1", ""),
-                        "print_color_count_1": row.get("プリントカラー数_1", ""),
-                        "print_color_1": row.get("プリントカラー_1", ""),
-                        "print_size_1": row.get("デザインサイズ_1", ""),
-
-                        "print_position_2": row.get("プリント位置_2", ""),
-                        "print_design_2": row.get("プリントデザイン_2", ""),
-                        "print_color_count_2": row.get("プリントカラー数_2", ""),
-                        "print_color_2": row.get("プリントカラー_2", ""),
-                        "print_size_2": row.get("デザインサイズ_2", ""),
-
-                        "print_position_3": row.get("プリント位置_3", ""),
-                        "print_design_3": row.get("プリントデザイン_3", ""),
-                        "print_color_count_3": row.get("プリントカラー数_3", ""),
-                        "print_color_3": row.get("プリントカラー_3", ""),
-                        "print_size_3": row.get("デザインサイズ_3", ""),
-
-                        "print_position_4": row.get("プリント位置_4", ""),
-                        "print_design_4": row.get("プリントデザイン_4", ""),
-                        "print_color_count_4": row.get("プリントカラー数_4", ""),
-                        "print_color_4": row.get("プリントカラー_4", ""),
-                        "print_size_4": row.get("デザインサイズ_4", ""),
-                        "jersey_number": row.get("背番号", ""),
-                        "jersey_name": row.get("背ネーム", ""),
-                        "jersey_number_color": row.get("背番号カラー", ""),
-                        "jersey_name_color": row.get("背ネームカラー", ""),
-                        "outline_enabled": row.get("フチ付き", ""),
-                        "symbol": row.get("記号", ""),
-
-                        # 加工・納期
-                        "processing_method": row.get("加工方法", ""),
-                        "delivery_date": row.get("納期", ""),
-                        "payment_method": row.get("支払い方法", ""),
-
-                        # 備考欄
-                        "special_spec": row.get("特殊仕様", ""),
-                        "requested_delivery": row.get("希望納期", ""),
-                        "packaging": row.get("袋詰め有無", ""),
-                        "other_notes": row.get("その他備考", "") or row.get("その他", ""),  # 旧名にも対応
-
-                        # 確定後反映項目
-                        "pattern_fee": row.get("パターン料金", ""),
-                        "lot_size": row.get("枚数(ロット)", ""),
-                        "shipping_fee": row.get("送料", ""),
-                        "delivery_request_date": row.get("納期(希望日)", "")
-                    }
-                    break
+            prefill_data = prefill_cache.get_or_load(quote_no, load_quotation_prefill)
         except Exception as e:
             print("読み取りエラー:", e)
 
-    try:
-        with open("select_options.json", encoding="utf-8") as f:
-            options = json.load(f)
-    except Exception as e:
-        options = {}
-        print("選択肢読み込みエラー:", e)
+    # 選択肢は HTML に埋め込まず、フォーム側で /api/options から取得する
+    response = make_response(render_template(
+        "quotation_form.html", token=token, prefill=prefill_data, options_version=form_options.version
+    ))
+    # ワンタイムトークンを含むので HTML 自体はキャッシュさせない
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
-    return render_template("quotation_form.html", token=token, prefill=prefill_data, options=options)
+
+@app.route("/api/options", methods=["GET"])
+def options_api():
+    """
+    フォームの選択肢（select_options.json）を JSON で返す。
+    ?v= に現在のバージョンが付いていれば内容は変わらないので immutable でキャッシュさせる。
+    ETag・304・圧縮は compression が付与する。
+    """
+    version, payload, _ = form_options.current()
+    response = app.response_class(payload, mimetype="application/json")
+    if request.args.get("v") == version:
+        response.cache_control.public = True
+        response.cache_control.max_age = assets.IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+@app.route("/api/postal/<zipcode>", methods=["GET"])
+def postal_api(zipcode):
+    """
+    郵便番号 → 住所（KEN_ALL.CSV から作ったローカル索引。python postal_index.py build）。
+    索引が無ければ zipcloud に問い合わせる
+    """
+    normalized = postal_index.normalize_zipcode(zipcode)
+    if normalized is None:
+        return {"error": "郵便番号は 7 桁で指定してください"}, 400
+    try:
+        results = postal_index.lookup(normalized)
+    except (requests.RequestException, ValueError) as e:
+        print("郵便番号の検索エラー:", e)
+        return {"error": "郵便番号検索が利用できません"}, 503
+    if not results:
+        return {"zipcode": normalized, "results": []}, 404
+    response = app.response_class(
+        json.dumps({"zipcode": normalized, "results": results}, ensure_ascii=False),
+        mimetype="application/json",
+    )
+    # 郵便番号データの更新は月 1 回程度なので 1 日キャッシュさせる
+    response.cache_control.public = True
+    response.cache_control.max_age = 24 * 3600
+    return response
 
 @app.route("/submit_quotation", methods=["POST"])
 def submit_quotation_form():
@@ -1288,17 +1357,26 @@ def submit_quotation_form():
         form_data[f"print_color_{i}"] = request.form.get(f"print_color_{i}", "").strip()
         form_data[f"print_size_{i}"] = request.form.get(f"print_size_{i}", "").strip()
 
+    # フォームを開いた時点の行のバージョン（古いフォームからの送信には無い）
+    row_version = request.form.get("row_version", "").strip()
+    expected_version = int(row_version) if row_version.isdigit() else None
+
     try:
-        write_to_quotation_spreadsheet(form_data)
+        write_to_quotation_spreadsheet(form_data, expected_version=expected_version)
+    except quote_store.QuoteConflict:
+        return "フォームを開いた後に、この見積は別の操作で更新されています。フォームを開き直してから保存してください。", 409
     except Exception as e:
         return f"エラーが発生しました: {e}", 500
 
     return "見積内容を保存しました。", 200
 
 
-import gspread.utils  # 列文字変換のために追加
-
-def write_to_quotation_spreadsheet(form_data: dict):
+@tracing.traced("sheets.write_quotation")
+def write_to_quotation_spreadsheet(form_data: dict, expected_version=None):
+    """
+    見積番号の行を更新（無ければ追記）し、書き込んだ行のバージョンを返す。
+    同じ見積番号の同時保存は quote_store で直列化・検出する。
+    """
     gc = get_gspread_client()
     sh = gc.open_by_key(SPREADSHEET_KEY)
 
@@ -1306,8 +1384,9 @@ def write_to_quotation_spreadsheet(form_data: dict):
         worksheet = sh.worksheet("Simple Estimate_1")
 
         # ★ ヘッダーが空のままになっている既存シートを救済
-        if not any(worksheet.row_values(1)):
-            worksheet.update('A1:BN1', [[
+        header = worksheet.row_values(1)
+        if not any(header):
+            worksheet.update('A1:BO1', [[
                 "日時", "見積番号", "ユーザーID", "属性", "使用日(割引区分)",
                 "商品カテゴリー", "パターン", "枚数", "合計金額", "単価",
                 "プリント位置", "プリントカラー", "プリントサイズ", "プリントデザイン", "見積番号管理WEBフォームURL",
@@ -1320,12 +1399,16 @@ def write_to_quotation_spreadsheet(form_data: dict):
                 "背番号", "背ネーム", "背番号カラー", "背ネームカラー", "フチ付き", "記号",
                 "加工方法", "納期","支払い方法",
                 "特殊仕様", "希望納期", "袋詰め有無", "その他備考",
-                "パターン料金", "枚数(ロット)", "送料", "納期(希望日)"
+                "パターン料金", "枚数(ロット)", "送料", "納期(希望日)",
+                quote_store.VERSION_HEADER
             ]])
+        elif len(header) < 67:
+            # 更新バージョン列（BO）が無いシートには見出しだけ足す
+            worksheet.update('BO1', [[quote_store.VERSION_HEADER]])
 
     except gspread.exceptions.WorksheetNotFound:
         worksheet = sh.add_worksheet(title="Simple Estimate_1", rows=2000, cols=100)
-        worksheet.update('A1:BN1', [[
+        worksheet.update('A1:BO1', [[
             "日時", "見積番号", "ユーザーID", "属性", "使用日(割引区分)",
             "商品カテゴリー", "パターン", "枚数", "合計金額", "単価",
             "プリント位置", "プリントカラー", "プリントサイズ", "プリントデザイン", "見積番号管理WEBフォームURL",
@@ -1339,7 +1422,8 @@ def write_to_quotation_spreadsheet(form_data: dict):
             "背番号", "背ネーム", "背番号カラー", "背ネームカラー", "フチ付き", "記号",
             "加工方法", "納期","支払い方法",
             "特殊仕様", "希望納期", "袋詰め有無", "その他備考",
-            "パターン料金", "枚数(ロット)", "送料", "納期(希望日)"
+            "パターン料金", "枚数(ロット)", "送料", "納期(希望日)",
+            quote_store.VERSION_HEADER
         ]])
 
     jst = pytz.timezone('Asia/Tokyo')
@@ -1425,16 +1509,78 @@ def write_to_quotation_spreadsheet(form_data: dict):
         form_data.get("delivery_request_date", "")
     ]
 
-    records = worksheet.get_all_values()
     quote_no = form_data.get("quote_no", "")
+    # 月別アーカイブへ移した見積はそのシートの行を更新する（保存先は quote_store がロックの下で決める）
+    version = quote_store.upsert_quote(
+        worksheet, quote_no, new_row, expected_version=expected_version,
+        locate=lambda refresh: estimate_archive.worksheet_for(sh, quote_no, hot=worksheet, refresh=refresh),
+    )
+    search_index.index_quote(new_row)
 
-    for idx, row in enumerate(records[1:], start=2):  # Skip header
-        if row[1] == quote_no:
-            end_col_letter = gspread.utils.rowcol_to_a1(1, len(new_row)).split("1")[0]
-            worksheet.update(f"A{idx}:{end_col_letter}{idx}", [new_row])
-            return
+    # 次にフォームを開いたときは書き込み後の内容を読み直す
+    prefill_cache.invalidate(quote_no)
+    return version
 
-    worksheet.append_row(new_row, value_input_option="USER_ENTERED")
+
+# -----------------------
+# 管理者向け
+# -----------------------
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+
+def require_admin():
+    """
+    Authorization: Bearer <ADMIN_TOKEN>（または ?token=）を確かめる。
+    ADMIN_TOKEN が未設定なら管理者向けの URL 自体を無いものとして 404 にする。
+    """
+    if not ADMIN_TOKEN:
+        abort(404)
+    header = request.headers.get("Authorization", "")
+    token = header[len("Bearer "):] if header.startswith("Bearer ") else request.args.get("token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        abort(401)
+
+
+@app.route("/admin/stats", methods=["GET"])
+def admin_stats():
+    """カンタン見積りのファネル・売上の集計（?days=、既定 7 日。シートには触れない）"""
+    require_admin()
+    try:
+        days = min(max(int(request.args.get("days", "7")), 1), 366)
+    except ValueError:
+        return {"error": "days は整数で指定してください"}, 400
+    response = app.response_class(
+        json.dumps(estimate_stats.stats(days=days), ensure_ascii=False),
+        mimetype="application/json",
+    )
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+@app.route("/admin/search", methods=["GET"])
+def admin_search():
+    """
+    見積・カタログ請求の検索（電話番号・氏名・学校名・ユーザーID・ボディ品番など。部分一致）
+    ?q= 検索語 / ?kind=quote|catalog / ?page= / ?per_page=（最大 100）
+    """
+    require_admin()
+    query = request.args.get("q", "").strip()
+    kind = request.args.get("kind") or None
+    if not query:
+        return {"error": "q を指定してください"}, 400
+    if kind is not None and kind not in quote_search.KIND_FIELDS:
+        return {"error": "kind は quote か catalog を指定してください"}, 400
+    try:
+        page = int(request.args.get("page", "1"))
+        per_page = int(request.args.get("per_page", "20"))
+    except ValueError:
+        return {"error": "page・per_page は整数で指定してください"}, 400
+    response = app.response_class(
+        json.dumps(search_index.search(query, kind=kind, page=page, per_page=per_page), ensure_ascii=False),
+        mimetype="application/json",
+    )
+    response.headers["Cache-Control"] = "no-store"
+    return response
 
 
 # -----------------------
@@ -1445,6 +1591,67 @@ def health_check():
     return "LINE Bot is running.", 200
 
 
+# -----------------------
+# メトリクス（Prometheus 形式）
+# -----------------------
+HTTP_REQUESTS = metrics.counter(
+    "http_requests_total", "HTTPリクエスト数", ["route", "method", "status"]
+)
+HTTP_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "HTTPリクエストの処理時間（秒）", ["route", "method"]
+)
+HTTP_IN_FLIGHT = metrics.gauge(
+    "http_requests_in_flight", "処理中（ワーカー内で待機中を含む）のHTTPリクエスト数"
+)
+ESTIMATE_SESSIONS = metrics.gauge(
+    "estimate_sessions", "カンタン見積りフロー中のユーザー数"
+)
+ESTIMATE_SESSIONS.set_function(lambda: len(user_estimate_sessions))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        HTTP_LATENCY.observe(time.perf_counter() - started, route=route, method=request.method)
+    return response
+
+
+@app.teardown_request
+def finish_request(exc):
+    if g.pop("request_started", None) is not None:
+        HTTP_IN_FLIGHT.dec()
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return metrics.render_metrics(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+
+# -----------------------
+# バックグラウンドジョブ
+# -----------------------
+def start_background_jobs():
+    """
+    見積の月別アーカイブと、スプレッドシートの変更検知のスレッドを起動する。
+    import では起動しない（CLI・ベンチマークで Sheets をポーリングしないよう）。
+    サーバのワーカーごとに 1 回呼ぶ（gunicorn は gunicorn.conf.py の post_worker_init）
+    """
+    estimate_archive.start()
+    sheet_changes.start()
+
+
 if __name__ == "__main__":
+    # debug のリローダーでは、実際にリクエストを処理する子プロセスでだけ起動する
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_jobs()
     app.run(host="0.0.0.0", port=5000, debug=True)
 
@@ -0,0 +1,172 @@
+"""
+静的アセット（JS/CSS）のビルドと配信
+
+assets/ 以下のソースを縮小し、内容のハッシュを含むファイル名で static/dist/ に出力する。
+対応表は static/dist/manifest.json に書き出し、テンプレートからは asset_url() で参照する。
+
+    python assets.py build
+
+ファイル名が内容ごとに変わるので、static/dist/ 以下は 1 年間 immutable でキャッシュさせる。
+リピーターは HTML（テンプレートに残る Jinja 依存の初期値部分のみ）だけを取得すればよい。
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+
+from flask import request, url_for
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(BASE_DIR, "assets")
+DIST_DIR = os.path.join(BASE_DIR, "static", "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+# -----------------------
+# 縮小
+# -----------------------
+def minify_js(source):
+    """
+    保守的な JS 縮小。文字列・テンプレートリテラルの中身には手を付けず、
+    コメント・行頭行末の空白・空行のみ取り除く（改行は自動セミコロン挿入のため残す）。
+    """
+    out = []
+    literals = []  # 文字列リテラルは退避しておき、空白の除去後に戻す
+    i, n = 0, len(source)
+    prev = ""  # 直前の空白以外の文字（正規表現リテラルの判定用）
+    while i < n:
+        c = source[i]
+        if c in "'\"`":
+            j = i + 1
+            while j < n and source[j] != c:
+                j += 2 if source[j] == "\\" else 1
+            out.append(f"\0{len(literals)}\0")
+            literals.append(source[i:j + 1])
+            i = j + 1
+            prev = c
+        elif source.startswith("//", i):
+            j = source.find("\n", i)
+            i = n if j < 0 else j
+        elif source.startswith("/*", i):
+            j = source.find("*/", i + 2)
+            i = n if j < 0 else j + 2
+        elif c == "/" and (prev == "" or prev in "(,=:[!&|?{};"):
+            # 正規表現リテラル
+            j, in_class = i + 1, False
+            while j < n and (source[j] != "/" or in_class):
+                if source[j] == "\\":
+                    j += 1
+                elif source[j] == "[":
+                    in_class = True
+                elif source[j] == "]":
+                    in_class = False
+                j += 1
+            out.append(source[i:j + 1])
+            i = j + 1
+            prev = "/"
+        else:
+            out.append(c)
+            if not c.isspace():
+                prev = c
+            i += 1
+
+    lines = []
+    for line in "".join(out).split("\n"):
+        line = line.strip()
+        if line:
+            lines.append(line)
+    minified = "\n".join(lines) + "\n"
+    return re.sub("\0(\\d+)\0", lambda m: literals[int(m.group(1))], minified)
+
+
+def minify_css(source):
+    source = re.sub(r"/\*.*?\*/", "", source, flags=re.S)
+    source = re.sub(r"\s+", " ", source)
+    source = re.sub(r"\s*([{};,>])\s*", r"\1", source)
+    source = source.replace(";}", "}")
+    return source.strip() + "\n"
+
+
+MINIFIERS = {".js": minify_js, ".css": minify_css}
+
+
+# -----------------------
+# ビルド
+# -----------------------
+def build(source_dir=SOURCE_DIR, dist_dir=DIST_DIR):
+    """assets/ のファイルを縮小・ハッシュ付きで出力し、manifest を返す"""
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    for name in sorted(os.listdir(source_dir)):
+        stem, ext = os.path.splitext(name)
+        minify = MINIFIERS.get(ext)
+        if minify is None:
+            continue
+        with open(os.path.join(source_dir, name), encoding="utf-8") as f:
+            data = minify(f.read()).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        built = f"{stem}.{digest}{ext}"
+        with open(os.path.join(dist_dir, built), "wb") as f:
+            f.write(data)
+        manifest[name] = built
+
+    # 古いハッシュのファイルを削除する
+    keep = set(manifest.values()) | {os.path.basename(MANIFEST_PATH)}
+    for name in os.listdir(dist_dir):
+        if name not in keep:
+            os.remove(os.path.join(dist_dir, name))
+
+    with open(os.path.join(dist_dir, os.path.basename(MANIFEST_PATH)), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return manifest
+
+
+# -----------------------
+# 配信
+# -----------------------
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print("アセットの manifest 読み込みエラー:", e)
+        return {}
+
+
+def init_app(app, manifest_path=MANIFEST_PATH):
+    manifest = load_manifest(manifest_path)
+
+    def asset_url(name):
+        built = manifest.get(name)
+        if built is None:
+            raise KeyError(f"アセット {name} がビルドされていません（python assets.py build）")
+        return url_for("static", filename=f"dist/{built}")
+
+    app.jinja_env.globals["asset_url"] = asset_url
+
+    @app.after_request
+    def _immutable_assets(response):
+        # ファイル名にハッシュを含むので、内容が変わることはない
+        if response.status_code in (200, 304) and request.path.startswith("/static/dist/"):
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] != ["build"]:
+        print("使い方: python assets.py build")
+        return 2
+    for name, built in build().items():
+        print(f"{name} -> static/dist/{built}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""
+負荷試験・ベンチマーク用のツール群
+
+本番の LINE Messaging API / Google Sheets に触れずに計測できるよう、
+ローカルで動くフェイク（fake_line / fake_sheets）とトラフィック生成器を置く。
+"""
@@ -0,0 +1,112 @@
+"""
+会話フロー（conversation.py）のファズテスト兼スループット計測
+
+ランダムな入力（正しい選択肢・商品名の表記ゆれ・でたらめな文字列）で大量のセッションを進め、
+遷移ごとに不変条件を確認しつつ 1 秒あたりの遷移数を測る。
+Flex メッセージの組み立て（prompt）は呼ばない。状態遷移そのもののコストだけを見る。
+
+    python -m benchmarks.conversation_fuzz                  # 100 万遷移
+    python -m benchmarks.conversation_fuzz -n 5000000 --seed 1 --invalid-rate 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import conversation
+
+JUNK_INPUTS = (
+    "", " ", "こんにちは", "学 生", "一般です", "パターンZ", "5枚", "10-19枚", "カンタン見積り",
+    "お問い合わせ", "#有人チャット", "Tシャツ", "🙂", "x" * 200,
+)
+
+
+def _load_app():
+    os.environ.setdefault("LINE_CHANNEL_SECRET", "benchmark-secret")
+    os.environ.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "benchmark-token")
+    import Bro_shop_test
+    return Bro_shop_test
+
+
+def input_pools(flow, samples):
+    """状態ごとの「正しい入力」の候補。accept が関数の状態は samples から取る"""
+    pools = [None]
+    for state in flow.states[1:]:
+        if callable(state.accept):
+            pools.append(tuple(samples[state.key]))
+        else:
+            pools.append(tuple(state.accept))
+    return pools
+
+
+def check_done(flow, answers):
+    for state in flow.states[1:]:
+        assert state.key in answers, f"回答 {state.key} がありません: {answers}"
+        for key in state.derive:
+            assert key in answers, f"派生項目 {key} がありません: {answers}"
+
+
+def run_fuzz(flows, flow_name, samples, transitions, invalid_rate=0.1, seed=None):
+    rng = random.Random(seed)
+    flow = flows.flows[flow_name]
+    pools = input_pools(flow, samples)
+    counts = {conversation.NEXT: 0, conversation.DONE: 0, conversation.INVALID: 0}
+
+    # 乱数の生成コストを計測から外すため、入力の選び方は先にまとめて作る
+    junk_flags = [rng.random() < invalid_rate for _ in range(transitions)]
+    picks = [rng.random() for _ in range(transitions)]
+
+    session, _ = flows.start(flow_name)
+    started = time.perf_counter()
+    for i in range(transitions):
+        step = session["step"]
+        if junk_flags[i]:
+            message = JUNK_INPUTS[int(picks[i] * len(JUNK_INPUTS))]
+        else:
+            pool = pools[step]
+            message = pool[int(picks[i] * len(pool))]
+
+        outcome = flows.advance(session, message)
+        counts[outcome.kind] += 1
+
+        if outcome.kind == conversation.NEXT:
+            assert session["step"] == step + 1
+        elif outcome.kind == conversation.DONE:
+            check_done(flow, outcome.answers)
+            session, _ = flows.start(flow_name)
+        else:
+            # 正しい入力が拒否されてはいけない
+            assert junk_flags[i] and message not in pools[step], f"{message!r} が拒否されました（step={step}）"
+            session, _ = flows.start(flow_name)
+    elapsed = time.perf_counter() - started
+    return counts, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="会話フローのファズテスト・スループット計測")
+    parser.add_argument("-n", "--transitions", type=int, default=1_000_000)
+    parser.add_argument("--flow", default="estimate")
+    parser.add_argument("--invalid-rate", type=float, default=0.1, help="でたらめな入力を送る割合")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    app = _load_app()
+    from products import PRODUCTS
+    samples = {"item": [form for p in PRODUCTS for form in (p.name,) + tuple(p.aliases)]}
+
+    counts, elapsed = run_fuzz(
+        app.conversation_flows, args.flow, samples, args.transitions, args.invalid_rate, args.seed
+    )
+    total = sum(counts.values())
+    print(f"遷移数      : {total:,}")
+    print(f"  次の質問へ: {counts[conversation.NEXT]:,}")
+    print(f"  完了      : {counts[conversation.DONE]:,}")
+    print(f"  中断      : {counts[conversation.INVALID]:,}")
+    print(f"所要時間    : {elapsed:.2f} 秒")
+    print(f"スループット: {total / elapsed:,.0f} 遷移/秒（{elapsed / total * 1e6:.2f} us/遷移）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
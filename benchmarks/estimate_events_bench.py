@@ -0,0 +1,124 @@
+"""
+見積りイベントの集計（estimate_events.EventStats）のベンチマーク
+
+一時ファイルにランダムな見積りフローのイベントを生成し、次を計測する。
+
+- 初回の集計（全件を読み込んで積み上げる）
+- 追記分だけの集計（--append 件を追記した後の refresh）
+- 集計済みの状態からの stats()（/admin/stats の応答時間に相当）と、
+  イベントが増えていないときの 2 回目の stats()
+
+--no-numpy で numpy を使わない（1 件ずつ集計する）経路を計測する。
+
+    python -m benchmarks.estimate_events_bench                  # 200 万件
+    python -m benchmarks.estimate_events_bench -n 5000000 --days 90
+    python -m benchmarks.estimate_events_bench -n 200000 --no-numpy
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import estimate_events
+
+FIELDS = ("user_type", "usage_date", "item", "pattern", "quantity")
+CHOICES = {
+    "user_type": ["学生", "一般"],
+    "usage_date": ["14日目以降", "14日目以内"],
+    "item": ["ドライTシャツ", "ハイクオリティーTシャツ", "ドライロングスリープTシャツ", "ジップパーカー",
+             "スウェットパンツ", "リストバンド", "ジップアップブルゾン", "ハーフパンツ"],
+    "pattern": ["パターンA", "パターンB", "パターンC", "パターンD", "パターンE", "パターンF"],
+    "quantity": ["10～19枚", "20～29枚", "30～39枚", "40～49枚", "50～99枚", "100枚以上"],
+}
+
+
+def generate(log, count, days, seed, users=20000):
+    """フロー 1 回分（開始 → 回答 → 途中離脱 / 不正入力 / 見積り）のイベントを count 件以上書く"""
+    rng = random.Random(seed)
+    now = int(time.time())
+    # ラベルのコードは先に振っておき、レコードは encode でまとめて書く
+    chunk = []
+    written = 0
+    with open(log.path, "ab") as f:
+        while written < count:
+            user_id = f"U{rng.randrange(users):08d}"
+            ts = now - rng.randrange(days * estimate_events.DAY)
+            chunk.append(log.encode(estimate_events.START, user_id, ts=ts))
+            answers = {}
+            for step, key in enumerate(FIELDS, start=1):
+                roll = rng.random()
+                if roll < 0.08:
+                    break
+                if roll < 0.1:
+                    chunk.append(log.encode(estimate_events.INVALID, user_id, step=step, ts=ts))
+                    break
+                answers[key] = rng.choice(CHOICES[key])
+                ts += rng.randrange(5, 60)
+                chunk.append(log.encode(estimate_events.ANSWER, user_id, step=step, answers=answers, ts=ts))
+            else:
+                amount = rng.randrange(10, 100) * 1000
+                chunk.append(log.encode(estimate_events.COMPLETE, user_id, answers=answers, amount=amount, ts=ts))
+            if len(chunk) >= 10000:
+                f.write(b"".join(chunk))
+                written += len(chunk)
+                chunk = []
+        f.write(b"".join(chunk))
+        written += len(chunk)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="見積りイベント集計のベンチマーク")
+    parser.add_argument("-n", "--events", type=int, default=2_000_000, help="最初に生成するイベント数")
+    parser.add_argument("--append", type=int, default=10_000, help="追記してから再集計するイベント数")
+    parser.add_argument("--days", type=int, default=30, help="イベントを散らす日数")
+    parser.add_argument("--no-numpy", action="store_true", help="numpy を使わずに集計する")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.no_numpy:
+        estimate_events.numpy = None
+    elif estimate_events.numpy is None:
+        print("numpy が無いため 1 件ずつ集計します")
+
+    with tempfile.TemporaryDirectory(prefix="estimate-events-") as tmp:
+        log = estimate_events.EventLog(os.path.join(tmp, "estimate_events.log"), fields=FIELDS)
+        log._open()  # ヘッダを書く
+        started = time.perf_counter()
+        total = generate(log, args.events, args.days, args.seed)
+        generated = time.perf_counter() - started
+        size = os.path.getsize(log.path)
+
+        stats = estimate_events.EventStats(log)
+        started = time.perf_counter()
+        stats.refresh()
+        initial = time.perf_counter() - started
+
+        appended = generate(log, args.append, 1, args.seed + 1)
+        started = time.perf_counter()
+        stats.refresh()
+        incremental = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = stats.stats(days=args.days)
+        query = time.perf_counter() - started
+        started = time.perf_counter()
+        stats.stats(days=args.days)
+        cached = time.perf_counter() - started
+
+    print(f"集計        : {'numpy' if estimate_events.numpy is not None else '1 件ずつ'}")
+    print(f"イベント    : {total:,} 件（{size / 1024 / 1024:,.1f} MiB、生成 {generated:.2f} 秒）")
+    print(f"初回の集計  : {initial:.3f} 秒（{total / initial:,.0f} 件/秒）")
+    print(f"追記分の集計: {incremental * 1000:.1f} ms（{appended:,} 件）")
+    print(f"stats()     : {query * 1000:.1f} ms（{args.days} 日分、組み合わせ {len(result['combos'])} 件を表示）")
+    print(f"stats() 2 回目: {cached * 1000:.2f} ms（新しいイベント無し）")
+    if result["events"] != total + appended:
+        print(f"集計件数が一致しません: {result['events']:,} / {total + appended:,}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
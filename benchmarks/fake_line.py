@@ -0,0 +1,123 @@
+"""
+LINE Messaging API のフェイク（返信・プッシュを受けて記録するだけ）
+
+    python -m benchmarks.fake_line --port 8092 --latency-ms 50
+
+アプリ側は環境変数 LINE_API_ENDPOINT=http://localhost:8092 を設定すると、
+LineBotApi の送信先がこのサーバになる。
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLineState:
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0):
+        self.lock = threading.Lock()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.message_types = Counter()
+        self.last_messages = {}  # { replyToken / to: [message, ...] }
+
+    def configure(self, latency_ms=None, jitter_ms=None, error_rate=None):
+        if latency_ms is not None:
+            self.latency_ms = latency_ms
+        if jitter_ms is not None:
+            self.jitter_ms = jitter_ms
+        if error_rate is not None:
+            self.error_rate = error_rate
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+            self.message_types.clear()
+            self.last_messages.clear()
+
+
+class FakeLineHandler(BaseHTTPRequestHandler):
+    state = None  # FakeLineState（サーバ起動時に差し込む）
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/_admin/stats":
+            with self.state.lock:
+                return self._send(200, {"calls": dict(self.state.calls),
+                                        "message_types": dict(self.state.message_types)})
+        self._send(404, {"message": "Not found"})
+
+    def do_POST(self):
+        state = self.state
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        if self.path == "/_admin/config":
+            state.configure(**body)
+            return self._send(200, {})
+        if self.path == "/_admin/reset":
+            state.reset()
+            return self._send(200, {})
+
+        if self.path not in ("/v2/bot/message/reply", "/v2/bot/message/push"):
+            return self._send(404, {"message": "Not found"})
+
+        delay = state.latency_ms + random.uniform(0, state.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        if state.error_rate and random.random() < state.error_rate:
+            return self._send(500, {"message": "Internal server error"})
+
+        with state.lock:
+            state.calls[self.path.rsplit("/", 1)[1]] += 1
+            for message in body.get("messages", []):
+                state.message_types[message.get("type", "")] += 1
+            state.last_messages[body.get("replyToken") or body.get("to")] = body.get("messages", [])
+        self._send(200, {})
+
+
+def start_server(port=0, **config):
+    """
+    別スレッドでフェイクサーバを起動し、(server, base_url) を返す
+    """
+    state = FakeLineState(**config)
+    handler = type("BoundFakeLineHandler", (FakeLineHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-line", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LINE Messaging API のフェイクサーバ")
+    parser.add_argument("--port", type=int, default=8092)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server, url = start_server(args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               error_rate=args.error_rate)
+    print(f"フェイク LINE 起動: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+"""
+Google Sheets のフェイク（HTTP サーバ + gspread 互換の最小クライアント）
+
+    python -m benchmarks.fake_sheets --port 8091 --latency-ms 80 --read-quota 60 --write-quota 60
+
+install(Bro_shop_test, base_url) でアプリの Sheets 接続をこのフェイクに差し替える
+（get_gspread_client() が本物の gspread の代わりに FakeSheetsClient を返す）。
+gunicorn で起動するときは benchmarks/loadtest_app.py を使う。
+
+- 値はすべて文字列で保持する（Sheets の FORMATTED_VALUE 相当）
+- レイテンシ・1分あたりの読み書きクォータ・5xx エラー率を注入できる
+- クォータ超過時は Google と同じ形式の 429 を返し、クライアントは
+  gspread.exceptions.APIError を送出する（本番と同じエラー経路を通る）
+- 書き込みのたびにスプレッドシートの最終更新時刻（Drive の modifiedTime 相当）を進める
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+import requests
+from gspread.exceptions import APIError, WorksheetNotFound
+
+
+# -----------------------
+# A1 表記
+# -----------------------
+_A1_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def col_to_index(letters):
+    index = 0
+    for c in letters:
+        index = index * 26 + (ord(c) - 64)
+    return index
+
+
+def index_to_col(index):
+    letters = ""
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def parse_a1_range(a1):
+    """
+    "A1:BN1" / "B:B" / "A5" → (開始行, 開始列, 終了行, 終了列)（1 始まり、None は端まで）
+    """
+    if "!" in a1:
+        a1 = a1.split("!", 1)[1]
+    parts = a1.upper().split(":")
+    start = _A1_RE.match(parts[0])
+    end = _A1_RE.match(parts[-1])
+    if not start or not end:
+        raise ValueError(f"A1 表記を解釈できません: {a1}")
+
+    def cell(m, default):
+        col = col_to_index(m.group(1)) if m.group(1) else default
+        row = int(m.group(2)) if m.group(2) else default
+        return row, col
+
+    start_row, start_col = cell(start, 1)
+    end_row, end_col = cell(end, None)
+    if len(parts) == 1:
+        end_row, end_col = start_row, start_col
+    return start_row, start_col, end_row, end_col
+
+
+# -----------------------
+# サーバ
+# -----------------------
+class _QuotaWindow:
+    """直近 60 秒の呼び出し回数を数える"""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.calls = deque()
+
+    def allow(self, now):
+        if not self.per_minute:
+            return True
+        while self.calls and now - self.calls[0] >= 60:
+            self.calls.popleft()
+        if len(self.calls) >= self.per_minute:
+            return False
+        self.calls.append(now)
+        return True
+
+
+class FakeSheetsState:
+    def __init__(self, latency_ms=0, jitter_ms=0, read_quota=0, write_quota=0, error_rate=0.0):
+        self.lock = threading.Lock()
+        self.spreadsheets = {}  # { key: { title: [[...], ...] } }
+        self.modified = {}  # { key: 最終更新時刻（RFC 3339） }
+        self.configure(latency_ms=latency_ms, jitter_ms=jitter_ms, read_quota=read_quota,
+                       write_quota=write_quota, error_rate=error_rate)
+        self.reset_stats()
+
+    def configure(self, latency_ms=None, jitter_ms=None, read_quota=None, write_quota=None, error_rate=None):
+        if latency_ms is not None:
+            self.latency_ms = latency_ms
+        if jitter_ms is not None:
+            self.jitter_ms = jitter_ms
+        if error_rate is not None:
+            self.error_rate = error_rate
+        if read_quota is not None:
+            self.read_quota = _QuotaWindow(read_quota)
+        if write_quota is not None:
+            self.write_quota = _QuotaWindow(write_quota)
+
+    def reset_stats(self):
+        self.stats = {"read": 0, "write": 0, "throttled": 0, "errors": 0}
+
+    def reset(self):
+        with self.lock:
+            self.spreadsheets.clear()
+            self.modified.clear()
+            self.reset_stats()
+
+    def touch(self, key):
+        """書き込み時に呼ぶ（lock を取った状態で）"""
+        self.modified[key] = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+    def sheet(self, key, title):
+        ws = self.spreadsheets.setdefault(key, {}).get(title)
+        if ws is None:
+            raise KeyError(title)
+        return ws
+
+
+def _error_body(code, status, message):
+    return {"error": {"code": code, "message": message, "status": status}}
+
+
+class FakeSheetsHandler(BaseHTTPRequestHandler):
+    state = None  # FakeSheetsState（サーバ起動時に差し込む）
+
+    # ---- 共通 ----
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _admit(self, kind):
+        """レイテンシ注入とクォータ判定。拒否した場合は応答済みで False を返す"""
+        state = self.state
+        delay = state.latency_ms + random.uniform(0, state.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        with state.lock:
+            if state.error_rate and random.random() < state.error_rate:
+                state.stats["errors"] += 1
+                self._send(503, _error_body(503, "UNAVAILABLE", "The service is currently unavailable."))
+                return False
+            quota = state.read_quota if kind == "read" else state.write_quota
+            if not quota.allow(time.monotonic()):
+                state.stats["throttled"] += 1
+                self._send(429, _error_body(
+                    429, "RESOURCE_EXHAUSTED",
+                    f"Quota exceeded for quota metric '{kind.title()} requests' per minute per user."))
+                return False
+            state.stats[kind] += 1
+        return True
+
+    def _route(self):
+        parsed = urlparse(self.path)
+        parts = [unquote(p) for p in parsed.path.strip("/").split("/")]
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        return parts, query
+
+    # ---- ルーティング ----
+    def do_GET(self):
+        parts, query = self._route()
+        state = self.state
+        if parts == ["_admin", "stats"]:
+            with state.lock:
+                sizes = {k: {t: len(rows) for t, rows in v.items()} for k, v in state.spreadsheets.items()}
+                return self._send(200, {**state.stats, "sheets": sizes})
+        if len(parts) == 3 and parts[0] == "spreadsheets" and parts[2] == "metadata":
+            # Drive API 相当（Sheets のクォータには数えない）
+            with state.lock:
+                return self._send(200, {"modifiedTime": state.modified.get(parts[1], "")})
+        if len(parts) == 3 and parts[0] == "spreadsheets" and parts[2] == "worksheets":
+            if not self._admit("read"):
+                return
+            with state.lock:
+                titles = list(state.spreadsheets.setdefault(parts[1], {}).keys())
+            return self._send(200, {"worksheets": titles})
+        if len(parts) == 4 and parts[0] == "spreadsheets" and parts[2] == "values":
+            if not self._admit("read"):
+                return
+            return self._read_range(parts[1], parts[3], query.get("range"))
+        self._send(404, _error_body(404, "NOT_FOUND", "not found"))
+
+    def do_POST(self):
+        parts, query = self._route()
+        state = self.state
+        body = self._body()
+        if parts == ["_admin", "config"]:
+            state.configure(**body)
+            return self._send(200, {})
+        if parts == ["_admin", "reset"]:
+            state.reset()
+            return self._send(200, {})
+        if len(parts) == 3 and parts[0] == "spreadsheets" and parts[2] == "worksheets":
+            if not self._admit("write"):
+                return
+            with state.lock:
+                sheets = state.spreadsheets.setdefault(parts[1], {})
+                if body["title"] in sheets:
+                    return self._send(400, _error_body(400, "INVALID_ARGUMENT", "already exists"))
+                sheets[body["title"]] = []
+                state.touch(parts[1])
+            return self._send(200, {"title": body["title"]})
+        if len(parts) == 3 and parts[0] == "spreadsheets" and parts[2] == "batch_update":
+            # spreadsheets.batchUpdate のうち、行の削除（deleteDimension）だけに対応する
+            if not self._admit("write"):
+                return
+            try:
+                with state.lock:
+                    state.touch(parts[1])
+                    for req in body["requests"]:
+                        r = req["deleteDimension"]["range"]
+                        del state.sheet(parts[1], r["sheetId"])[r["startIndex"]:r["endIndex"]]
+            except KeyError as e:
+                return self._send(404, _error_body(404, "NOT_FOUND", f"worksheet not found: {e}"))
+            return self._send(200, {"replies": [{} for _ in body["requests"]]})
+        if len(parts) == 4 and parts[0] == "spreadsheets" and parts[2] == "values":
+            title, _, op = parts[3].partition(":")
+            kind = "read" if op == "batch_get" else "write"
+            if not self._admit(kind):
+                return
+            try:
+                with state.lock:
+                    ws = state.sheet(parts[1], title)
+                    if kind == "write":
+                        state.touch(parts[1])
+                    if op == "append":
+                        ws.extend([[str(v) for v in row] for row in body["values"]])
+                        return self._send(200, {"updatedRange": f"A{len(ws)}"})
+                    if op == "update":
+                        self._write_range(ws, body["range"], body["values"])
+                        return self._send(200, {})
+                    if op == "delete_rows":
+                        del ws[body["start"] - 1:body["end"]]
+                        return self._send(200, {})
+                    if op == "batch_get":
+                        return self._send(200, {"valueRanges": [
+                            {"range": r, "values": self._slice(ws, r)} for r in body["ranges"]
+                        ]})
+            except KeyError:
+                return self._send(404, _error_body(404, "NOT_FOUND", f"worksheet not found: {title}"))
+        self._send(404, _error_body(404, "NOT_FOUND", "not found"))
+
+    # ---- 値の読み書き ----
+    @staticmethod
+    def _slice(ws, a1):
+        start_row, start_col, end_row, end_col = parse_a1_range(a1)
+        rows = ws[start_row - 1:end_row]
+        values = [row[start_col - 1:end_col] for row in rows]
+        while values and not any(values[-1]):
+            values.pop()
+        return values
+
+    def _read_range(self, key, title, a1):
+        try:
+            with self.state.lock:
+                ws = self.state.sheet(key, title)
+                values = self._slice(ws, a1) if a1 else [list(row) for row in ws]
+        except KeyError:
+            return self._send(404, _error_body(404, "NOT_FOUND", f"worksheet not found: {title}"))
+        self._send(200, {"values": values})
+
+    @staticmethod
+    def _write_range(ws, a1, values):
+        start_row, start_col, _, _ = parse_a1_range(a1)
+        for r, row_values in enumerate(values):
+            row_index = start_row - 1 + r
+            while len(ws) <= row_index:
+                ws.append([])
+            row = ws[row_index]
+            end = start_col - 1 + len(row_values)
+            if len(row) < end:
+                row.extend([""] * (end - len(row)))
+            row[start_col - 1:end] = [str(v) for v in row_values]
+
+
+def start_server(port=0, **config):
+    """
+    別スレッドでフェイクサーバを起動し、(server, base_url) を返す
+    """
+    state = FakeSheetsState(**config)
+    handler = type("BoundFakeSheetsHandler", (FakeSheetsHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-sheets", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# -----------------------
+# gspread 互換クライアント（アプリが使うメソッドのみ）
+# -----------------------
+class FakeSheetsClient:
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.http = requests.Session()
+        self.timeout = timeout
+
+    def request(self, method, path, **kwargs):
+        response = self.http.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+        if response.status_code >= 400:
+            raise APIError(response)
+        return response.json()
+
+    def open_by_key(self, key):
+        return FakeSpreadsheet(self, key)
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+
+    def worksheets(self):
+        data = self.client.request("GET", f"/spreadsheets/{quote(self.id)}/worksheets")
+        return [FakeWorksheet(self, title) for title in data["worksheets"]]
+
+    def worksheet(self, title):
+        for ws in self.worksheets():
+            if ws.title == title:
+                return ws
+        raise WorksheetNotFound(title)
+
+    def get_lastUpdateTime(self):
+        return self.client.request("GET", f"/spreadsheets/{quote(self.id)}/metadata")["modifiedTime"]
+
+    def add_worksheet(self, title, rows=1000, cols=26, index=None):
+        self.client.request("POST", f"/spreadsheets/{quote(self.id)}/worksheets", json={"title": title})
+        return FakeWorksheet(self, title)
+
+    def batch_update(self, body):
+        return self.client.request("POST", f"/spreadsheets/{quote(self.id)}/batch_update", json=body)
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.client = spreadsheet.client
+        self.title = title
+        self.id = title  # batch_update の sheetId（フェイクではシート名で指す）
+
+    def _path(self, op=""):
+        path = f"/spreadsheets/{quote(self.spreadsheet.id)}/values/{quote(self.title)}"
+        return path + (quote(":" + op) if op else "")
+
+    # ---- 読み取り ----
+    def get_all_values(self):
+        return self.client.request("GET", self._path())["values"]
+
+    def get(self, range_name=None):
+        params = {"range": range_name} if range_name else None
+        return self.client.request("GET", self._path(), params=params)["values"]
+
+    def batch_get(self, ranges):
+        data = self.client.request("POST", self._path("batch_get"), json={"ranges": list(ranges)})
+        return [vr["values"] for vr in data["valueRanges"]]
+
+    def row_values(self, row):
+        values = self.get(f"{row}:{row}")
+        return values[0] if values else []
+
+    def col_values(self, col):
+        letter = index_to_col(col)
+        return [row[0] if row else "" for row in self.get(f"{letter}:{letter}")]
+
+    def acell(self, label):
+        values = self.get(label)
+        return type("Cell", (), {"value": values[0][0] if values and values[0] else ""})()
+
+    def get_all_records(self):
+        values = self.get_all_values()
+        if not values:
+            return []
+        header = values[0]
+        records = []
+        for row in values[1:]:
+            row = row + [""] * (len(header) - len(row))
+            records.append({k: _numericise(v) for k, v in zip(header, row)})
+        return records
+
+    # ---- 書き込み ----
+    def update(self, range_name, values=None, **kwargs):
+        # gspread 5 系（range, values）と 6 系（values, range）の両方の引数順に対応
+        if not isinstance(range_name, str):
+            range_name, values = values, range_name
+        self.client.request("POST", self._path("update"), json={"range": range_name, "values": values})
+
+    def append_row(self, values, value_input_option="RAW", **kwargs):
+        self.client.request("POST", self._path("append"), json={"values": [values]})
+
+    def append_rows(self, values, value_input_option="RAW", **kwargs):
+        self.client.request("POST", self._path("append"), json={"values": values})
+
+    def delete_rows(self, start_index, end_index=None):
+        self.client.request("POST", self._path("delete_rows"),
+                            json={"start": start_index, "end": end_index or start_index})
+
+
+def install(app_module, base_url):
+    """
+    アプリ（Bro_shop_test）の Sheets 認証を差し替え、本番のスプレッドシートに触れないようにする。
+    クォータ管理・計測のラッパーは本番と同じものを通る。
+    """
+    from metrics import InstrumentedProxy
+
+    app_module._authorize_gspread_client = lambda: InstrumentedProxy(
+        FakeSheetsClient(base_url), "sheets", (FakeSpreadsheet, FakeWorksheet)
+    )
+
+
+def _numericise(value):
+    """gspread の get_all_records と同じく数値文字列を数値にする"""
+    if value.lstrip("-").isdigit():
+        return int(value)
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Google Sheets のフェイクサーバ")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--read-quota", type=int, default=0, help="1分あたりの読み取り上限（0 で無制限）")
+    parser.add_argument("--write-quota", type=int, default=0, help="1分あたりの書き込み上限（0 で無制限）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 を返す確率")
+    args = parser.parse_args(argv)
+
+    server, url = start_server(args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                               read_quota=args.read_quota, write_quota=args.write_quota,
+                               error_rate=args.error_rate)
+    print(f"フェイク Sheets 起動: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+ボットのホットパスのマイクロベンチマーク（回帰検知付き）
+
+外部 I/O（LINE 返信・スプレッドシート書き込み）はスタブに差し替え、
+関数単体の 1 回あたり実行時間とメモリ確保量を計測する。
+
+    python -m benchmarks.hot_paths                     # baseline.json と比較（悪化で終了コード 1）
+    python -m benchmarks.hot_paths --update-baseline   # 現在の結果を基準として保存
+    python -m benchmarks.hot_paths -k flex             # 名前で絞り込み
+
+実行時間は計測マシンに依存するため、基準値は比較に使うマシン上で更新すること。
+CPU を共有する環境では揺れが大きいので --time-threshold を広げて使う。
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """
+    ベンチマーク登録用デコレータ。
+    登録する関数は準備を行い、計測対象の引数なし関数を返す。
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+def _load_app():
+    os.environ.setdefault("LINE_CHANNEL_SECRET", "benchmark-secret")
+    os.environ.setdefault("LINE_CHANNEL_ACCESS_TOKEN", "benchmark-token")
+    # 計測中のイベント・検索索引を本番のファイルに書かないよう、一時ディレクトリに向ける
+    tmp = tempfile.mkdtemp(prefix="hot-paths-")
+    os.environ.setdefault("ESTIMATE_EVENT_LOG", os.path.join(tmp, "estimate_events.log"))
+    os.environ.setdefault("QUOTE_SEARCH_DB", os.path.join(tmp, "quote_search.db"))
+    import Bro_shop_test
+    return Bro_shop_test
+
+
+def _event(user_id, text=""):
+    return SimpleNamespace(
+        source=SimpleNamespace(user_id=user_id),
+        reply_token="benchmark-reply-token",
+        message=SimpleNamespace(text=text),
+    )
+
+
+ESTIMATE_DATA = {
+    "user_type": "学生",
+    "usage_date": "14日目以降",
+    "discount_type": "早割",
+    "item": "ドライTシャツ",
+    "pattern": "パターンC",
+    "quantity": "50～99枚",
+}
+
+
+# -----------------------
+# 計測対象
+# -----------------------
+@benchmark("calculate_estimate")
+def bench_calculate_estimate(app):
+    data = dict(ESTIMATE_DATA)
+    return lambda: app.calculate_estimate(data)
+
+
+@benchmark("flex_pattern_select")
+def bench_flex_pattern_select(app):
+    return lambda: app.flex_pattern_select("ドライTシャツ")
+
+
+@benchmark("flex_estimate_result_with_image")
+def bench_flex_estimate_result(app):
+    data = dict(ESTIMATE_DATA)
+    return lambda: app.flex_estimate_result_with_image(data, 80000, 1600, "1700000000")
+
+
+@benchmark("flex_estimate_result_send")
+def bench_flex_estimate_result_send(app):
+    """見積結果の組み立て + 送信時のシリアライズ（reply_message が行う as_json_dict → JSON 文字列化）"""
+    data = dict(ESTIMATE_DATA)
+
+    def run():
+        message = app.flex_estimate_result_with_image(data, 80000, 1600, "1700000000")
+        return json.dumps({"replyToken": "benchmark-reply-token", "messages": [message.as_json_dict()]})
+    return run
+
+
+@benchmark("route_message")
+def bench_route_message(app):
+    """コマンドの振り分け（どのコマンドにも一致しない長めのメッセージ）"""
+    text = "来月の体育祭用にクラスTシャツを30枚ほど作りたいのですが、納期はどのくらいでしょうか？" * 3
+
+    def run():
+        key = app.message_router.normalize(text)
+        return app.message_router.route_priority(key) or app.message_router.route(key)
+    return run
+
+
+@benchmark("process_estimate_flow")
+def bench_process_estimate_flow(app):
+    """カンタン見積り 5 ステップ（最後に見積計算・書き込み・結果送信）"""
+    steps = ["学生", "14日目以降", "ドライTシャツ", "パターンC", "50～99枚"]
+    events = [_event("Ubenchmark", text) for text in steps]
+
+    def run():
+        app.user_estimate_sessions["Ubenchmark"] = {"step": 1, "answers": {}, "is_single": False}
+        for event, text in zip(events, steps):
+            app.process_estimate_flow(event, text)
+    return run
+
+
+@benchmark("submit_quotation_form")
+def bench_submit_quotation_form(app):
+    """見積番号管理フォームの送信（66 項目のフォーム→書き込み用データの変換）"""
+    form = {
+        "form_token": "benchmark-token",
+        "quote_no": "1700000000", "user_id": "Ubenchmark", "attribute": "学生",
+        "usage_date": "14日目以降(早割)", "product_category": "ドライTシャツ", "pattern": "パターンC",
+        "quantity": "50～99枚", "total_price": "80000", "unit_price": "1600",
+        "body_code": "300-ACT", "body_name": "ドライTシャツ", "body_color_no": "001", "body_color": "ホワイト",
+        "size_count_M": "20", "size_count_L": "30", "order_count": "50", "print_area_count": "2",
+        "jersey_number": "あり", "jersey_name": "なし", "payment_method": "銀行振込",
+        "other_notes": "ベンチマーク用の備考" * 5,
+    }
+    for i in range(1, 5):
+        form.update({
+            f"print_position_{i}": "前", f"print_design_{i}": "D-001", f"print_color_count_{i}": "1",
+            f"print_color_{i}": "ブラック", f"print_size_{i}": "A4",
+        })
+
+    def run():
+        with app.app.test_request_context("/submit_quotation", method="POST", data=form):
+            app.session["quotation_form_token"] = "benchmark-token"
+            response = app.app.make_response(app.submit_quotation_form())
+        # スタブの引数ずれなどでエラー応答を計測しないよう、保存の成功を確かめる
+        if not 200 <= response.status_code < 300:
+            raise RuntimeError(f"submit_quotation_form が {response.status_code} を返しました: "
+                               f"{response.get_data(as_text=True)}")
+    return run
+
+
+@benchmark("show_catalog_form")
+def bench_show_catalog_form(app):
+    """カタログ申込フォームの表示（ワンタイムトークンの発行と HTML の生成）"""
+    def run():
+        with app.app.test_request_context("/catalog_form"):
+            app.show_catalog_form()
+    return run
+
+
+@benchmark("render_quotation_form")
+def bench_render_quotation_form(app):
+    """見積番号管理フォームの表示（選択肢 800 件超の <select> を含む。初期値はキャッシュ済み）"""
+    app.prefill_cache.set("1700000000", {
+        "quote_no": "1700000000", "body_code": "300-ACT", "body_color": "ホワイト",
+        "print_position_1": "前", "print_color_1": "ブラック", "payment_method": "銀行振込",
+    })
+    client = app.app.test_client()
+    return lambda: client.get("/quotation_form?quote_no=1700000000")
+
+
+# -----------------------
+# 計測
+# -----------------------
+def _time_per_call(func, min_time=0.2, repeat=7):
+    """timeit と同様に回数を自動調整し、GC を止めた状態での最良値（1 回あたり秒）を返す"""
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _best_time(func, min_time, repeat)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _best_time(func, min_time, repeat):
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, int(min_time / elapsed) + 1)
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best, number
+
+
+def _allocations_per_call(func, number=50):
+    """1 回あたりのメモリ確保量（バイト）とピーク使用量（バイト）"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()  # キャッシュ等の初回コストを除く
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        base, _ = tracemalloc.get_traced_memory()
+        for _ in range(number):
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+    return allocated // number, max(peak - base, 0)
+
+
+def run_benchmarks(pattern=None, min_time=0.2):
+    app = _load_app()
+    # 外部 I/O をスタブに差し替える
+    app.line_bot_api.reply_message = lambda reply_token, messages: None
+    app.write_to_quotation_spreadsheet = lambda form_data, expected_version=None: None
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        func = setup(app)
+        seconds, loops = _time_per_call(func, min_time=min_time)
+        retained, peak = _allocations_per_call(func)
+        results[name] = {
+            "us_per_call": round(seconds * 1e6, 2),
+            "loops": loops,
+            "peak_bytes": peak,
+            "retained_bytes_per_call": retained,
+        }
+    return results
+
+
+def compare(results, baseline, time_threshold, alloc_threshold, min_delta_us=2.0):
+    """
+    基準値に対して閾値を超えて悪化した項目の一覧を返す。
+    数マイクロ秒の関数は揺れが大きいため、差が min_delta_us 未満なら悪化とみなさない。
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        delta = result["us_per_call"] - base["us_per_call"]
+        if delta > base["us_per_call"] * time_threshold and delta > min_delta_us:
+            regressions.append(f"{name}: 実行時間 {base['us_per_call']}us → {result['us_per_call']}us")
+        # 小さな値の揺れで誤検知しないよう 1KB の余裕を持たせる
+        if result["peak_bytes"] > base["peak_bytes"] * (1 + alloc_threshold) + 1024:
+            regressions.append(f"{name}: ピークメモリ {base['peak_bytes']}B → {result['peak_bytes']}B")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ホットパスのマイクロベンチマーク")
+    parser.add_argument("-k", dest="pattern", help="名前に含まれる文字列で絞り込む")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="結果を基準値として保存する")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="実行時間の許容悪化率（既定 25%%）")
+    parser.add_argument("--alloc-threshold", type=float, default=0.25, help="メモリの許容悪化率（既定 25%%）")
+    parser.add_argument("--min-delta-us", type=float, default=2.0, help="悪化とみなす最小の差（マイクロ秒）")
+    parser.add_argument("--min-time", type=float, default=0.2, help="1 計測あたりの最小秒数")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.pattern, args.min_time)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"{'ベンチマーク':<34}{'us/call':>12}{'基準':>12}{'peak(B)':>12}{'基準':>12}")
+    for name, r in results.items():
+        base = baseline.get(name, {})
+        print(f"{name:<34}{r['us_per_call']:>12}{base.get('us_per_call', '-'):>12}"
+              f"{r['peak_bytes']:>12}{base.get('peak_bytes', '-'):>12}")
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\n基準値を更新しました: {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.time_threshold, args.alloc_threshold, args.min_delta_us)
+    if regressions:
+        print("\n性能が悪化しています:")
+        for line in regressions:
+            print("  " + line)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+LINE Webhook の負荷試験
+
+署名付きの Webhook イベントを並列に送り、カンタン見積りのフロー全体を
+フェイク LINE / フェイク Sheets に対して実行する。シナリオごとに
+p50/p95/p99 レイテンシ・スループット・エラー率を出力する。
+
+    # アプリをこのプロセス内で起動して計測
+    python -m benchmarks.loadtest --users 20 --iterations 10 --sheets-latency-ms 150
+
+    # gunicorn で起動したアプリを計測（フェイクのポートとシークレットを合わせる）
+    python -m benchmarks.loadtest --target http://127.0.0.1:8000 --fake-line-port 8092 --fake-sheets-port 8091
+    LINE_CHANNEL_SECRET=loadtest-secret LINE_CHANNEL_ACCESS_TOKEN=loadtest-token \\
+    LINE_API_ENDPOINT=http://127.0.0.1:8092 FAKE_SHEETS_URL=http://127.0.0.1:8091 SPREADSHEET_KEY=loadtest \\
+        gunicorn -w 4 benchmarks.loadtest_app:app
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks import fake_line, fake_sheets
+
+CHANNEL_SECRET = "loadtest-secret"
+CHANNEL_ACCESS_TOKEN = "loadtest-token"
+SPREADSHEET_KEY = "loadtest"
+
+ESTIMATE_MESSAGES = ["カンタン見積り", "学生", "14日目以降", "ドライTシャツ", "パターンA", "50～99枚"]
+ITEMS = ["ドライTシャツ", "ハイクオリティーTシャツ", "ゲームシャツ", "バスケシャツ", "フーディーライトトレーナー"]
+
+
+# -----------------------
+# Webhook 生成
+# -----------------------
+def sign(body, channel_secret):
+    digest = hmac.new(channel_secret.encode("utf-8"), body.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def text_message_event(user_id, text):
+    return {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "webhookEventId": uuid.uuid4().hex,
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": uuid.uuid4().hex,
+        "message": {"id": str(random.getrandbits(48)), "type": "text", "text": text},
+    }
+
+
+def postback_event(user_id, data):
+    return {
+        "type": "postback",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "webhookEventId": uuid.uuid4().hex,
+        "deliveryContext": {"isRedelivery": False},
+        "replyToken": uuid.uuid4().hex,
+        "postback": {"data": data},
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}  # { scenario: [(latency_sec, ok), ...] }
+
+    def add(self, scenario, latency, ok):
+        with self.lock:
+            self.samples.setdefault(scenario, []).append((latency, ok))
+
+
+class TrafficGenerator:
+    def __init__(self, target, channel_secret, recorder):
+        self.target = target.rstrip("/")
+        self.channel_secret = channel_secret
+        self.recorder = recorder
+        self.local = threading.local()
+
+    @property
+    def http(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _timed(self, scenario, func):
+        started = time.perf_counter()
+        try:
+            response = func()
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        self.recorder.add(scenario, time.perf_counter() - started, ok)
+        return ok
+
+    def send_events(self, scenario, events):
+        body = json.dumps({"destination": "Uloadtest", "events": events}, ensure_ascii=False)
+        headers = {"Content-Type": "application/json", "X-Line-Signature": sign(body, self.channel_secret)}
+        return self._timed(scenario, lambda: self.http.post(
+            self.target + "/line/callback", data=body.encode("utf-8"), headers=headers, timeout=60))
+
+    # ---- シナリオ ----
+    def estimate_flow(self, user_id):
+        """カンタン見積り 6 ステップ（各 Webhook を estimate_step、全体を estimate_flow として記録）"""
+        messages = list(ESTIMATE_MESSAGES)
+        messages[3] = random.choice(ITEMS)
+        messages[4] = f"パターン{random.choice('ABCDEF')}"
+        started = time.perf_counter()
+        ok = all(self.send_events("estimate_step", [text_message_event(user_id, m)]) for m in messages)
+        self.recorder.add("estimate_flow", time.perf_counter() - started, ok)
+
+    def catalog_keyword(self, user_id):
+        self.send_events("catalog_keyword", [text_message_event(user_id, "キャンペーン")])
+
+    def consult_postback(self, user_id):
+        self.send_events("consult_postback", [postback_event(user_id, "CONSULT_DESIGN")])
+
+    def quotation_form(self, user_id):
+        self._timed("quotation_form", lambda: self.http.get(
+            self.target + "/quotation_form", params={"quote_no": str(int(time.time()))}, timeout=60))
+
+
+SCENARIOS = {
+    "estimate": TrafficGenerator.estimate_flow,
+    "catalog": TrafficGenerator.catalog_keyword,
+    "consult": TrafficGenerator.consult_postback,
+    "quotation_form": TrafficGenerator.quotation_form,
+}
+
+
+# -----------------------
+# 集計
+# -----------------------
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def summarize(recorder, elapsed):
+    report = {}
+    for scenario, samples in sorted(recorder.samples.items()):
+        latencies = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, ok in samples if not ok)
+        report[scenario] = {
+            "requests": len(samples),
+            "errors": errors,
+            "error_rate": round(errors / len(samples), 4),
+            "throughput_rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1),
+        }
+    return report
+
+
+def print_report(report, elapsed, fake_stats):
+    print(f"\n計測時間: {elapsed:.1f} 秒")
+    print(f"{'シナリオ':<18}{'件数':>8}{'エラー率':>10}{'req/s':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for scenario, r in report.items():
+        print(f"{scenario:<18}{r['requests']:>8}{r['error_rate']:>10.2%}{r['throughput_rps']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    print("\nフェイク LINE :", fake_stats["line"])
+    print("フェイク Sheets:", fake_stats["sheets"])
+
+
+# -----------------------
+# 実行
+# -----------------------
+def start_app_in_process(line_url, sheets_url, read_quota=0, write_quota=0):
+    """
+    環境変数をフェイク向けに設定してからアプリを import し、Sheets 接続をフェイクに差し替えて別スレッドで起動する。
+    フェイク側にクォータを設定した場合は、アプリのクォータ予算も同じ値にする。
+    """
+    os.environ.update({
+        "LINE_CHANNEL_SECRET": CHANNEL_SECRET,
+        "LINE_CHANNEL_ACCESS_TOKEN": CHANNEL_ACCESS_TOKEN,
+        "LINE_API_ENDPOINT": line_url,
+        "SPREADSHEET_KEY": SPREADSHEET_KEY,
+    })
+    if read_quota:
+        os.environ["SHEETS_READ_QUOTA_PER_MIN"] = str(read_quota)
+    if write_quota:
+        os.environ["SHEETS_WRITE_QUOTA_PER_MIN"] = str(write_quota)
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import Bro_shop_test
+
+    fake_sheets.install(Bro_shop_test, sheets_url)
+    Bro_shop_test.start_background_jobs()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = make_server("127.0.0.1", 0, Bro_shop_test.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def run(args):
+    line_server, line_url = fake_line.start_server(
+        args.fake_line_port, latency_ms=args.line_latency_ms, jitter_ms=args.line_latency_ms / 2)
+    sheets_server, sheets_url = fake_sheets.start_server(
+        args.fake_sheets_port, latency_ms=args.sheets_latency_ms, jitter_ms=args.sheets_latency_ms / 2,
+        read_quota=args.read_quota, write_quota=args.write_quota)
+
+    # 本番同様、見積シートは作成済みの状態から始める（初回の同時作成競合を避ける）
+    fake_sheets.FakeSheetsClient(sheets_url).open_by_key(SPREADSHEET_KEY).add_worksheet("Simple Estimate_1")
+
+    target = args.target or start_app_in_process(line_url, sheets_url, args.read_quota, args.write_quota)
+    channel_secret = CHANNEL_SECRET if not args.target else args.channel_secret
+    print(f"対象: {target} / フェイク LINE: {line_url} / フェイク Sheets: {sheets_url}")
+
+    recorder = Recorder()
+    generator = TrafficGenerator(target, channel_secret, recorder)
+    scenarios = [SCENARIOS[name] for name in args.scenarios]
+
+    def virtual_user(n):
+        user_id = f"Uload{n:06d}"
+        for scenario in itertools.islice(itertools.cycle(scenarios), n % len(scenarios),
+                                         n % len(scenarios) + args.iterations):
+            scenario(generator, user_id)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(virtual_user, range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    fake_stats = {
+        "line": requests.get(line_url + "/_admin/stats", timeout=10).json(),
+        "sheets": {k: v for k, v in requests.get(sheets_url + "/_admin/stats", timeout=10).json().items()
+                   if k != "sheets"},
+    }
+    report = summarize(recorder, elapsed)
+    print_report(report, elapsed, fake_stats)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"elapsed_sec": elapsed, "scenarios": report, "fakes": fake_stats,
+                       "config": vars(args)}, f, ensure_ascii=False, indent=2)
+
+    line_server.shutdown()
+    sheets_server.shutdown()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LINE Webhook の負荷試験（フェイク LINE / Sheets 使用）")
+    parser.add_argument("--target", help="計測対象の URL（省略時はプロセス内でアプリを起動）")
+    parser.add_argument("--channel-secret", default=CHANNEL_SECRET, help="--target 使用時の署名シークレット")
+    parser.add_argument("--users", type=int, default=10, help="同時ユーザー数")
+    parser.add_argument("--iterations", type=int, default=5, help="1ユーザーあたりのシナリオ実行回数")
+    parser.add_argument("--scenarios", nargs="+", default=["estimate", "catalog", "consult"],
+                        choices=sorted(SCENARIOS))
+    parser.add_argument("--line-latency-ms", type=float, default=50)
+    parser.add_argument("--sheets-latency-ms", type=float, default=150)
+    parser.add_argument("--read-quota", type=int, default=0, help="フェイク Sheets の1分あたり読み取り上限")
+    parser.add_argument("--write-quota", type=int, default=0, help="フェイク Sheets の1分あたり書き込み上限")
+    parser.add_argument("--fake-line-port", type=int, default=0)
+    parser.add_argument("--fake-sheets-port", type=int, default=0)
+    parser.add_argument("--json-out", help="結果を JSON で保存するパス")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    return 1 if any(r["errors"] for r in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+"""
+負荷試験用に gunicorn で起動するアプリ（Sheets 接続をフェイクに差し替える）
+
+    FAKE_SHEETS_URL=http://127.0.0.1:8091 ... gunicorn -w 4 benchmarks.loadtest_app:app
+
+バックグラウンドジョブはリポジトリ直下の gunicorn.conf.py（post_worker_init）が、差し替えた後に起動する。
+
+その他の環境変数は benchmarks/loadtest.py を参照。
+"""
+import os
+
+import Bro_shop_test
+from benchmarks import fake_sheets
+
+fake_sheets.install(Bro_shop_test, os.environ["FAKE_SHEETS_URL"])
+
+app = Bro_shop_test.app
@@ -0,0 +1,118 @@
+"""
+管理者向け検索（quote_search.SearchIndex）のベンチマーク
+
+一時ファイルの索引にランダムな見積・カタログ請求の行を登録し、次を計測する。
+
+- 一括登録（rebuild 相当）と、1 行ずつの反映（保存のたびの index_quote 相当）
+- 電話番号（ハイフンの有無）・氏名・学校名・ユーザーID・ボディ品番・1 文字などの検索の所要時間
+  （1 ページ目と深いページ）
+
+    python -m benchmarks.quote_search_bench                # 見積 10 万件 + カタログ請求 2 万件
+    python -m benchmarks.quote_search_bench --quotes 300000 --catalog 50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import quote_search
+
+SURNAMES = ["田中", "佐藤", "鈴木", "高橋", "伊藤", "渡辺", "山本", "中村", "小林", "加藤", "吉田", "山田"]
+GIVEN_NAMES = ["太郎", "花子", "健太", "美咲", "翔", "さくら", "大輝", "陽菜", "蓮", "結衣"]
+SCHOOLS = ["東京都立青山高校", "大阪府立北野高校", "横浜市立南高校", "名古屋大学", "京都産業大学",
+           "福岡県立修猷館高校", "札幌南高校", "仙台第二高校", "広島大学附属高校", "神戸高校"]
+BODIES = [("00085-CVT", "ヘビーウェイトTシャツ"), ("00300-ACT", "ドライTシャツ"), ("00216-MCP", "ジップパーカー"),
+          ("5001-01", "ハイクオリティーTシャツ"), ("00350-AIT", "ドライロングスリープTシャツ")]
+
+
+def quote_row(rng, i, base):
+    row = [""] * 66
+    row[0] = time.strftime("%Y/%m/%d %H:%M:%S", time.localtime(base + i * 60))
+    row[1] = str(base + i)
+    row[2] = "U" + "%032x" % rng.getrandbits(128)
+    row[3] = rng.choice(["学生", "一般"])
+    code, name = rng.choice(BODIES)
+    row[5], row[6], row[7] = name, rng.choice("ABCDEF").join(["パターン", ""]), "50～99枚"
+    row[8] = rng.randrange(20, 300) * 1000
+    row[15], row[16] = code, name
+    row[50] = rng.choice(SURNAMES) if rng.random() < 0.3 else ""
+    row[61] = f"{rng.choice(SCHOOLS)} {rng.randrange(1, 4)}年 体育祭用" if rng.random() < 0.5 else ""
+    return row
+
+
+def catalog_row(rng, i, base):
+    phone = f"0{rng.choice([70, 80, 90])}-{rng.randrange(10000):04d}-{rng.randrange(10000):04d}"
+    return [
+        time.strftime("%Y/%m/%d %H:%M:%S", time.localtime(base + i * 300)),
+        rng.choice(SURNAMES) + " " + rng.choice(GIVEN_NAMES),
+        f"{rng.randrange(1000000, 9999999)}", "東京都渋谷区神宮前1-2-3", phone,
+        f"user{i}@example.com", f"@insta_{i}", f"{rng.choice(SCHOOLS)} {rng.randrange(1, 4)}年", "",
+    ]
+
+
+def measure(index, query, kind=None, page=1, repeat=20):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = index.search(query, kind=kind, page=page)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result["total"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="管理者向け検索のベンチマーク")
+    parser.add_argument("--quotes", type=int, default=100_000)
+    parser.add_argument("--catalog", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    base = 1_700_000_000
+    quotes = [quote_row(rng, i, base) for i in range(args.quotes)]
+    catalog = [catalog_row(rng, i, base) for i in range(args.catalog)]
+
+    with tempfile.TemporaryDirectory(prefix="quote-search-") as tmp:
+        index = quote_search.SearchIndex(os.path.join(tmp, "quote_search.db"))
+        started = time.perf_counter()
+        for start in range(0, len(quotes), 1000):
+            index.add_many(quote_search.QUOTE, quotes[start:start + 1000])
+        for start in range(0, len(catalog), 1000):
+            index.add_many(quote_search.CATALOG, catalog[start:start + 1000])
+        index.optimize()
+        bulk = time.perf_counter() - started
+        size = os.path.getsize(index.path)
+
+        # 保存のたびの反映（既存の見積の更新）
+        started = time.perf_counter()
+        for row in rng.sample(quotes, 200):
+            index.index_quote(row)
+        single = (time.perf_counter() - started) / 200
+
+        phone = catalog[len(catalog) // 2][4]
+        samples = [
+            ("電話番号（ハイフン付き）", phone, None),
+            ("電話番号（ハイフン無し・一部）", phone.replace("-", "")[3:], None),
+            ("氏名（姓）", "田中", quote_search.CATALOG),
+            ("氏名（全角スペース付き）", "田中　太郎", quote_search.CATALOG),
+            ("学校名", "北野高校", None),
+            ("ユーザーID（一部）", quotes[123][2][5:15], quote_search.QUOTE),
+            ("ボディ品番", "00085-cvt", None),
+            ("1 文字", "蓮", None),
+            ("該当なし", "存在しない学校", None),
+        ]
+        print(f"登録        : 見積 {len(quotes):,} 件 + カタログ請求 {len(catalog):,} 件"
+              f"（{bulk:.1f} 秒、索引 {size / 1024 / 1024:,.1f} MiB）")
+        print(f"1 行の反映  : {single * 1000:.2f} ms")
+        for label, query, kind in samples:
+            seconds, total = measure(index, query, kind)
+            print(f"{label:<28}: {seconds * 1000:7.2f} ms（{total:,} 件）")
+        seconds, total = measure(index, "高校", page=200)
+        print(f"{'学校名（200 ページ目）':<28}: {seconds * 1000:7.2f} ms（{total:,} 件）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+見積シート保存（quote_store.upsert_quote）のマルチプロセス負荷試験
+
+フェイク Sheets を起動し、複数プロセスが少数の見積番号に対して同時に保存を繰り返す。
+終了後にシートを読み、次を確認する。
+
+- 同じ見積番号の行が 1 行だけであること（重複追記が無い）
+- 各行のバージョンが、全プロセスで成功した保存回数と一致すること（更新の取りこぼしが無い）
+
+--stale-rate の割合の保存は「読んでから少し待って expected_version 付きで保存」し、
+その間に他プロセスが更新していれば QuoteConflict になることを確認する。
+--naive で以前の「全行を読む → 無ければ追記」に切り替えると重複が再現する。
+
+    python -m benchmarks.quote_store_stress                       # 8 プロセス × 40 回、見積番号 5 件
+    python -m benchmarks.quote_store_stress -p 16 -n 100 --quotes 3 --latency-ms 20
+    python -m benchmarks.quote_store_stress --naive
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks import fake_sheets
+
+SPREADSHEET_KEY = "quote-store-stress"
+SHEET_TITLE = "Simple Estimate_1"
+
+
+def make_row(quote_no, worker_id, seq):
+    import quote_store
+    row = [""] * quote_store.ROW_WIDTH
+    row[0] = time.strftime("%Y/%m/%d %H:%M:%S")
+    row[1] = quote_no
+    row[63] = f"worker={worker_id} seq={seq}"  # その他備考
+    return row
+
+
+def naive_upsert(worksheet, quote_no, row):
+    """以前の保存処理（全行を読み、見つからなければ追記）"""
+    records = worksheet.get_all_values()
+    for idx, existing in enumerate(records[1:], start=2):
+        if len(existing) > 1 and existing[1] == quote_no:
+            worksheet.update(f"A{idx}:BN{idx}", [row])
+            return
+    worksheet.append_row(row, value_input_option="USER_ENTERED")
+
+
+def worker(base_url, lock_dir, worker_id, quote_nos, writes, stale_rate, naive, seed, results):
+    import quote_store
+    quote_store.QUOTE_LOCK_DIR = lock_dir
+
+    rng = random.Random(seed)
+    worksheet = fake_sheets.FakeSheetsClient(base_url).open_by_key(SPREADSHEET_KEY).worksheet(SHEET_TITLE)
+    succeeded = Counter()
+    conflicts = 0
+    errors = 0
+    for seq in range(writes):
+        quote_no = rng.choice(quote_nos)
+        row = make_row(quote_no, worker_id, seq)
+        try:
+            if naive:
+                naive_upsert(worksheet, quote_no, row)
+            elif rng.random() < stale_rate:
+                # フォームを開いてから送信するまでの間を再現する
+                _, version = quote_store.find_quote(worksheet, quote_no)
+                time.sleep(rng.uniform(0, 0.02))
+                quote_store.upsert_quote(worksheet, quote_no, row, expected_version=version)
+            else:
+                quote_store.upsert_quote(worksheet, quote_no, row)
+            succeeded[quote_no] += 1
+        except quote_store.QuoteConflict:
+            conflicts += 1
+        except Exception as e:
+            print(f"worker {worker_id}: {e!r}", file=sys.stderr)
+            errors += 1
+    results.put((dict(succeeded), conflicts, errors))
+
+
+def check(worksheet, succeeded, naive):
+    """違反の一覧を返す"""
+    import quote_store
+    rows = worksheet.get_all_values()[1:]
+    counts = Counter(row[1] for row in rows if len(row) > 1)
+    problems = [f"見積番号 {q} が {n} 行あります" for q, n in sorted(counts.items()) if n > 1]
+    problems += [f"見積番号 {q} の行がありません" for q in sorted(succeeded) if q not in counts]
+    if naive:
+        return problems
+
+    for row in rows:
+        quote_no = row[1]
+        version = quote_store.parse_version(row[66] if len(row) > 66 else "")
+        if version != succeeded.get(quote_no, 0):
+            problems.append(f"見積番号 {quote_no}: バージョン {version} / 成功した保存 {succeeded.get(quote_no, 0)} 回")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="見積シート保存のマルチプロセス負荷試験")
+    parser.add_argument("-p", "--processes", type=int, default=8)
+    parser.add_argument("-n", "--writes", type=int, default=40, help="1 プロセスあたりの保存回数")
+    parser.add_argument("--quotes", type=int, default=5, help="保存先の見積番号の数（少ないほど競合する）")
+    parser.add_argument("--stale-rate", type=float, default=0.2, help="expected_version 付きで保存する割合")
+    parser.add_argument("--latency-ms", type=float, default=5, help="フェイク Sheets の応答遅延")
+    parser.add_argument("--naive", action="store_true", help="以前の保存処理（ロック・バージョン無し）で試す")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    server, base_url = fake_sheets.start_server(latency_ms=args.latency_ms, jitter_ms=args.latency_ms)
+    spreadsheet = fake_sheets.FakeSheetsClient(base_url).open_by_key(SPREADSHEET_KEY)
+    worksheet = spreadsheet.add_worksheet(SHEET_TITLE)
+    worksheet.update("A1:C1", [["日時", "見積番号", "ユーザーID"]])
+
+    base_seed = args.seed if args.seed is not None else random.randrange(1 << 30)
+    quote_nos = [str(1700000000 + i) for i in range(args.quotes)]
+    lock_dir = tempfile.mkdtemp(prefix="quote-locks-")
+
+    # フェイクサーバのスレッドを子プロセスに持ち込まないよう spawn で起動する
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(base_url, lock_dir, i, quote_nos, args.writes,
+                                         args.stale_rate, args.naive, base_seed + i, results))
+        for i in range(args.processes)
+    ]
+    started = time.perf_counter()
+    for p in processes:
+        p.start()
+    outcomes = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    succeeded = Counter()
+    for counts, _, _ in outcomes:
+        succeeded.update(counts)
+    conflicts = sum(c for _, c, _ in outcomes)
+    errors = sum(e for _, _, e in outcomes)
+    problems = check(worksheet, succeeded, args.naive)
+    server.shutdown()
+
+    total = sum(succeeded.values())
+    print(f"モード      : {'以前の保存処理' if args.naive else 'upsert_quote'}（seed={base_seed}）")
+    print(f"保存        : 成功 {total:,} / 競合 {conflicts:,} / エラー {errors:,}")
+    print(f"所要時間    : {elapsed:.2f} 秒（{total / elapsed:,.1f} 件/秒）")
+    if problems:
+        print(f"違反 {len(problems)} 件:")
+        for problem in problems[:20]:
+            print("  " + problem)
+        return 1
+    print("違反なし")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+スプレッドシートの変更検知（プロセス内キャッシュの無効化）
+
+スタッフはシート上で直接 パターン料金・送料・納期(希望日) などを編集するため、
+プロセス内のキャッシュ（見積フォームの初期値・アーカイブの索引）が古いまま残ることがある。
+
+CHANGE_FEED_INTERVAL 秒ごとに Drive のメタデータ（スプレッドシートの最終更新時刻）だけを取得し、
+変わっていたときだけ登録したリスナーを呼ぶ。リスナーは fetch_rows でキャッシュしている行だけを
+読み直して比べる（見積番号の列 + 該当行のブロック）。1 万行のシートでも全行・全列は読まない。
+
+    feed = ChangeFeed(open_spreadsheet)
+
+    @feed.on_change
+    def refresh(spreadsheet): ...
+
+    feed.start()
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import gspread.utils
+
+import metrics
+from sheets_quota import sheets_priority
+
+CHANGE_FEED_INTERVAL = float(os.environ.get("CHANGE_FEED_INTERVAL", "30"))
+# 離れた行をまとめて 1 つの範囲で読むときの、間に挟んでよい行数
+BLOCK_GAP = 8
+
+CHANGE_POLLS = metrics.counter(
+    "sheet_change_polls_total", "変更検知の実行数（unchanged / changed / error）", ["result"]
+)
+CHANGE_INVALIDATIONS = metrics.counter(
+    "sheet_change_invalidations_total", "変更検知で無効化したキャッシュのエントリ数", ["cache"]
+)
+
+
+def digest(values):
+    """dict / list の値を文字列にそろえたハッシュ（数値化の有無による違いは無視する）"""
+    if isinstance(values, dict):
+        values = {key: str(value) for key, value in values.items()}
+    else:
+        values = [str(value) for value in values]
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _blocks(row_indexes):
+    """行番号 → BLOCK_GAP 以内の間隔の行をまとめた区間 [(開始, 終了), ...]"""
+    blocks = []
+    for i in sorted(row_indexes):
+        if blocks and i - blocks[-1][1] <= BLOCK_GAP + 1:
+            blocks[-1][1] = i
+        else:
+            blocks.append([i, i])
+    return [tuple(block) for block in blocks]
+
+
+def fetch_rows(worksheet, keys, width, key_column=2):
+    """
+    キー（既定は B 列の見積番号）が keys に含まれる行だけを読み、(ヘッダー, {キー: 行}) を返す。
+    読み取りはキーの列と、該当行をまとめたブロック（+ ヘッダー行）の 2 回。
+    シートに無くなったキーは結果に含まれない。
+    """
+    wanted = set(keys)
+    positions = {}
+    for row_index, key in enumerate(worksheet.col_values(key_column), start=1):
+        if row_index > 1 and key in wanted and key not in positions:
+            positions[key] = row_index
+    last_col = gspread.utils.rowcol_to_a1(1, width)[:-1]
+    blocks = _blocks(positions.values())
+    ranges = [f"A1:{last_col}1"] + [f"A{start}:{last_col}{end}" for start, end in blocks]
+    values = worksheet.batch_get(ranges)
+
+    header = list(values[0][0]) if values[0] else []
+    rows = {}
+    for (start, end), block in zip(blocks, values[1:]):
+        for offset in range(min(end - start + 1, len(block))):
+            row = list(block[offset])
+            key = row[key_column - 1] if len(row) >= key_column else ""
+            # 読む間に行がずれていないか、行の中身のキーで確かめる
+            if key in wanted and key not in rows:
+                rows[key] = row
+    return header, rows
+
+
+class ChangeFeed:
+    def __init__(self, open_spreadsheet, interval=None):
+        self.open_spreadsheet = open_spreadsheet  # () → gspread.Spreadsheet
+        self.interval = CHANGE_FEED_INTERVAL if interval is None else interval
+        self._listeners = []
+        self._last_modified = None
+        self._thread = None
+
+    def on_change(self, listener):
+        """スプレッドシートが更新されていたときに listener(spreadsheet) を呼ぶ（デコレータとしても使える）"""
+        self._listeners.append(listener)
+        return listener
+
+    @staticmethod
+    def last_modified(spreadsheet):
+        # gspread 6 は get_lastUpdateTime()、5 系は lastUpdateTime（どちらも Drive API）
+        getter = getattr(spreadsheet, "get_lastUpdateTime", None)
+        if getter is not None:
+            return getter()
+        return getattr(spreadsheet, "lastUpdateTime", None)
+
+    def poll(self):
+        """更新があればリスナーを呼び、True を返す。最終更新時刻が取れない場合は毎回呼ぶ"""
+        # 失敗しても次回また確かめればよいので、保存処理のクォータには手を付けない
+        with sheets_priority("prefill"):
+            spreadsheet = self.open_spreadsheet()
+            modified = self.last_modified(spreadsheet)
+            if modified is not None and modified == self._last_modified:
+                CHANGE_POLLS.inc(result="unchanged")
+                return False
+            for listener in self._listeners:
+                listener(spreadsheet)
+        # リスナーがすべて成功してから進める（失敗したら次回やり直す）
+        self._last_modified = modified
+        CHANGE_POLLS.inc(result="changed")
+        return True
+
+    def start(self):
+        """interval 秒ごとに poll するデーモンスレッドを起動する（0 以下なら起動しない）"""
+        if self.interval <= 0 or self._thread is not None or not self._listeners:
+            return
+        self._thread = threading.Thread(target=self._run, name="sheet-change-feed", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.poll()
+            except Exception as e:
+                CHANGE_POLLS.inc(result="error")
+                print("変更検知のエラー:", e)
@@ -0,0 +1,147 @@
+"""
+HTTP レスポンスの圧縮（gzip / Brotli）と ETag
+
+LINE のアプリ内ブラウザは回線が遅いことが多く、フォームの HTML（見積番号管理フォームは約 100KB）を
+非圧縮で返すと表示までに時間がかかる。after_request で以下を行う。
+
+    - Accept-Encoding に応じて br（brotli モジュールがある場合）または gzip で圧縮
+    - 本文のハッシュから強い ETag を付与し、If-None-Match が一致すれば 304 を返す
+    - キャッシュ可能なレスポンス（no-store でないもの）は圧縮結果をメモリに保持して使い回す
+
+ワンタイムトークンを含むフォームの HTML は no-store なので、毎回圧縮し ETag も付けない
+（古いトークンの HTML を 304 で使い回されると送信時にトークン不一致になるため）。
+
+    compression.init_app(app)
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli は任意。無ければ gzip のみ
+    brotli = None
+
+COMPRESSIBLE_TYPES = frozenset([
+    "text/html", "text/css", "text/plain", "text/javascript",
+    "application/javascript", "application/json", "image/svg+xml",
+])
+MIN_SIZE = 1024  # これより小さい本文は圧縮しても効果が薄い
+
+COMPRESSED_RESPONSES = metrics.counter(
+    "http_compressed_responses_total", "圧縮して返したレスポンス数", ["encoding", "cached"]
+)
+NOT_MODIFIED = metrics.counter("http_not_modified_total", "If-None-Match により 304 を返した数")
+
+
+class _CompressedCache:
+    """(本文のハッシュ, エンコーディング) → 圧縮済みバイト列。合計サイズで上限を設ける"""
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                self._data.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self._data:
+                return
+            self._data[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and self._data:
+                _, old = self._data.popitem(last=False)
+                self.size -= len(old)
+
+
+compressed_cache = _CompressedCache()
+
+
+def accepted_encodings(header):
+    """Accept-Encoding から q>0 のエンコーディング名の集合を返す"""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(name)
+    return accepted
+
+
+def choose_encoding(header):
+    accepted = accepted_encodings(header or "")
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def compress_response(response, request, min_size=MIN_SIZE):
+    if request.method not in ("GET", "HEAD") or response.status_code != 200:
+        return response
+    if response.headers.get("Content-Encoding") or response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+
+    # send_file（/static）のストリームも読み込んで扱う
+    response.direct_passthrough = False
+    body = response.get_data()
+    response.vary.add("Accept-Encoding")
+
+    encoding = choose_encoding(request.headers.get("Accept-Encoding")) if len(body) >= min_size else None
+    cacheable = not response.cache_control.no_store
+
+    if cacheable:
+        digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        # 表現（エンコーディング）ごとに異なる強い ETag
+        response.set_etag(f"{digest}-{encoding}" if encoding else digest)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            NOT_MODIFIED.inc()
+            return response
+
+    if encoding:
+        key = (digest, encoding) if cacheable else None
+        data = compressed_cache.get(key) if cacheable else None
+        cached = data is not None
+        if data is None:
+            data = compress(body, encoding)
+            if cacheable:
+                compressed_cache.put(key, data)
+        response.set_data(data)
+        response.headers["Content-Encoding"] = encoding
+        COMPRESSED_RESPONSES.inc(encoding=encoding, cached="yes" if cached else "no")
+    return response
+
+
+def init_app(app, min_size=MIN_SIZE):
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request, min_size)
@@ -0,0 +1,129 @@
+"""
+会話フロー（ステートマシン）
+
+カンタン見積りのような「質問 → 選択 → 次の質問」の流れをデータとして定義し、
+起動時に 1 度だけコンパイルする。メッセージごとの処理は
+「現在の状態をタプルから取り出す → frozenset で入力を検証 → 回答を保存 → 次の状態へ」だけで済む。
+
+    ESTIMATE_FLOW = Flow("estimate", [
+        State("user_type", accept=["学生", "一般"], prompt=lambda answers: flex_user_type()),
+        State("usage_date", accept=["14日目以降", "14日目以内"], prompt=...,
+              derive={"discount_type": {"14日目以降": "早割", "14日目以内": "通常"}}),
+        ...
+    ])
+    flows = FlowRegistry([ESTIMATE_FLOW])
+
+    flows.start("estimate")                  # → (セッション, 最初の状態)
+    outcome = flows.advance(session, text)   # → Outcome(kind, flow, state, answers)
+
+セッションは {"flow": フロー名, "step": 1 始まりの状態番号, "answers": {...}} の dict。
+（"flow" が無い既存のセッションは既定のフローとして扱う）
+"""
+from collections import namedtuple
+
+NEXT = "next"        # 回答を受け付け、次の状態へ進んだ
+DONE = "done"        # 最後の状態の回答を受け付けた（フロー完了）
+INVALID = "invalid"  # 入力が不正（フローは中断）
+
+Outcome = namedtuple("Outcome", ["kind", "flow", "state", "answers"])
+
+
+class State:
+    """
+    1 つの質問。
+        key     … 回答を保存する answers のキー
+        accept  … 受け付ける入力の集合、または 入力 → 保存する値（不正なら None）の関数
+        prompt  … この状態に入ったときに送るメッセージを作る関数（answers を受け取る）
+        derive  … 回答から決まる追加項目 { キー: { 回答: 値 } }
+    """
+
+    __slots__ = ("key", "accept", "prompt", "derive", "_choices", "_resolve")
+
+    def __init__(self, key, accept, prompt, derive=None):
+        self.key = key
+        self.accept = accept
+        self.prompt = prompt
+        self.derive = dict(derive or {})
+        if callable(accept):
+            self._choices, self._resolve = None, accept
+        else:
+            self._choices, self._resolve = frozenset(accept), None
+
+    def resolve(self, message):
+        """入力を検証し、保存する値を返す（不正なら None）"""
+        if self._choices is not None:
+            return message if message in self._choices else None
+        return self._resolve(message)
+
+    def __repr__(self):
+        return f"State({self.key!r})"
+
+
+class Flow:
+    """
+    状態を順に並べたフロー。
+    on_complete は最後の質問に答えたときに呼び出し側が実行する処理（フローごとに異なる）。
+    """
+
+    def __init__(self, name, states, on_complete=None):
+        self.name = name
+        self.on_complete = on_complete
+        # 番号 → 状態（1 始まり。0 は未使用）
+        self.states = (None,) + tuple(states)
+        self.last_step = len(self.states) - 1
+        # 受け付けた回答で derive が引けないことが無いよう、定義時に確認する
+        for state in states:
+            if state._choices is None:
+                continue
+            for key, table in state.derive.items():
+                missing = state._choices - table.keys()
+                if missing:
+                    raise ValueError(f"{name}.{state.key}: {key} が未定義の回答があります: {sorted(missing)}")
+
+    def state(self, step):
+        if 0 < step <= self.last_step:
+            return self.states[step]
+        return None
+
+
+class FlowRegistry:
+    def __init__(self, flows, default=None):
+        self.flows = {flow.name: flow for flow in flows}
+        self.default = default or next(iter(self.flows))
+
+    def add(self, flow):
+        self.flows[flow.name] = flow
+
+    def start(self, name, **extra):
+        flow = self.flows[name]
+        session = {"flow": name, "step": 1, "answers": {}}
+        session.update(extra)
+        return session, flow.states[1]
+
+    def current_state(self, session):
+        return self.flows[session.get("flow", self.default)].state(session["step"])
+
+    def advance(self, session, message):
+        """
+        セッションを 1 手進める。session はその場で更新する。
+        戻り値の state は NEXT なら次の状態、DONE / INVALID なら回答した（できなかった）状態。
+        """
+        flow = self.flows[session.get("flow", self.default)]
+        state = flow.state(session["step"])
+        answers = session["answers"]
+        if state is None:
+            return Outcome(INVALID, flow, None, answers)
+
+        value = state.resolve(message)
+        if value is None:
+            return Outcome(INVALID, flow, state, answers)
+
+        answers[state.key] = value
+        for key, table in state.derive.items():
+            answers[key] = table[value]
+
+        if session["step"] == flow.last_step:
+            session["step"] = flow.last_step + 1
+            return Outcome(DONE, flow, state, answers)
+        session["step"] += 1
+        return Outcome(NEXT, flow, flow.states[session["step"]], answers)
@@ -0,0 +1,215 @@
+"""
+LINE のテキストメッセージ・ポストバックの振り分け
+
+    router = CommandRouter()
+
+    @router.command("#有人チャット", priority=True)   # 見積りフロー中でも優先する
+    def start_human_chat(event, user_message): ...
+
+    @router.command("カンタン見積り")
+    def start_estimate(event, user_message): ...
+
+    @router.keyword("キャンペーン", "catalog")        # 部分一致
+    def catalog(event, user_message): ...
+
+    key = router.normalize(user_message)               # NFKC + 大文字小文字の同一視を 1 回だけ
+    handler = router.route_priority(key) or router.route(key)
+
+完全一致は dict、部分一致は全キーワードをまとめた Aho–Corasick オートマトンで 1 回の走査で判定する。
+キーワードやコマンドを増やしても、メッセージ 1 件あたりのコストはほぼ変わらない。
+
+ポストバックは PostbackRegistry で同様に振り分ける。
+"""
+import re
+import time
+import unicodedata
+from collections import deque
+
+import metrics
+
+
+# -----------------------
+# テキストメッセージ
+# -----------------------
+def normalize_command(text):
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+class KeywordMatcher:
+    """
+    Aho–Corasick による複数キーワードの部分一致。
+    複数のキーワードが含まれる場合は、登録順が最も早いものの値を返す。
+    ほとんどのメッセージはどのキーワードも含まないので、まず全キーワードの正規表現（C 実装）で
+    含むかどうかだけを判定し、含む場合のみオートマトンで優先順位を決める。
+    """
+
+    def __init__(self):
+        self._keywords = []  # [(キーワード, 値)]（登録順）
+        self._compiled = None
+
+    def add(self, keyword, value):
+        keyword = normalize_command(keyword)
+        if not keyword:
+            raise ValueError("空のキーワードは登録できません")
+        self._keywords.append((keyword, value))
+        self._compiled = None
+
+    def _compile(self):
+        goto = [{}]   # ノード → { 文字: 次のノード }
+        output = [None]  # ノード → そのノードで一致する最優先のキーワード番号
+        for priority, (keyword, _) in enumerate(self._keywords):
+            node = 0
+            for ch in keyword:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    output.append(None)
+                node = nxt
+            if output[node] is None or priority < output[node]:
+                output[node] = priority
+
+        # 失敗リンク（幅優先）。出力は失敗リンク先のものも併せ持たせる
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                inherited = output[fail[nxt]]
+                if inherited is not None and (output[nxt] is None or inherited < output[nxt]):
+                    output[nxt] = inherited
+                queue.append(nxt)
+        alternatives = sorted({keyword for keyword, _ in self._keywords}, key=len, reverse=True)
+        prefilter = re.compile("|".join(map(re.escape, alternatives)))
+        self._compiled = (prefilter, goto, fail, output)
+
+    def match(self, key):
+        """正規化済みの文字列 key に含まれるキーワードの値（無ければ None）"""
+        if not self._keywords:
+            return None
+        if self._compiled is None:
+            self._compile()
+        prefilter, goto, fail, output = self._compiled
+        if prefilter.search(key) is None:
+            return None
+        best = None
+        node = 0
+        for ch in key:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found = output[node]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+        return None if best is None else self._keywords[best][1]
+
+
+class CommandRouter:
+    def __init__(self):
+        self.priority_commands = {}
+        self.commands = {}
+        self.keywords = KeywordMatcher()
+
+    normalize = staticmethod(normalize_command)
+
+    def command(self, text, priority=False):
+        """完全一致のコマンドを登録する。priority=True は見積りフロー中でも優先する"""
+        def decorator(handler):
+            table = self.priority_commands if priority else self.commands
+            table[normalize_command(text)] = handler
+            return handler
+        return decorator
+
+    def keyword(self, *keywords):
+        """いずれかのキーワードを含むメッセージに反応するハンドラを登録する（登録順に優先）"""
+        def decorator(handler):
+            for keyword in keywords:
+                self.keywords.add(keyword, handler)
+            return handler
+        return decorator
+
+    def route_priority(self, key):
+        return self.priority_commands.get(key)
+
+    def route(self, key):
+        handler = self.commands.get(key)
+        if handler is None:
+            handler = self.keywords.match(key)
+        return handler
+
+
+# -----------------------
+# ポストバック
+# -----------------------
+POSTBACKS = metrics.counter("line_postbacks_total", "ポストバックの処理数", ["type", "result"])
+POSTBACK_LATENCY = metrics.histogram("line_postback_duration_seconds", "ポストバックの処理時間（秒）", ["type"])
+
+
+class PostbackRegistry:
+    """
+    ポストバックの data → ハンドラ。
+
+        @postbacks.exact("WEB_ORDER")
+        def web_order(event, data): ...
+
+        @postbacks.prefix("CONFIRM_ORDER:")
+        def confirm_order(event, data, rest): ...   # rest は接頭辞より後ろ
+
+    完全一致は dict、接頭辞は「登録されている接頭辞の長さごとに dict を 1 回引く」だけで決まる
+    （長い接頭辞を優先）。種類（登録したキー）ごとに件数と処理時間を /metrics に出す。
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._prefixes = {}
+        self._prefix_lengths = ()
+
+    def exact(self, key):
+        def decorator(handler):
+            self._exact[key] = handler
+            return handler
+        return decorator
+
+    def prefix(self, prefix):
+        def decorator(handler):
+            self._prefixes[prefix] = handler
+            self._prefix_lengths = tuple(sorted({len(p) for p in self._prefixes}, reverse=True))
+            return handler
+        return decorator
+
+    def resolve(self, data):
+        """(種類, ハンドラ, 追加引数) を返す。該当なしは (None, None, ())"""
+        handler = self._exact.get(data)
+        if handler is not None:
+            return data, handler, ()
+        for length in self._prefix_lengths:
+            prefix = data[:length]
+            handler = self._prefixes.get(prefix)
+            if handler is not None:
+                return prefix, handler, (data[length:],)
+        return None, None, ()
+
+    def dispatch(self, event, data):
+        """該当するハンドラを呼ぶ。該当が無ければ False"""
+        kind, handler, extra = self.resolve(data)
+        if handler is None:
+            POSTBACKS.inc(type="unknown", result="ignored")
+            return False
+
+        started = time.perf_counter()
+        try:
+            handler(event, data, *extra)
+        except Exception:
+            POSTBACKS.inc(type=kind, result="error")
+            raise
+        finally:
+            POSTBACK_LATENCY.observe(time.perf_counter() - started, type=kind)
+        POSTBACKS.inc(type=kind, result="ok")
+        return True
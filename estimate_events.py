@@ -0,0 +1,413 @@
+"""
+カンタン見積りのイベントログと集計（ファネル・売上）
+
+見積りフローの遷移ごとに固定長のレコードを 1 件、追記専用のファイルに書く。
+集計は前回読んだ位置から後ろだけを読んで積み上げるので、数百万件あっても
+/admin/stats はシートに触れずミリ秒で返る。
+
+レコード（リトルエンディアン 28 バイト）:
+    時刻(uint32) ユーザー(uint64) 種類(uint8) 状態番号(uint8) 回答 5 項目(uint16 × 5) 合計金額(uint32)
+    - ユーザーは LINE のユーザーID のハッシュ（ID そのものは残さない）
+    - 回答は文字列をラベル表（<ログ>.labels、1 行 1 ラベル、行番号がコード）で番号にしたもの。0 は未回答
+    - ファイルの先頭にはヘッダ b"EVT1" + レコード長(uint16) + 予備(uint16)
+
+gunicorn の各ワーカーが同じファイルへ O_APPEND で 1 レコードずつ書く（1 回の write で完結する）。
+集計の group-by は numpy があればまとめて（ベクトル演算で）、無ければ 1 件ずつ行う。
+
+    events = EventLog("estimate_events.log", fields=("user_type", "usage_date", "item", "pattern", "quantity"))
+    events.emit(START, user_id)
+    events.emit(ANSWER, user_id, step=2, answers=answers)
+    stats = EventStats(events).stats(days=7)
+"""
+import hashlib
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows（開発環境）ではラベル表の追記をプロセス内でのみ排他する
+    fcntl = None
+
+try:
+    import numpy
+except ImportError:  # numpy は任意。無ければ 1 件ずつ集計する
+    numpy = None
+
+ESTIMATE_EVENT_LOG = os.environ.get("ESTIMATE_EVENT_LOG") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "estimate_events.log"
+)
+
+START = 1     # カンタン見積りを開始した
+ANSWER = 2    # step 番目の質問に答えた
+INVALID = 3   # step 番目の質問で不正な入力（フロー中断）
+COMPLETE = 4  # 見積りを計算した（amount = 合計金額）
+KIND_NAMES = {START: "start", ANSWER: "answer", INVALID: "invalid", COMPLETE: "complete"}
+
+MAGIC = b"EVT1"
+FIELD_COUNT = 5
+RECORD = struct.Struct("<IQBB5HI")
+HEADER = struct.Struct("<4sHH")
+
+JST_OFFSET = 9 * 3600
+DAY = 24 * 3600
+
+if numpy is not None:
+    RECORD_DTYPE = numpy.dtype([
+        ("ts", "<u4"), ("user", "<u8"), ("kind", "u1"), ("step", "u1"),
+        ("answers", "<u2", (FIELD_COUNT,)), ("amount", "<u4"),
+    ])
+
+EVENTS_WRITTEN = metrics.counter("estimate_events_total", "見積りイベントの記録数", ["kind"])
+# emit のたびにラベルのキーを作らないよう、種類ごとに固定しておく
+_EVENTS_WRITTEN_BY_KIND = {kind: EVENTS_WRITTEN.labels(kind=name) for kind, name in KIND_NAMES.items()}
+
+
+def user_hash(user_id):
+    return int.from_bytes(hashlib.blake2b(user_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def day_of(ts):
+    """UNIX 時刻 → 日本時間の日番号（1970-01-01 からの日数）"""
+    return (ts + JST_OFFSET) // DAY
+
+
+def day_label(day):
+    return (datetime(1970, 1, 1) + timedelta(days=day)).strftime("%Y-%m-%d")
+
+
+# -----------------------
+# ラベル表
+# -----------------------
+class LabelTable:
+    """文字列 ⇔ コード（1 始まり）。追記のみで、既存のコードは変わらない"""
+
+    def __init__(self, path):
+        self.path = path
+        self._codes = {}
+        self._labels = [""]
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """他のプロセスが追記したラベルを読み込む"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().split("\n")[:-1]
+        except FileNotFoundError:
+            return
+        for label in lines[len(self._labels) - 1:]:
+            self._codes[label] = len(self._labels)
+            self._labels.append(label)
+
+    def code(self, label):
+        if not label:
+            return 0
+        code = self._codes.get(label)
+        if code is not None:
+            return code
+        with self._lock, open(self.path, "a+", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            self.refresh()
+            code = self._codes.get(label)
+            if code is None:
+                f.write(label.replace("\n", " ") + "\n")
+                f.flush()
+                code = len(self._labels)
+                self._codes[label] = code
+                self._labels.append(label)
+        return code
+
+    def label(self, code):
+        if code >= len(self._labels):
+            self.refresh()
+        return self._labels[code] if code < len(self._labels) else f"#{code}"
+
+
+# -----------------------
+# 書き込み
+# -----------------------
+class EventLog:
+    def __init__(self, path=ESTIMATE_EVENT_LOG, fields=()):
+        if len(fields) > FIELD_COUNT:
+            raise ValueError(f"回答の項目は {FIELD_COUNT} 個までです")
+        self.path = path
+        self.fields = tuple(fields)
+        self.labels = LabelTable(path + ".labels")
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        # gunicorn が fork した後はワーカーごとに開き直す
+        if self._fd is None or self._pid != os.getpid():
+            try:
+                fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                os.write(fd, HEADER.pack(MAGIC, RECORD.size, 0))
+                os.close(fd)
+            except FileExistsError:
+                pass
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            self._pid = os.getpid()
+        return self._fd
+
+    def encode(self, kind, user_id, step=0, answers=None, amount=0, ts=None):
+        codes = [0] * FIELD_COUNT
+        if answers:
+            for i, key in enumerate(self.fields):
+                value = answers.get(key)
+                if value is not None:
+                    codes[i] = self.labels.code(str(value))
+        return RECORD.pack(
+            int(time.time() if ts is None else ts), user_hash(user_id), kind, step, *codes, int(amount or 0)
+        )
+
+    def emit(self, kind, user_id, step=0, answers=None, amount=0):
+        """1 件追記する。集計用なので、書けなくても呼び出し元の処理は止めない"""
+        try:
+            record = self.encode(kind, user_id, step, answers, amount)
+            with self._lock:
+                os.write(self._open(), record)
+            _EVENTS_WRITTEN_BY_KIND[kind].inc()
+        except Exception as e:
+            print("見積りイベントの記録エラー:", e)
+
+
+# -----------------------
+# 集計
+# -----------------------
+def _group(keys, weights=None, vectorize=True):
+    """
+    キーの列（同じ長さのシーケンスのリスト）ごとの (件数, weights の合計)。
+    numpy があれば、列ごとの値を連番にしてから 1 つの整数キーにまとめ、
+    np.unique + bincount で一度に計算する。
+    """
+    if not len(keys[0]):
+        return {}
+    if numpy is not None and vectorize:
+        combined = None
+        values = []
+        for column in keys:
+            distinct, codes = numpy.unique(numpy.asarray(column), return_inverse=True)
+            values.append(distinct)
+            codes = codes.reshape(-1).astype(numpy.int64)
+            combined = codes if combined is None else combined * len(distinct) + codes
+        # 組み合わせの数は日数 × 回答の種類数なので int64 に収まる（収まらなければ 1 件ずつ）
+        if numpy.prod([float(len(v)) for v in values]) >= 2 ** 62:
+            return _group([numpy.asarray(k).tolist() for k in keys],
+                          None if weights is None else numpy.asarray(weights).tolist(), vectorize=False)
+        unique, inverse = numpy.unique(combined, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        counts = numpy.bincount(inverse, minlength=len(unique))
+        sums = (numpy.bincount(inverse, weights=numpy.asarray(weights, dtype=numpy.float64), minlength=len(unique))
+                if weights is not None else numpy.zeros(len(unique)))
+        # まとめたキーを列ごとの値に戻す
+        columns = []
+        for distinct in reversed(values):
+            columns.append(distinct[unique % len(distinct)].tolist())
+            unique = unique // len(distinct)
+        return {key: (int(c), int(s)) for key, c, s in zip(zip(*reversed(columns)), counts.tolist(), sums.tolist())}
+
+    result = {}
+    rows = zip(*keys)
+    if weights is None:
+        for key in rows:
+            count, total = result.get(key, (0, 0))
+            result[key] = (count + 1, total)
+    else:
+        for key, weight in zip(rows, weights):
+            count, total = result.get(key, (0, 0))
+            result[key] = (count + 1, total + weight)
+    return result
+
+
+def _add(target, key, count, total):
+    current = target.get(key)
+    target[key] = (count, total) if current is None else (current[0] + count, current[1] + total)
+
+
+def _merge(target, grouped):
+    for key, (count, total) in grouped.items():
+        _add(target, key, count, total)
+
+
+class EventStats:
+    """
+    ログを前回の続きから読み、日ごとの集計に積み上げる。
+        funnel   … (日, 種類, 状態番号) → (件数, 0)
+        users    … 日 → 見積りを開始したユーザーのハッシュ
+        reached  … (日, 状態番号, 回答 5 項目) → (件数, 0)（その質問に答えた時点の回答）
+        complete … (日, 回答 5 項目) → (件数, 合計金額の和)
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self._offset = HEADER.size
+        self._lock = threading.Lock()
+        self.funnel = {}
+        self.users = {}
+        self.reached = {}
+        self.complete = {}
+        self.events = 0
+        self._cached = (None, None)  # (条件, 結果)
+
+    def _read_new(self):
+        try:
+            with open(self.log.path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                # 書き込み途中のレコードは次回に回す
+                end = self._offset + (size - self._offset) // RECORD.size * RECORD.size
+                if end <= self._offset:
+                    return b""
+                f.seek(self._offset)
+                data = f.read(end - self._offset)
+        except FileNotFoundError:
+            return b""
+        self._offset += len(data)
+        return data
+
+    def _columns(self, data):
+        if numpy is not None:
+            records = numpy.frombuffer(data, dtype=RECORD_DTYPE)
+            answers = records["answers"]
+            return (day_of(records["ts"].astype(numpy.int64)), records["user"], records["kind"], records["step"],
+                    [answers[:, i] for i in range(FIELD_COUNT)], records["amount"])
+        rows = list(RECORD.iter_unpack(data))
+        columns = list(zip(*rows))
+        return ([day_of(ts) for ts in columns[0]], columns[1], columns[2], columns[3],
+                list(columns[4:4 + FIELD_COUNT]), columns[-1])
+
+    @staticmethod
+    def _select(mask, *columns):
+        if numpy is not None:
+            return [column[mask] for column in columns]
+        return [[v for v, m in zip(column, mask) if m] for column in columns]
+
+    def refresh(self):
+        """新しく追記されたイベントを集計に加え、その件数を返す"""
+        with self._lock:
+            data = self._read_new()
+            if not data:
+                return 0
+            days, users, kinds, steps, answers, amounts = self._columns(data)
+            _merge(self.funnel, _group([days, kinds, steps]))
+
+            if numpy is not None:
+                is_start, is_answer, is_complete = kinds == START, kinds == ANSWER, kinds == COMPLETE
+            else:
+                is_start = [k == START for k in kinds]
+                is_answer = [k == ANSWER for k in kinds]
+                is_complete = [k == COMPLETE for k in kinds]
+
+            start_days, start_users = self._select(is_start, days, users)
+            if numpy is not None:
+                start_days, start_users = start_days.tolist(), start_users.tolist()
+            for day, user in zip(start_days, start_users):
+                self.users.setdefault(day, set()).add(user)
+
+            selected = self._select(is_answer, days, steps, *answers)
+            _merge(self.reached, _group(selected))
+
+            selected = self._select(is_complete, days, amounts, *answers)
+            _merge(self.complete, _group([selected[0]] + selected[2:], weights=selected[1]))
+
+            count = len(data) // RECORD.size
+            self.events += count
+            return count
+
+    def stats(self, days=7, today=None, top=20):
+        """直近 days 日分の集計（JSON にそのまま出せる dict）。新しいイベントが無ければ前回の結果を返す"""
+        self.refresh()
+        last = day_of(int(time.time())) if today is None else today
+        # 集計の dict は refresh が別スレッドで更新するので、読み出しも同じロックの中で行う
+        with self._lock:
+            key = (self.events, days, last, top)
+            if self._cached[0] == key:
+                return self._cached[1]
+            result = self._summarize(days, last, top)
+            self._cached = (key, result)
+            return result
+
+    def _summarize(self, days, last, top):
+        fields = self.log.fields
+        labels = self.log.labels
+        window = range(last - days + 1, last + 1)
+        in_window = set(window)
+
+        completes_by_day = {}
+        for (day, *_), (count, _) in self.complete.items():
+            completes_by_day[day] = completes_by_day.get(day, 0) + count
+
+        daily = []
+        for day in window:
+            starts = self.funnel.get((day, START, 0), (0, 0))[0]
+            reached = [self.funnel.get((day, ANSWER, step), (0, 0))[0] for step in range(1, len(fields) + 1)]
+            steps = []
+            previous = starts
+            for step, key in enumerate(fields, start=1):
+                invalid = self.funnel.get((day, INVALID, step), (0, 0))[0]
+                steps.append({
+                    "step": step,
+                    "question": key,
+                    "answered": reached[step - 1],
+                    "invalid": invalid,
+                    # 前の質問まで答えたが、この質問に答えず（不正な入力でもなく）止まった数
+                    "dropped": max(previous - reached[step - 1] - invalid, 0),
+                })
+                previous = reached[step - 1]
+            completes = completes_by_day.get(day, 0)
+            daily.append({
+                "date": day_label(day),
+                "starts": starts,
+                "users": len(self.users.get(day, ())),
+                "steps": steps,
+                "completes": completes,
+                "conversion": round(completes / starts, 4) if starts else None,
+            })
+
+        # 回答の組み合わせごと・項目ごとの見積り件数と平均金額
+        combos = {}
+        by_field = {key: {} for key in fields}
+        for (day, *codes), (count, revenue) in self.complete.items():
+            if day not in in_window:
+                continue
+            _add(combos, tuple(codes[:len(fields)]), count, revenue)
+            for key, code in zip(fields, codes):
+                _add(by_field[key], code, count, revenue)
+
+        # 商品ごと：商品を選んだ件数のうち、見積りまで進んだ割合
+        items = {}
+        if "item" in fields:
+            item_step = fields.index("item") + 1
+            chosen = {}
+            for (day, step, *codes), (count, _) in self.reached.items():
+                if day in in_window and step == item_step:
+                    _add(chosen, codes[item_step - 1], count, 0)
+            for code, (count, _) in chosen.items():
+                completes = by_field["item"].get(code, (0, 0))[0]
+                items[labels.label(code)] = {
+                    "chosen": count, "completes": completes, "conversion": round(completes / count, 4),
+                }
+
+        def summary(count, revenue):
+            return {"completes": count, "average_total": round(revenue / count) if count else None}
+
+        return {
+            "days": daily,
+            "items": items,
+            "combos": [
+                {**{key: labels.label(code) for key, code in zip(fields, combo)}, **summary(count, revenue)}
+                for combo, (count, revenue) in sorted(combos.items(), key=lambda kv: kv[1][0], reverse=True)[:top]
+            ],
+            "by_answer": {
+                key: {labels.label(code): summary(count, revenue) for code, (count, revenue) in sorted(groups.items())}
+                for key, groups in by_field.items()
+            },
+            "events": self.events,
+        }
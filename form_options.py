@@ -0,0 +1,60 @@
+"""
+見積番号管理フォームの選択肢（select_options.json）
+
+選択肢は数百件あり（プリントデザイン 427 件、ボディカラー 131 件など）、HTML に毎回埋め込むと重い。
+/api/options で圧縮済み JSON として配信し、フォーム側は localStorage にキャッシュして使う。
+
+JSON とそのバージョン（内容のハッシュ）はファイルが更新されたときだけ作り直す。
+バージョンを URL（/api/options?v=...）に含めるので、そのレスポンスは immutable でキャッシュできる。
+"""
+import hashlib
+import json
+import os
+import threading
+
+OPTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "select_options.json")
+
+
+class FormOptions:
+    def __init__(self, path=OPTIONS_PATH):
+        self.path = path
+        self._state = None  # (バージョン, JSON, 選択肢) をまとめて差し替える
+        self._file_version = None  # (更新時刻, サイズ)
+        self._lock = threading.Lock()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _reload(self, file_version):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                options = json.load(f)
+        except Exception as e:
+            print("選択肢読み込みエラー:", e)
+            options = {}
+        payload = json.dumps(options, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._state = (hashlib.sha256(payload).hexdigest()[:12], payload, options)
+        self._file_version = file_version
+
+    def current(self):
+        """ファイルが更新されていれば読み直し、(バージョン, JSON のバイト列, 選択肢) を返す"""
+        file_version = self._stat()
+        if self._state is None or file_version != self._file_version:
+            with self._lock:
+                if self._state is None or file_version != self._file_version:
+                    self._reload(file_version)
+        return self._state
+
+    @property
+    def version(self):
+        return self.current()[0]
+
+    def get(self):
+        return self.current()[2]
+
+
+form_options = FormOptions()
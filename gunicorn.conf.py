@@ -0,0 +1,12 @@
+"""
+gunicorn の設定（リポジトリ直下で起動すると自動で読み込まれる）
+
+    gunicorn -w 4 Bro_shop_test:app
+"""
+
+
+def post_worker_init(worker):
+    # アーカイブ・変更検知のスレッドはワーカーごとに起動する（fork 前に起動したスレッドは引き継がれない）
+    from Bro_shop_test import start_background_jobs
+
+    start_background_jobs()
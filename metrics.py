@@ -0,0 +1,267 @@
+"""
+Prometheus テキスト形式のメトリクス（外部ライブラリ非依存・軽量）
+
+    REQUESTS = counter("http_requests_total", "HTTPリクエスト数", ["route", "method", "status"])
+    REQUESTS.inc(route="/", method="GET", status="200")
+
+    with observe_dependency("sheets", "append_row"):
+        worksheet.append_row(...)
+
+/metrics で render_metrics() の結果を返す。値はプロセス（gunicorn ワーカー）ごと。
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from tracing import start_span
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def labels(self, **labels):
+        """ラベルを固定した子を返す。呼び出しのたびにキーのタプルを作らずに inc できる"""
+        return _BoundCounter(self._values, self._key(labels))
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def collect(self):
+        # 新しいラベルの組が別スレッドで追加されても壊れないよう、ロックの中で写してから整形する
+        with _lock:
+            values = list(self._values.items())
+        lines = self.header()
+        for key, value in sorted(values):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class _BoundCounter:
+    __slots__ = ("_values", "_key")
+
+    def __init__(self, values, key):
+        self._values = values
+        self._key = key
+
+    def inc(self, amount=1):
+        with _lock:
+            self._values[self._key] = self._values.get(self._key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    set() で値を更新するか、set_function() で出力時に値を取得する
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, func, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._functions[key] = func
+
+    def get(self, **labels):
+        key = self._key(labels)
+        if key in self._functions:
+            return self._functions[key]()
+        return self._values.get(key, 0)
+
+    def collect(self):
+        lines = self.header()
+        with _lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        # 関数はロックの外で呼ぶ（関数側でロックを取ることがある）
+        for key, func in functions:
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                # [バケットごとの件数..., +Inf の件数], 合計値
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def collect(self):
+        # バケットの件数と合計がずれないよう、件数のリストごとロックの中で写す
+        with _lock:
+            values = [(key, (list(counts), total)) for key, (counts, total) in self._values.items()]
+        lines = self.header()
+        for key, (counts, total) in sorted(values):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return _register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, documentation, labelnames, buckets))
+
+
+def render_metrics():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# -----------------------
+# 外部依存（Google Sheets / LINE）の呼び出し計測
+# -----------------------
+DEPENDENCY_LATENCY = histogram(
+    "dependency_call_duration_seconds", "外部依存の呼び出し時間（秒）", ["dependency", "operation"]
+)
+DEPENDENCY_ERRORS = counter(
+    "dependency_call_errors_total", "外部依存の呼び出しエラー数", ["dependency", "operation", "error"]
+)
+
+
+@contextmanager
+def observe_dependency(dependency, operation):
+    """
+    外部依存の呼び出し時間・エラーを記録する（トレースの子スパンも作る）
+    """
+    started = time.perf_counter()
+    try:
+        with start_span(f"{dependency}.{operation}"):
+            yield
+    except Exception as e:
+        DEPENDENCY_ERRORS.inc(dependency=dependency, operation=operation, error=type(e).__name__)
+        raise
+    finally:
+        DEPENDENCY_LATENCY.observe(time.perf_counter() - started, dependency=dependency, operation=operation)
+
+
+class InstrumentedProxy:
+    """
+    オブジェクトの公開メソッド呼び出しを observe_dependency で計測するラッパー。
+    戻り値が wrap_types のインスタンスなら、それも同じ依存名でラップする
+    （gspread の Client → Spreadsheet → Worksheet を辿るため）。
+    """
+
+    def __init__(self, target, dependency, wrap_types=()):
+        self._target = target
+        self._dependency = dependency
+        self._wrap_types = tuple(wrap_types)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with observe_dependency(self._dependency, name):
+                result = attr(*args, **kwargs)
+            if self._wrap_types and isinstance(result, self._wrap_types):
+                return InstrumentedProxy(result, self._dependency, self._wrap_types)
+            return result
+
+        return call
+
+    def __repr__(self):
+        return f"InstrumentedProxy({self._target!r})"
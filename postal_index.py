@@ -0,0 +1,269 @@
+"""
+郵便番号 → 住所の検索（日本郵便 KEN_ALL.CSV から作るローカル索引）
+
+フォームの住所補完はブラウザから外部 API（zipcloud 等）を呼んでいたが、
+サーバ側の /api/postal/<zip> で引けるようにする。
+
+索引ファイルの形式（すべてリトルエンディアン）:
+    ヘッダ   b"PSTL" + バージョン(uint16) + 件数 N(uint32)
+    レコード N 件 × (郵便番号 uint32, 住所文字列の開始位置 uint32)  ※郵便番号の昇順
+    文字列   UTF-8。1 件の住所は「都道府県\\t市区町村\\t町域」、同じ郵便番号の複数住所は \\n 区切り。
+             終端は NUL。
+
+索引は mmap で開き、二分探索で引く（ファイル全体を読み込まない）。
+
+索引ファイル（postal.idx）はリポジトリに含めない。デプロイのビルド手順で作ること:
+
+    python postal_index.py build                             # 日本郵便から ken_all.zip を取得して作る
+    python postal_index.py build KEN_ALL.CSV -o postal.idx   # 手元の CSV / ken_all.zip から作る
+    python postal_index.py lookup 1000001
+
+索引が無い（作り忘れ・壊れている）間は、外部 API（zipcloud）に問い合わせて同じ形で返す。
+"""
+import argparse
+import csv
+import io
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import unicodedata
+import tempfile
+import zipfile
+
+import requests
+
+import metrics
+from ttl_cache import TTLCache
+
+MAGIC = b"PSTL"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHI")
+RECORD = struct.Struct("<II")
+
+POSTAL_INDEX_PATH = os.environ.get("POSTAL_INDEX_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "postal.idx"
+)
+
+KEN_ALL_URL = "https://www.post.japanpost.jp/zipcode/dl/kogaki/zip/ken_all.zip"
+ZIPCLOUD_URL = "https://zipcloud.ibsnet.co.jp/api/search"
+REMOTE_TIMEOUT = 5
+
+_PARENTHESES = re.compile(r"（.*?）|（.*$")
+_SEPARATORS = re.compile(r"[-‐−ー\s]")
+
+
+# -----------------------
+# 索引の作成
+# -----------------------
+def _open_csv(path):
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        name = next(n for n in archive.namelist() if n.upper().endswith(".CSV"))
+        return io.TextIOWrapper(archive.open(name), encoding="cp932", newline="")
+    return open(path, encoding="cp932", newline="")
+
+
+def _clean_town(town):
+    """町域として意味を持たない表記と、括弧内の補足（番地の範囲など）を取り除く"""
+    if town == "以下に掲載がない場合" or town.endswith("の次に番地がくる場合"):
+        return ""
+    if town.endswith("一円") and town != "一円":  # 「檜原村一円」等。地名の「一円」は残す
+        return ""
+    return _PARENTHESES.sub("", town)
+
+
+def read_ken_all(path):
+    """KEN_ALL.CSV を読み、{郵便番号(int): [(都道府県, 市区町村, 町域), ...]} を返す"""
+    addresses = {}
+    pending = None  # 括弧が閉じずに次の行へ続いている町域
+    with _open_csv(path) as f:
+        for row in csv.reader(f):
+            zipcode, pref, city, town = row[2], row[6], row[7], row[8]
+            if pending is not None:
+                # 町域が長いと複数行に分割される（同じ郵便番号で、括弧が閉じるまで続く）
+                pending_zip, pending_town = pending
+                if pending_zip == zipcode:
+                    town = pending_town + town
+                    if "）" not in town[town.rfind("（"):]:
+                        pending = (zipcode, town)
+                        continue
+                pending = None
+            if "（" in town and "）" not in town[town.rfind("（"):]:
+                pending = (zipcode, town)
+                continue
+
+            entry = (pref, city, _clean_town(town))
+            entries = addresses.setdefault(int(zipcode), [])
+            if entry not in entries:
+                entries.append(entry)
+    return addresses
+
+
+def write_index(addresses, out_path):
+    strings = bytearray()
+    records = []
+    for zipcode in sorted(addresses):
+        records.append((zipcode, len(strings)))
+        text = "\n".join("\t".join(entry) for entry in addresses[zipcode])
+        strings += text.encode("utf-8") + b"\0"
+
+    data_start = HEADER.size + RECORD.size * len(records)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(records)))
+        for zipcode, offset in records:
+            f.write(RECORD.pack(zipcode, data_start + offset))
+        f.write(strings)
+    os.replace(tmp_path, out_path)  # 稼働中のプロセスが読んでいても壊さない
+    return len(records)
+
+
+def build(csv_path, out_path=POSTAL_INDEX_PATH):
+    return write_index(read_ken_all(csv_path), out_path)
+
+
+def download_and_build(out_path=POSTAL_INDEX_PATH, url=KEN_ALL_URL):
+    """日本郵便の ken_all.zip を一時ファイルに取得して索引を作る"""
+    with tempfile.TemporaryDirectory(prefix="ken-all-") as tmp:
+        zip_path = os.path.join(tmp, "ken_all.zip")
+        with requests.get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with open(zip_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 16):
+                    f.write(chunk)
+        return build(zip_path, out_path)
+
+
+# -----------------------
+# 検索
+# -----------------------
+def normalize_zipcode(value):
+    """全角・ハイフン付きも受け付け、7 桁の数字でなければ None"""
+    digits = _SEPARATORS.sub("", unicodedata.normalize("NFKC", value or ""))
+    if len(digits) != 7 or not digits.isdigit():
+        return None
+    return digits
+
+
+class PostalIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"郵便番号索引の形式が不正です: {path}")
+
+    def _record(self, i):
+        return RECORD.unpack_from(self._mm, HEADER.size + RECORD.size * i)
+
+    def lookup(self, zipcode):
+        """郵便番号（7 桁の文字列）→ [{"prefecture", "city", "town"}, ...]（無ければ空リスト）"""
+        key = int(zipcode)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.count:
+            return []
+        found, offset = self._record(lo)
+        if found != key:
+            return []
+        end = self._mm.find(b"\0", offset)
+        text = self._mm[offset:end].decode("utf-8")
+        return [
+            dict(zip(("prefecture", "city", "town"), line.split("\t")))
+            for line in text.split("\n")
+        ]
+
+    def close(self):
+        self._mm.close()
+
+
+_index = None
+_index_lock = threading.Lock()
+_index_error_logged = False
+
+
+def get_index(path=None):
+    """
+    索引を開く（プロセスごとに 1 回）。索引ファイルが無ければ None。
+    開けなかった場合は次の呼び出しで開き直す（稼働中に build した索引も使われる）
+    """
+    global _index, _index_error_logged
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    _index = PostalIndex(path or POSTAL_INDEX_PATH)
+                except (OSError, ValueError) as e:
+                    if not _index_error_logged:
+                        _index_error_logged = True
+                        print("郵便番号索引の読み込みエラー（zipcloud で代替します）:", e)
+                    return None
+    return _index
+
+
+# -----------------------
+# 索引が無いときの外部 API
+# -----------------------
+_remote_cache = TTLCache("postal_remote", maxsize=1024, ttl=24 * 3600)
+
+
+def _lookup_remote(zipcode):
+    with metrics.observe_dependency("zipcloud", "search"):
+        response = requests.get(ZIPCLOUD_URL, params={"zipcode": zipcode}, timeout=REMOTE_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+    if data.get("status") != 200:
+        raise ValueError(data.get("message") or f"zipcloud status {data.get('status')}")
+    return [
+        {"prefecture": r.get("address1", ""), "city": r.get("address2", ""), "town": r.get("address3", "")}
+        for r in data.get("results") or []
+    ]
+
+
+def lookup(zipcode):
+    """
+    郵便番号（7 桁の文字列）→ [{"prefecture", "city", "town"}, ...]。
+    索引があれば索引を引き、無ければ zipcloud に問い合わせる（失敗時は requests / ValueError の例外）
+    """
+    index = get_index()
+    if index is not None:
+        return index.lookup(zipcode)
+    return _remote_cache.get_or_load(zipcode, _lookup_remote)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="郵便番号索引の作成・検索")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="KEN_ALL.CSV（または ken_all.zip）から索引を作る")
+    p_build.add_argument("csv", nargs="?", help="省略すると日本郵便から ken_all.zip を取得する")
+    p_build.add_argument("-o", "--output", default=POSTAL_INDEX_PATH)
+    p_lookup = sub.add_parser("lookup", help="郵便番号を引く")
+    p_lookup.add_argument("zipcode")
+    p_lookup.add_argument("--index", default=POSTAL_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build(args.csv, args.output) if args.csv else download_and_build(args.output)
+        print(f"{count} 件の郵便番号を {args.output} に書き出しました")
+        return 0
+
+    zipcode = normalize_zipcode(args.zipcode)
+    if zipcode is None:
+        print("郵便番号は 7 桁で指定してください")
+        return 2
+    for entry in PostalIndex(args.index).lookup(zipcode):
+        print(entry["prefecture"] + entry["city"] + entry["town"])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+簡易見積の価格計算ロジック
+
+Flask / LINE / gspread に依存しないため、Webhook からもバッチ処理
+（quote_simulator.py）からも同じ計算を利用できる。
+"""
+import unicodedata
+from bisect import bisect_right
+
+from PRICE_TABLE_2025 import PRICE_TABLE_GENERAL, PRICE_TABLE_STUDENT
+from products import resolve_product_id
+
+# ▼ 枚数レンジ（価格表の区分）と、その下限枚数
+QUANTITY_RANGES = ("10〜19枚", "20〜29枚", "30〜39枚", "40〜49枚", "50〜99枚", "100枚以上")
+QUANTITY_BREAKPOINTS = (10, 20, 30, 40, 50, 100)
+
+# ▼ 数値換算マップ（枚数ラベル → 枚数）
+QUANTITY_MAP = dict(zip(QUANTITY_RANGES, QUANTITY_BREAKPOINTS))
+
+
+def get_quantity_tier(qty):
+    """
+    枚数 → 価格区分のインデックス（二分探索）。
+    最小区分より少ない枚数は最小区分の単価で計算する。
+    """
+    return max(bisect_right(QUANTITY_BREAKPOINTS, qty) - 1, 0)
+
+
+def get_quantity_range(qty):
+    return QUANTITY_RANGES[get_quantity_tier(qty)]
+
+
+def parse_quantity(value):
+    """
+    枚数の入力値を整数に変換する。
+      - 整数、または "35" / "35枚" のような数字 → その枚数
+      - "50〜99枚" のような区分ラベル → 区分の下限枚数
+    解釈できない場合は None を返す。
+    """
+    if isinstance(value, int):
+        return value if value > 0 else None
+
+    text = unicodedata.normalize("NFKC", str(value)).strip()
+    digits = text[:-1] if text.endswith("枚") else text
+    if digits.isdigit():
+        qty = int(digits)
+        return qty if qty > 0 else None
+
+    # NFKC で「～」「〜」は「~」になるため、区分ラベル側の表記に戻す
+    return QUANTITY_MAP.get(text.replace("~", "〜"))
+
+
+def _build_price_index(price_table):
+    """
+    価格表（リスト）を (商品ID, パターン) → 区分ごとの単価タプル に変換する。
+    同じキーが複数ある場合は従来の線形探索と同じく先頭の行を優先する。
+    """
+    tiers = {}
+    for row in price_table:
+        product_id = resolve_product_id(row["item"])
+        if product_id is None:
+            raise ValueError(f"価格表の商品名が商品マスタにありません: {row['item']}")
+        prices = tiers.setdefault((product_id, row["pattern"]), [None] * len(QUANTITY_RANGES))
+        tier = QUANTITY_RANGES.index(row["quantity_range"])
+        if prices[tier] is None:
+            prices[tier] = row["unit_price"]
+    return {key: tuple(prices) for key, prices in tiers.items()}
+
+
+# 起動時に一度だけ構築する
+PRICE_INDEX_GENERAL = _build_price_index(PRICE_TABLE_GENERAL)
+PRICE_INDEX_STUDENT = _build_price_index(PRICE_TABLE_STUDENT)
+
+
+def _resolve(estimate_data):
+    """
+    見積データから (単価タプル, 枚数) を取り出す。該当なしの場合は (None, None)。
+    """
+    product_id = resolve_product_id(estimate_data.get("item", ""))
+    # ▼ パターン表記（パターンA → A）に変換
+    pattern = estimate_data.get("pattern", "").replace("パターン", "").strip()
+    user_type = estimate_data.get("user_type", "一般")
+
+    # ▼ 属性ごとにテーブル選択
+    price_index = PRICE_INDEX_STUDENT if user_type == "学生" else PRICE_INDEX_GENERAL
+
+    prices = price_index.get((product_id, pattern))
+    quantity = parse_quantity(estimate_data.get("quantity", ""))
+    if prices is None or quantity is None:
+        return None, None
+    return prices, quantity
+
+
+def calculate_estimate(estimate_data):
+    """
+    (合計金額, 単価) を返す。
+
+    quantity には整数の枚数、または LINE の選択肢と同じ区分ラベルを指定できる。
+    ラベルの場合は区分の下限枚数で計算する。見つからない場合は (0, 0)。
+    """
+    prices, quantity = _resolve(estimate_data)
+    if prices is None:
+        return 0, 0
+
+    unit_price = prices[get_quantity_tier(quantity)]
+    if unit_price is None:
+        return 0, 0
+    return unit_price * quantity, unit_price
+
+
+def next_tier_offer(estimate_data):
+    """
+    「あと N 枚で次の価格区分」のアップセル情報を返す。
+    すでに最上位区分の場合や価格が見つからない場合は None。
+
+    戻り値:
+        {
+            "additional_quantity": 次の区分までに追加が必要な枚数,
+            "next_quantity_range": 次の区分ラベル,
+            "next_unit_price": 次の区分の単価,
+            "next_total_price": 次の区分下限枚数での合計金額,
+            "saving_per_piece": 1枚あたりの値下がり額,
+            "saving": 同じ枚数を現在の単価で買った場合との差額,
+        }
+    """
+    prices, quantity = _resolve(estimate_data)
+    if prices is None:
+        return None
+
+    tier = get_quantity_tier(quantity)
+    if tier + 1 >= len(QUANTITY_BREAKPOINTS):
+        return None
+
+    unit_price = prices[tier]
+    next_unit_price = prices[tier + 1]
+    if unit_price is None or next_unit_price is None:
+        return None
+
+    next_quantity = QUANTITY_BREAKPOINTS[tier + 1]
+    return {
+        "additional_quantity": next_quantity - quantity,
+        "next_quantity_range": QUANTITY_RANGES[tier + 1],
+        "next_unit_price": next_unit_price,
+        "next_total_price": next_unit_price * next_quantity,
+        "saving_per_piece": unit_price - next_unit_price,
+        "saving": (unit_price - next_unit_price) * next_quantity,
+    }
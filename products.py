@@ -0,0 +1,101 @@
+"""
+商品マスタ（正規の商品ID・商品名・ボディ品番・画像）と表記ゆれの別名索引
+
+LINE の選択肢、価格表、select_options.json で商品名の表記が揃っていないため、
+どの表記で来ても 1 回の辞書引きで商品IDに解決できるよう、起動時に索引を作る。
+"""
+import unicodedata
+from collections import namedtuple
+
+Product = namedtuple("Product", ["id", "name", "body_code", "category", "thumbnail", "aliases"])
+
+# name は価格表・LINE の選択肢・パターン画像ファイル名で使っている正規の商品名
+PRODUCTS = (
+    # Tシャツ系
+    Product("dry_tshirt", "ドライTシャツ", "300-ACT", "Tシャツ系", "dry_tshirt.png", ()),
+    Product("high_quality_tshirt", "ハイクオリティーTシャツ", "5001-01", "Tシャツ系", "high_quality_tshirt.png",
+            ("ハイクオリティTシャツ",)),
+    Product("dry_long_tshirt", "ドライロングTシャツ", "304-ALT", "Tシャツ系", "dry_long_tshirt.png",
+            ("ドライロングスリーブTシャツ",)),
+    Product("dry_polo", "ドライポロシャツ", "302-ADP", "Tシャツ系", "dry_polo.png", ()),
+    # スポーツ系
+    Product("game_shirt", "ゲームシャツ", "5927-01", "スポーツ系", "game_shirt.png", ()),
+    Product("baseball_shirt", "ベースボールシャツ", "5982-01", "スポーツ系", "baseball_shirt.png",
+            ("ドライベースボールシャツ",)),
+    Product("stripe_baseball", "ストライプベースボールシャツ", "5982-01", "スポーツ系", "stripe_baseball.png",
+            ("ストライプドライベースボールシャツ",)),
+    Product("stripe_uniform", "ストライプユニフォーム", "ZD16", "スポーツ系", "stripe_uniform.png", ()),
+    # トレーナー系
+    Product("crew_trainer", "クールネックライトトレーナー", "219-MLC", "トレーナー系", "crew_trainer.png",
+            ("クルーネックライトトレーナー",)),
+    Product("zip_trainer", "ジップアップライトトレーナー", "217-MLZ", "トレーナー系", "zip_trainer.png",
+            ("ジップアップライトパーカー",)),
+    Product("hoodie_trainer", "フーディーライトトレーナー", "216-MLH", "トレーナー系", "hoodie_trainer.png", ()),
+    Product("basketball_shirt", "バスケシャツ", "5992-01", "トレーナー系", "basketball_shirt.png", ()),
+)
+
+PRODUCTS_BY_ID = {p.id: p for p in PRODUCTS}
+
+# 長音・波ダッシュ・ハイフン類の表記ゆれ
+_LONG_VOWELS = "ーｰ－—―‐-"
+_WAVE_DASHES = "〜～~"
+_FOLD_TABLE = str.maketrans({
+    **{c: None for c in _LONG_VOWELS},
+    **{c: "〜" for c in _WAVE_DASHES},
+    " ": None, "　": None,
+})
+
+
+def alias_key(text):
+    """
+    表記ゆれを吸収した比較用キー（NFKC・小文字化・長音/空白除去・波ダッシュ統一）
+    """
+    return unicodedata.normalize("NFKC", text).lower().translate(_FOLD_TABLE)
+
+
+def _surface_forms(text):
+    """
+    よく届く表記（NFC/NFD/NFKC、長音あり/なし、波ダッシュ違い）を列挙する
+    """
+    forms = set()
+    for base in (text, text.replace("ー", ""), text.replace("〜", "～")):
+        for form in ("NFC", "NFD", "NFKC", "NFKD"):
+            forms.add(unicodedata.normalize(form, base))
+    return forms
+
+
+def _build_indexes():
+    exact, folded = {}, {}
+    for product in PRODUCTS:
+        for name in (product.name, *product.aliases):
+            for form in _surface_forms(name):
+                exact.setdefault(form, product.id)
+            folded.setdefault(alias_key(name), product.id)
+    return exact, folded
+
+
+# 起動時に一度だけ構築する
+_EXACT_INDEX, _FOLDED_INDEX = _build_indexes()
+
+
+def resolve_product_id(text):
+    """
+    任意の商品名表記 → 商品ID（見つからなければ None）
+
+    既知の表記は事前に展開済みのため 1 回の辞書引きで解決し、
+    未知の表記だけ正規化キーで引き直す。
+    """
+    if not text:
+        return None
+    product_id = _EXACT_INDEX.get(text)
+    if product_id is None:
+        product_id = _FOLDED_INDEX.get(alias_key(text))
+    return product_id
+
+
+def get_product(text):
+    """
+    任意の商品名表記 → Product（見つからなければ None）
+    """
+    product_id = resolve_product_id(text)
+    return PRODUCTS_BY_ID[product_id] if product_id else None
@@ -0,0 +1,284 @@
+"""
+見積シートの月別アーカイブ
+
+"Simple Estimate_1" には過去の見積がすべて残るため、シートを読む処理
+（初期値の読み込み・保存先の行探し）が見積の件数に比例して重くなる。
+しばらく保存されていない見積を月別のシート（"Simple Estimate_1 2025-01" など）へ移し、
+見積シートを小さく保つ。
+
+- 対象は日時（A 列 = 最後に保存した日時）が ARCHIVE_AFTER_DAYS 日より前の行。月は同じ日時で決める
+- どの見積番号をどのシートへ移したかは "Archive Index" シート（見積番号, シート名, 移動日時）に残し、
+  プロセス内では ARCHIVE_INDEX_TTL 秒キャッシュする。初期値の読み込みと保存はこの索引で振り分ける
+- 移動（コンパクション）はバックグラウンドのスレッドが ARCHIVE_INTERVAL 秒ごとに行う（0 で無効）。
+  ファイルロックで同時に 1 プロセスだけが実行し、Sheets のクォータは優先度 "archive" で使う
+- 行の削除は quote_store のレイアウトロック（排他）の下で行う。
+  コピーした後に保存されて更新バージョンが変わった行は消さず、次回に回す。
+  ロック中は保存が待たされるので、その間の呼び出し（読み直し・索引への追記・削除）は 3 回に抑え、
+  優先度 "write" で使う（"archive" のクォータ待ちでロックを長く持たない）
+
+    python quote_archive.py compact [--dry-run]
+    python quote_archive.py locate 1712345678
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from gspread.exceptions import WorksheetNotFound
+
+import metrics
+import quote_store
+from sheets_quota import sheets_priority
+from ttl_cache import TTLCache
+
+HOT_TITLE = "Simple Estimate_1"
+INDEX_TITLE = "Archive Index"
+INDEX_HEADER = ["見積番号", "シート名", "移動日時"]
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_INTERVAL = float(os.environ.get("ARCHIVE_INTERVAL", str(6 * 3600)))
+ARCHIVE_INDEX_TTL = float(os.environ.get("ARCHIVE_INDEX_TTL", "60"))
+
+JST = pytz.timezone("Asia/Tokyo")
+TIMESTAMP_FORMAT = "%Y/%m/%d %H:%M:%S"
+ROW_COLUMNS = quote_store.ROW_WIDTH + 1  # A〜BO（更新バージョンまで）
+
+ARCHIVED_ROWS = metrics.counter(
+    "quote_archive_rows_total", "月別アーカイブへの移動（moved: 移動 / deferred: コピー後に更新されたので次回）", ["result"]
+)
+COMPACTION_DURATION = metrics.histogram(
+    "quote_archive_compaction_seconds", "アーカイブ移動 1 回の所要時間（秒）"
+)
+HOT_ROWS = metrics.gauge(
+    "quote_archive_hot_rows", "直近のアーカイブ移動後に見積シートに残った行数"
+)
+
+
+def shard_title(when):
+    return f"{HOT_TITLE} {when:%Y-%m}"
+
+
+def row_timestamp(row):
+    """行の日時（A 列）。読めなければ見積番号（作成時の UNIX 時刻）から。どちらも無ければ None"""
+    try:
+        return JST.localize(datetime.strptime(row[0].strip(), TIMESTAMP_FORMAT))
+    except (IndexError, ValueError):
+        pass
+    quote_no = row[1] if len(row) > 1 else ""
+    if quote_no.isdigit():
+        return datetime.fromtimestamp(int(quote_no), JST)
+    return None
+
+
+def _runs(row_indexes):
+    """行番号 → 連続する区間 [(開始, 終了), ...]（下から削除できるよう降順）"""
+    runs = []
+    for i in sorted(row_indexes, reverse=True):
+        if runs and runs[-1][0] == i + 1:
+            runs[-1][0] = i
+        else:
+            runs.append([i, i])
+    return [tuple(run) for run in runs]
+
+
+class QuoteArchive:
+    def __init__(self, open_spreadsheet, hot_title=HOT_TITLE, index_title=INDEX_TITLE):
+        self.open_spreadsheet = open_spreadsheet  # () → gspread.Spreadsheet
+        self.hot_title = hot_title
+        self.index_title = index_title
+        self._index_cache = TTLCache("quote_archive_index", maxsize=1, ttl=ARCHIVE_INDEX_TTL)
+        self._thread = None
+
+    # -----------------------
+    # 振り分け
+    # -----------------------
+    def _load_index(self, _key):
+        try:
+            ws = self.open_spreadsheet().worksheet(self.index_title)
+        except WorksheetNotFound:
+            return {}
+        return {row[0]: row[1] for row in ws.get("A2:B") if len(row) >= 2}
+
+    def index(self):
+        """{見積番号: アーカイブのシート名}"""
+        return self._index_cache.get_or_load("index", self._load_index)
+
+    def invalidate_index(self):
+        """索引シートが編集された場合など、次の振り分けで読み直す"""
+        self._index_cache.clear()
+
+    def locate(self, quote_no):
+        """見積番号のあるアーカイブのシート名（見積シートにあるなら None）"""
+        return self.index().get(quote_no)
+
+    def worksheet_for(self, spreadsheet, quote_no, hot=None, refresh=False):
+        """見積番号の行がある（保存すべき）ワークシート。refresh なら索引を読み直してから決める"""
+        if refresh:
+            self.invalidate_index()
+        title = self.locate(quote_no)
+        if title is None:
+            return hot if hot is not None else spreadsheet.worksheet(self.hot_title)
+        return spreadsheet.worksheet(title)
+
+    # -----------------------
+    # 移動（コンパクション）
+    # -----------------------
+    def compact(self, now=None, dry_run=False):
+        """
+        古い行を月別シートへ移し、{シート名: 行数} を返す。
+        他のプロセスが実行中なら何もせず None。
+        """
+        with quote_store.file_lock("archive.lock", blocking=False) as acquired:
+            if not acquired:
+                return None
+            started = time.perf_counter()
+            with sheets_priority("archive"):
+                moved = self._compact(now or datetime.now(JST), dry_run)
+            COMPACTION_DURATION.observe(time.perf_counter() - started)
+            return moved
+
+    def _compact(self, now, dry_run):
+        sh = self.open_spreadsheet()
+        hot = sh.worksheet(self.hot_title)
+        rows = hot.get_all_values()
+        if not rows:
+            return {}
+        header = (rows[0] + [""] * ROW_COLUMNS)[:ROW_COLUMNS]
+        header[-1] = quote_store.VERSION_HEADER
+
+        cutoff = now - timedelta(days=ARCHIVE_AFTER_DAYS)
+        shards = {}  # シート名 → {見積番号: 行}
+        for row in rows[1:]:
+            when = row_timestamp(row)
+            quote_no = row[1] if len(row) > 1 else ""
+            if when is None or when >= cutoff or not quote_no:
+                continue
+            shards.setdefault(shard_title(when), {})[quote_no] = (row + [""] * ROW_COLUMNS)[:ROW_COLUMNS]
+        if dry_run or not shards:
+            HOT_ROWS.set(len(rows) - 1)
+            return {title: len(copied) for title, copied in shards.items()}
+
+        # 1) 月別シートへコピー（前回途中で止まった分はその行を上書きする）
+        for title, copied in sorted(shards.items()):
+            self._copy_to_shard(sh, title, header, copied)
+
+        # 2) コピーした時点から更新されていない行だけを、索引に載せてから見積シートから消す
+        copied_versions = {
+            quote_no: (title, quote_store.parse_version(row[-1]))
+            for title, copied in shards.items() for quote_no, row in copied.items()
+        }
+        stamp = now.strftime(TIMESTAMP_FORMAT)
+        with quote_store.layout_lock(exclusive=True), sheets_priority("write"):
+            keys, versions = hot.batch_get(["B:B", f"{quote_store.VERSION_COLUMN}:{quote_store.VERSION_COLUMN}"])
+            delete, entries = [], []
+            for row_index in range(2, len(keys) + 1):
+                quote_no = keys[row_index - 1][0] if keys[row_index - 1] else ""
+                if quote_no not in copied_versions:
+                    continue
+                title, version = copied_versions.pop(quote_no)
+                current = versions[row_index - 1][0] if row_index - 1 < len(versions) and versions[row_index - 1] else ""
+                if quote_store.parse_version(current) != version:
+                    ARCHIVED_ROWS.inc(result="deferred")
+                    continue
+                delete.append(row_index)
+                entries.append([quote_no, title, stamp])
+
+            if entries:
+                self._index_worksheet(sh).append_rows(entries, value_input_option="RAW")
+            if delete:
+                # 区間ごとの削除を 1 回の batch_update にまとめる（下の区間から順に適用される）
+                sh.batch_update({"requests": [
+                    {"deleteDimension": {"range": {
+                        "sheetId": hot.id, "dimension": "ROWS", "startIndex": start - 1, "endIndex": end,
+                    }}}
+                    for start, end in _runs(delete)
+                ]})
+        self.invalidate_index()
+
+        ARCHIVED_ROWS.inc(len(entries), result="moved")
+        HOT_ROWS.set(len(rows) - 1 - len(delete))
+        moved = {}
+        for _, title, _ in entries:
+            moved[title] = moved.get(title, 0) + 1
+        return moved
+
+    def _copy_to_shard(self, sh, title, header, copied):
+        try:
+            shard = sh.worksheet(title)
+            existing = shard.col_values(2)
+        except WorksheetNotFound:
+            shard = sh.add_worksheet(title=title, rows=len(copied) + 100, cols=ROW_COLUMNS)
+            shard.update(f"A1:{quote_store.VERSION_COLUMN}1", [header])
+            existing = []
+
+        positions = {quote_no: i for i, quote_no in enumerate(existing, start=1) if i > 1}
+        appended = []
+        for quote_no, row in copied.items():
+            row_index = positions.get(quote_no)
+            if row_index is None:
+                appended.append(row)
+            else:
+                shard.update(f"A{row_index}:{quote_store.VERSION_COLUMN}{row_index}", [row])
+        if appended:
+            shard.append_rows(appended, value_input_option="USER_ENTERED")
+
+    def _index_worksheet(self, sh):
+        try:
+            return sh.worksheet(self.index_title)
+        except WorksheetNotFound:
+            ws = sh.add_worksheet(title=self.index_title, rows=1000, cols=len(INDEX_HEADER))
+            ws.update("A1:C1", [INDEX_HEADER])
+            return ws
+
+    # -----------------------
+    # バックグラウンド実行
+    # -----------------------
+    def start(self, interval=None):
+        """ARCHIVE_INTERVAL 秒ごとに compact するデーモンスレッドを起動する（0 以下なら起動しない）"""
+        interval = ARCHIVE_INTERVAL if interval is None else interval
+        if interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, args=(interval,), name="quote-archive", daemon=True)
+        self._thread.start()
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                moved = self.compact()
+                if moved:
+                    print("見積アーカイブ:", moved)
+            except Exception as e:
+                print("見積アーカイブのエラー:", e)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="見積シートの月別アーカイブ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_compact = sub.add_parser("compact", help="古い見積を月別シートへ移す")
+    p_compact.add_argument("--dry-run", action="store_true", help="移す件数を表示するだけ")
+    p_locate = sub.add_parser("locate", help="見積番号のあるシートを表示する")
+    p_locate.add_argument("quote_no")
+    args = parser.parse_args(argv)
+
+    from Bro_shop_test import estimate_archive
+
+    if args.command == "locate":
+        print(estimate_archive.locate(args.quote_no) or estimate_archive.hot_title)
+        return 0
+
+    moved = estimate_archive.compact(dry_run=args.dry_run)
+    if moved is None:
+        print("他のプロセスがアーカイブ移動中です")
+        return 1
+    for title, count in sorted(moved.items()):
+        print(f"{title}: {count} 行")
+    print(f"合計 {sum(moved.values())} 行{'（dry-run）' if args.dry_run else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+見積・カタログ請求の検索（管理者向け。SQLite FTS5 の転置索引）
+
+スタッフが電話番号・学校名・ユーザーID・ボディ品番などで見積やカタログ請求を探すとき、
+シートをスクロールせずに /admin/search で引けるようにする。
+
+- 1 行 = 1 文書。見積は見積番号、カタログ請求は行の内容のハッシュをキーにする
+- 検索する列の値を正規化（NFKC・小文字・記号と空白を除く）し、文字 2-gram に分けて FTS5 に入れる。
+  氏名・学校名のような分かち書きの無い日本語や、ハイフンの有無が混在する電話番号も部分一致で引ける。
+  3 文字以上の検索語は 2-gram で絞り込んだ後、正規化した本文にそのまま含まれるかを確かめる（誤検出を除く）
+- 文書の番号は書き込むたびに振り直すので、番号の降順 = 新しく保存された順。
+  FTS5 から番号の降順に読み、1 ページ分そろった時点で止める（該当が多くても全件は並べ替えない）
+- シートへ書き込むたびに、その行だけを索引に反映する（index_quote / index_catalog_request）。
+  シートを直接編集した分や、索引を作る前の行は python quote_search.py rebuild で作り直す
+  （作り直している間の検索結果は途中までの件数になる）
+
+索引ファイルは gunicorn の各ワーカーで共有する（WAL モード。書き込みは 1 行ずつの短いトランザクション）。
+
+    python quote_search.py rebuild              # シート（月別アーカイブを含む）から作り直す
+    python quote_search.py search 田中 --kind catalog
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+
+import metrics
+
+QUOTE_SEARCH_DB = os.environ.get("QUOTE_SEARCH_DB") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "quote_search.db"
+)
+SCHEMA_VERSION = 2
+MAX_PER_PAGE = 100
+
+QUOTE = "quote"
+CATALOG = "catalog"
+
+# 検索・表示する列（シートの列番号 0 始まり → 表示名）
+QUOTE_FIELDS = {
+    1: "見積番号", 2: "ユーザーID", 3: "属性", 5: "商品カテゴリー", 6: "パターン",
+    15: "ボディ品番", 16: "ボディ商品名", 18: "商品カラー", 50: "背ネーム", 61: "その他備考",
+}
+CATALOG_FIELDS = {
+    1: "氏名", 2: "郵便番号", 3: "住所", 4: "電話番号", 5: "メールアドレス",
+    6: "Insta/TikTok名", 7: "在籍予定の学校名と学年", 8: "その他(質問・要望)",
+}
+KIND_FIELDS = {QUOTE: QUOTE_FIELDS, CATALOG: CATALOG_FIELDS}
+# 表示するだけで検索はしない列
+QUOTE_DISPLAY_ONLY = {7: "枚数", 8: "合計金額"}
+
+SEARCH_DURATION = metrics.histogram(
+    "quote_search_duration_seconds", "管理者向け検索 1 回の所要時間（秒）"
+)
+INDEXED_ROWS = metrics.counter(
+    "quote_search_indexed_total", "検索索引に反映した行数（result: ok / error）", ["kind", "result"]
+)
+
+
+# -----------------------
+# 正規化・n-gram
+# -----------------------
+def normalize(text):
+    """NFKC・小文字にし、文字・数字以外（空白・ハイフン・記号）を取り除く"""
+    text = unicodedata.normalize("NFKC", str(text or "")).lower()
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def grams(normalized):
+    """
+    文字 2-gram（末尾の 1 文字も含める）。
+    1 文字の検索語は、その文字で始まる gram への前方一致で引く。
+    """
+    if not normalized:
+        return []
+    return [normalized[i:i + 2] for i in range(len(normalized) - 1)] + [normalized[-1]]
+
+
+def match_expression(normalized):
+    """
+    正規化した検索語 → FTS5 の MATCH 式（gram はすべて文字・数字なのでそのまま引用できる）。
+    種類での絞り込みは docs.kind で行う（索引に種類のトークンを入れると 1 文字の前方一致に掛かる）
+    """
+    if len(normalized) == 1:
+        return f'"{normalized}"*'
+    # 同じ gram を何度も書かない（"ああああ" など）
+    return " ".join(f'"{gram}"' for gram in dict.fromkeys(grams(normalized)[:-1]))
+
+
+def catalog_key(row):
+    """カタログ請求の行には番号が無いので、行の内容（日時を含む）から決める"""
+    return hashlib.sha1("\x1f".join(str(v) for v in row).encode("utf-8")).hexdigest()[:16]
+
+
+def quote_key(row):
+    return str(row[1]) if len(row) > 1 else ""
+
+
+KEY_FUNCTIONS = {QUOTE: quote_key, CATALOG: catalog_key}
+
+
+# -----------------------
+# 索引
+# -----------------------
+class SearchIndex:
+    def __init__(self, path=QUOTE_SEARCH_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _connect(self):
+        # スレッドごと・fork 後のワーカーごとに接続する
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            with conn:
+                if version:
+                    # 版 1 は gram に種類のトークンを含んでいた。索引は作り直す（python quote_search.py rebuild）
+                    print(f"検索索引の形式が古いため空にします（版 {version} → {SCHEMA_VERSION}）")
+                    conn.executescript("DROP TABLE IF EXISTS docs; DROP TABLE IF EXISTS doc_fields;"
+                                       " DROP TABLE IF EXISTS doc_grams;")
+                # 件数を数えるときに読む docs は狭く保ち、表示用の列は doc_fields に分ける
+                conn.executescript(f"""
+                    CREATE TABLE IF NOT EXISTS docs (
+                        id INTEGER PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        updated TEXT NOT NULL,
+                        body TEXT NOT NULL,
+                        UNIQUE (kind, key)
+                    );
+                    CREATE TABLE IF NOT EXISTS doc_fields (
+                        id INTEGER PRIMARY KEY,
+                        fields TEXT NOT NULL
+                    );
+                    CREATE VIRTUAL TABLE IF NOT EXISTS doc_grams USING fts5(
+                        grams, tokenize='unicode61 remove_diacritics 0', prefix='1', detail=none
+                    );
+                    PRAGMA user_version = {SCHEMA_VERSION};
+                """)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _document(kind, row):
+        """シートの行 → (更新日時, 正規化した本文, 2-gram, 表示用の列)"""
+        fields = KIND_FIELDS[kind]
+        values = {name: str(row[i]) if i < len(row) and row[i] is not None else "" for i, name in fields.items()}
+        normalized = [normalize(value) for value in values.values()]
+        # 列をまたいだ gram を作らない。本文の区切りは検索語に現れない文字にする
+        doc_grams = [gram for text in normalized for gram in grams(text)]
+        if kind == QUOTE:
+            for i, name in QUOTE_DISPLAY_ONLY.items():
+                values[name] = str(row[i]) if i < len(row) else ""
+        updated = str(row[0]) if row else ""
+        return updated, "\x1f".join(normalized), " ".join(doc_grams), values
+
+    def _upsert(self, conn, kind, key, row):
+        updated, body, doc_grams, values = self._document(kind, row)
+        found = conn.execute("SELECT id FROM docs WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+        if found is not None:
+            # 番号を振り直して「新しく保存された順」の先頭へ移す
+            conn.execute("DELETE FROM docs WHERE id = ?", found)
+            conn.execute("DELETE FROM doc_fields WHERE id = ?", found)
+            conn.execute("DELETE FROM doc_grams WHERE rowid = ?", found)
+        doc_id = conn.execute(
+            "INSERT INTO docs (kind, key, updated, body) VALUES (?, ?, ?, ?)", (kind, key, updated, body)
+        ).lastrowid
+        conn.execute("INSERT INTO doc_fields (id, fields) VALUES (?, ?)",
+                     (doc_id, json.dumps(values, ensure_ascii=False)))
+        conn.execute("INSERT INTO doc_grams (rowid, grams) VALUES (?, ?)", (doc_id, doc_grams))
+
+    def add(self, kind, key, row):
+        """1 行を索引に反映する（同じキーの文書は置き換える）"""
+        conn = self._connect()
+        with conn:
+            self._upsert(conn, kind, key, row)
+
+    def add_many(self, kind, rows):
+        """まとめて反映する（1 トランザクション）。キーの無い行は飛ばし、反映した件数を返す"""
+        key_of = KEY_FUNCTIONS[kind]
+        conn = self._connect()
+        count = 0
+        with conn:
+            for row in rows:
+                key = key_of(row)
+                if key:
+                    self._upsert(conn, kind, key, row)
+                    count += 1
+        return count
+
+    def _safely(self, kind, row):
+        # 索引は補助なので、反映できなくてもシートへの保存は成功として扱う
+        try:
+            self.add(kind, KEY_FUNCTIONS[kind](row), row)
+            INDEXED_ROWS.inc(kind=kind, result="ok")
+        except Exception as e:
+            INDEXED_ROWS.inc(kind=kind, result="error")
+            print("検索索引の更新エラー:", e)
+
+    def index_quote(self, row):
+        """見積シートに書き込んだ行を反映する"""
+        if quote_key(row):
+            self._safely(QUOTE, row)
+
+    def index_catalog_request(self, row):
+        """カタログ請求シートに追記した行を反映する"""
+        self._safely(CATALOG, row)
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM docs")
+            conn.execute("DELETE FROM doc_fields")
+            conn.execute("DELETE FROM doc_grams")
+
+    def optimize(self):
+        """一括登録の後に FTS5 のセグメントをまとめる"""
+        conn = self._connect()
+        with conn:
+            conn.execute("INSERT INTO doc_grams (doc_grams) VALUES ('optimize')")
+
+    # -----------------------
+    # 検索
+    # -----------------------
+    def search(self, query, kind=None, page=1, per_page=20):
+        """
+        query を含む文書を新しく保存された順に返す。
+        {"query", "total", "page", "per_page", "results": [{"kind", "key", "updated", "fields"}, ...]}
+        """
+        started = time.perf_counter()
+        per_page = min(max(int(per_page), 1), MAX_PER_PAGE)
+        page = max(int(page), 1)
+        result = {"query": query, "total": 0, "page": page, "per_page": per_page, "results": []}
+        normalized = normalize(query)
+        if not normalized:
+            return result
+
+        conn = self._connect()
+        verify, params = "", [match_expression(normalized)]
+        if kind is not None:
+            # 単項 + で (kind, key) の索引を使わせない（docs を種類で全件なめて FTS5 を 1 件ずつ引く計画になる）
+            verify, params = verify + " AND +docs.kind = ?", params + [kind]
+        if len(normalized) > 2:
+            verify, params = verify + " AND instr(docs.body, ?) > 0", params + [normalized]
+        if not verify:
+            # 2 文字以下は gram の一致 = 部分一致なので、本文を確かめずに FTS5 だけで数える
+            result["total"] = conn.execute(
+                "SELECT COUNT(*) FROM doc_grams WHERE doc_grams MATCH ?", params
+            ).fetchone()[0]
+        else:
+            result["total"] = conn.execute(
+                f"SELECT COUNT(*) FROM doc_grams JOIN docs ON docs.id = doc_grams.rowid "
+                f"WHERE doc_grams MATCH ? {verify}", params
+            ).fetchone()[0]
+        if result["total"] > (page - 1) * per_page:
+            rows = conn.execute(
+                f"""
+                SELECT docs.id, docs.kind, docs.key, docs.updated
+                FROM doc_grams JOIN docs ON docs.id = doc_grams.rowid
+                WHERE doc_grams MATCH ? {verify}
+                ORDER BY doc_grams.rowid DESC
+                LIMIT ? OFFSET ?
+                """,
+                params + [per_page, (page - 1) * per_page],
+            ).fetchall()
+            placeholders = ",".join("?" * len(rows))
+            fields = dict(conn.execute(
+                f"SELECT id, fields FROM doc_fields WHERE id IN ({placeholders})", [row[0] for row in rows]
+            ).fetchall())
+            result["results"] = [
+                {"kind": kind_, "key": key, "updated": updated, "fields": json.loads(fields.get(doc_id, "{}"))}
+                for doc_id, kind_, key, updated in rows
+            ]
+        SEARCH_DURATION.observe(time.perf_counter() - started)
+        return result
+
+    def count(self):
+        return dict(self._connect().execute("SELECT kind, COUNT(*) FROM docs GROUP BY kind").fetchall())
+
+
+# -----------------------
+# シートからの作り直し
+# -----------------------
+def rebuild(index, spreadsheet, page_rows=None):
+    """
+    見積シート（月別アーカイブを含む）とカタログ請求シートを読み、索引を作り直す。{種類: 件数} を返す。
+    検索結果が新しく保存された順になるよう、全シートの行を日時で並べてから登録する。
+    """
+    import quote_store
+    import sheet_export
+    from sheets_quota import sheets_priority
+
+    sources = ((QUOTE, "quotes", quote_store.ROW_WIDTH), (CATALOG, "catalog_requests", max(CATALOG_FIELDS) + 1))
+    entries = []  # (日時, 種類, 行)
+    with sheets_priority("export"):
+        for kind, name, width in sources:
+            spec = sheet_export.SHEETS[name]
+            for ws in sheet_export.source_worksheets(spreadsheet, spec, None):
+                for page in sheet_export.iter_pages(ws, width, page_rows=page_rows):
+                    entries.extend((row[0], kind, row) for row in page)
+    # 日時は "YYYY/MM/DD HH:MM:SS"（ゼロ埋め）なので文字列のまま並べられる
+    entries.sort(key=lambda entry: entry[0])
+
+    counts = {QUOTE: 0, CATALOG: 0}
+    index.clear()
+    for start in range(0, len(entries), 1000):
+        for kind, group in itertools.groupby(entries[start:start + 1000], key=lambda entry: entry[1]):
+            counts[kind] += index.add_many(kind, [row for _, _, row in group])
+    index.optimize()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="見積・カタログ請求の検索索引")
+    parser.add_argument("--db", default=QUOTE_SEARCH_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="シートから索引を作り直す")
+    p_search = sub.add_parser("search", help="索引を検索する")
+    p_search.add_argument("query")
+    p_search.add_argument("--kind", choices=sorted(KIND_FIELDS))
+    p_search.add_argument("--page", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    index = SearchIndex(args.db)
+    if args.command == "rebuild":
+        from Bro_shop_test import open_spreadsheet
+
+        started = time.perf_counter()
+        counts = rebuild(index, open_spreadsheet())
+        print(f"見積 {counts[QUOTE]:,} 件 / カタログ請求 {counts[CATALOG]:,} 件（{time.perf_counter() - started:.1f} 秒）")
+        return 0
+
+    result = index.search(args.query, kind=args.kind, page=args.page)
+    print(f"{result['total']:,} 件（{result['page']} ページ目）")
+    for doc in result["results"]:
+        summary = " / ".join(f"{name}: {value}" for name, value in doc["fields"].items() if value)
+        print(f"[{doc['kind']}] {doc['updated']} {summary}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+バッチ見積シミュレーション
+
+キャンペーン企画用に、大量の仮想注文（CSV / JSONL）をまとめて見積計算し、
+結果をファイルへ書き出す。
+
+    python quote_simulator.py orders.csv -o result.csv
+    python quote_simulator.py orders.jsonl -o result.jsonl --workers 4
+
+入力の列（キー）は item / pattern / quantity / user_type。
+quantity は区分ラベル（"50〜99枚"）でも実枚数（"35"）でもよい。
+それ以外の列はそのまま出力へ引き継ぎ、total_price / unit_price を追加する。
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+from multiprocessing import Pool
+
+from pricing import calculate_estimate
+
+DEFAULT_BATCH_SIZE = 10000
+RESULT_FIELDS = ["total_price", "unit_price"]
+
+
+def _detect_format(path):
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_quote_requests(path, fmt=None):
+    """
+    入力ファイルを 1 件ずつ dict として読み出す（全件をメモリに載せない）
+    """
+    fmt = fmt or _detect_format(path)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if fmt == "jsonl":
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def iter_batches(rows, batch_size=DEFAULT_BATCH_SIZE):
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def price_batch(batch):
+    """
+    1 バッチ分の見積を計算し、各行に total_price / unit_price を追加して返す。
+    同じ組み合わせ（属性・商品・パターン・枚数）は計算結果を使い回す。
+    """
+    memo = {}
+    for row in batch:
+        key = (row.get("user_type", "一般"), row.get("item", ""), row.get("pattern", ""), row.get("quantity", ""))
+        result = memo.get(key)
+        if result is None:
+            result = memo[key] = calculate_estimate(row)
+        row["total_price"], row["unit_price"] = result
+    return batch
+
+
+def simulate_quotes(rows, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    """
+    ライブラリ用エントリーポイント。
+    見積リクエストのイテラブルを受け取り、計算済みのバッチを順番に返す。
+    workers > 1 の場合はバッチ単位でプロセス並列に計算する。
+    """
+    batches = iter_batches(rows, batch_size)
+    if workers <= 1:
+        for batch in batches:
+            yield price_batch(batch)
+        return
+
+    with Pool(processes=workers) as pool:
+        yield from pool.imap(price_batch, batches)
+
+
+class _ResultWriter:
+    def __init__(self, path, fmt):
+        self.fmt = fmt
+        self.file = open(path, "w", encoding="utf-8", newline="") if path != "-" else sys.stdout
+        self.csv_writer = None
+
+    def write_batch(self, batch):
+        if self.fmt == "jsonl":
+            self.file.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in batch))
+            return
+        if self.csv_writer is None:
+            fieldnames = list(batch[0].keys())
+            for name in RESULT_FIELDS:
+                if name not in fieldnames:
+                    fieldnames.append(name)
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=fieldnames, extrasaction="ignore")
+            self.csv_writer.writeheader()
+        self.csv_writer.writerows(batch)
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+def run_simulation(input_path, output_path, input_format=None, output_format=None,
+                   batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    """
+    ファイルからファイルへ見積を計算し、件数・売上合計・処理速度を返す。
+    """
+    output_format = output_format or _detect_format(output_path)
+    writer = _ResultWriter(output_path, output_format)
+
+    count = 0
+    revenue = 0
+    unpriced = 0
+    started = time.perf_counter()
+    try:
+        for batch in simulate_quotes(read_quote_requests(input_path, input_format), batch_size, workers):
+            writer.write_batch(batch)
+            count += len(batch)
+            for row in batch:
+                if row["unit_price"]:
+                    revenue += row["total_price"]
+                else:
+                    unpriced += 1
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "quotes": count,
+        "unpriced": unpriced,
+        "revenue": revenue,
+        "elapsed_sec": round(elapsed, 3),
+        "quotes_per_minute": int(count / elapsed * 60) if elapsed > 0 else 0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="見積リクエスト（CSV/JSONL）を一括計算します。")
+    parser.add_argument("input", help="入力ファイル（.csv / .jsonl）")
+    parser.add_argument("-o", "--output", default="-", help="出力ファイル（省略時は標準出力）")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl"])
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="並列プロセス数（0 で CPU コア数）")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    output_format = args.output_format or ("csv" if args.output == "-" else None)
+    report = run_simulation(args.input, args.output, args.input_format, output_format,
+                            args.batch_size, workers)
+
+    print(
+        f"見積件数: {report['quotes']:,} 件（価格未設定 {report['unpriced']:,} 件） / "
+        f"売上合計: {report['revenue']:,} 円 / "
+        f"処理時間: {report['elapsed_sec']} 秒 / "
+        f"処理速度: {report['quotes_per_minute']:,} 件/分",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+見積シート（Simple Estimate_1）への保存（見積番号での upsert）
+
+LINE の見積り完了と /submit_quotation がほぼ同時に同じ見積番号を保存すると、
+「全行を読む → 見つからない → 追記」が交錯して同じ見積番号の行が 2 行できていた。
+
+- 見積番号ごとのプロセス間ロック（fcntl.flock）で、同じホスト上のワーカー同士の保存を直列化する
+- BO 列に行の更新バージョンを持たせる（楽観的排他）。
+  フォームを開いた時点のバージョン（expected_version）が、書き込み直前に読み直したものと
+  違えば QuoteConflict（他の保存を上書きしない）
+- 行の特定は B 列（見積番号）と BO 列だけを読む。全行は取得しない
+- 保存はレイアウトロック（共有）の下で行う。行を削除する処理（quote_archive）は排他で取り、
+  保存が削除前の行番号へ書き込まないようにする
+- 月別アーカイブへ移した見積の保存先（locate）もレイアウトロックの下で決める。
+  見積シートに見つからなければ索引を読み直して探し直し、移動直後の見積を見積シートへ重複追記しない
+
+    version = upsert_quote(worksheet, quote_no, row, expected_version=3)
+"""
+import os
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows（開発環境）ではプロセス内のロックのみ
+    fcntl = None
+
+KEY_COLUMN = "B"
+VERSION_COLUMN = "BO"
+VERSION_HEADER = "更新バージョン"
+ROW_WIDTH = 66  # A〜BN（バージョン列を除いた 1 行の列数）
+
+QUOTE_LOCK_DIR = os.environ.get("QUOTE_LOCK_DIR") or os.path.join(tempfile.gettempdir(), "bro_shop_quote_locks")
+QUOTE_LOCK_TIMEOUT = float(os.environ.get("QUOTE_LOCK_TIMEOUT", "30"))
+# ロックファイルは見積番号のハッシュで固定個に振り分ける（見積番号ごとにファイルを増やさない）
+LOCK_STRIPES = 256
+
+
+class QuoteConflict(Exception):
+    """フォームを開いた後に、別の保存で行が更新されていた"""
+
+    def __init__(self, quote_no, expected, actual):
+        super().__init__(f"見積番号 {quote_no} は他の保存で更新されています（読込時 {expected} / 現在 {actual}）")
+        self.quote_no = quote_no
+        self.expected = expected
+        self.actual = actual
+
+
+class QuoteLockTimeout(Exception):
+    """ロックを待ち時間の上限までに取得できなかった"""
+
+
+QUOTE_UPSERTS = metrics.counter(
+    "quote_upserts_total", "見積シートへの保存数", ["result"]
+)
+QUOTE_LOCK_WAIT = metrics.histogram(
+    "quote_lock_wait_seconds", "見積保存・アーカイブのロック待ち時間（秒）"
+)
+
+
+# -----------------------
+# ロック
+# -----------------------
+_fallback_locks = {}
+_fallback_guard = threading.Lock()
+
+
+def _stripe(quote_no):
+    return zlib.crc32(str(quote_no).encode("utf-8")) % LOCK_STRIPES
+
+
+@contextmanager
+def _fallback_lock(name, timeout, blocking):
+    # fcntl が無い環境向け（プロセス内のみ。共有ロックも排他として扱う）
+    with _fallback_guard:
+        lock = _fallback_locks.setdefault(name, threading.Lock())
+    started = time.monotonic()
+    if not lock.acquire(timeout=timeout if blocking else 0):
+        if not blocking:
+            yield False
+            return
+        raise QuoteLockTimeout(f"ロック {name} を取得できませんでした")
+    QUOTE_LOCK_WAIT.observe(time.monotonic() - started)
+    try:
+        yield True
+    finally:
+        lock.release()
+
+
+@contextmanager
+def file_lock(name, shared=False, timeout=None, blocking=True):
+    """
+    QUOTE_LOCK_DIR/name の flock。
+    flock はファイルを開くたびに別のロックになるので、同じプロセス内のスレッド同士も排他される。
+    blocking=False なら待たずに、取得できたかどうか（bool）を渡す。
+    """
+    timeout = QUOTE_LOCK_TIMEOUT if timeout is None else timeout
+    if fcntl is None:
+        with _fallback_lock(name, timeout, blocking) as acquired:
+            yield acquired
+        return
+
+    os.makedirs(QUOTE_LOCK_DIR, exist_ok=True)
+    fd = os.open(os.path.join(QUOTE_LOCK_DIR, name), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        started = time.monotonic()
+        delay = 0.005
+        while True:
+            try:
+                fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not blocking:
+                    yield False
+                    return
+                if time.monotonic() - started > timeout:
+                    raise QuoteLockTimeout(f"ロック {name} を取得できませんでした")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        QUOTE_LOCK_WAIT.observe(time.monotonic() - started)
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def quote_lock(quote_no, timeout=None):
+    """見積番号ごとの排他ロック"""
+    return file_lock(f"quote-{_stripe(quote_no):03d}.lock", timeout=timeout)
+
+
+def layout_lock(exclusive=False, timeout=None):
+    """シートの行番号を変える処理（行の削除）は exclusive=True、保存は共有で取る"""
+    return file_lock("layout.lock", shared=not exclusive, timeout=timeout)
+
+
+# -----------------------
+# upsert
+# -----------------------
+def parse_version(value):
+    """バージョン列の値 → int（列追加前の行・空欄は 0）"""
+    try:
+        return int(str(value).strip() or 0)
+    except ValueError:
+        return 0
+
+
+def _cell(values, row_index):
+    """batch_get で得た 1 列分の値から row_index 行目（1 始まり）の値"""
+    if row_index - 1 < len(values) and values[row_index - 1]:
+        return values[row_index - 1][0]
+    return ""
+
+
+def find_quote(worksheet, quote_no):
+    """(行番号 or None, 現在のバージョン)。見積番号列とバージョン列を 1 回の読み取りで取る"""
+    keys, versions = worksheet.batch_get([f"{KEY_COLUMN}:{KEY_COLUMN}", f"{VERSION_COLUMN}:{VERSION_COLUMN}"])
+    for row_index in range(2, len(keys) + 1):  # 1 行目はヘッダー
+        if _cell(keys, row_index) == quote_no:
+            return row_index, parse_version(_cell(versions, row_index))
+    return None, 0
+
+
+def upsert_quote(worksheet, quote_no, row, expected_version=None, locate=None):
+    """
+    見積番号の行を更新し、無ければ追記する。書き込んだ行のバージョンを返す。
+    row は A〜BN の 66 列。expected_version を渡すと、現在のバージョンと違う場合 QuoteConflict。
+    locate(refresh) は保存先のワークシートを返す関数（refresh=True なら索引を読み直して決める）。
+    渡すと worksheet の代わりにロックの下で保存先を決める。
+    """
+    if len(row) != ROW_WIDTH:
+        raise ValueError(f"行の列数が {ROW_WIDTH} ではありません: {len(row)}")
+
+    with quote_lock(quote_no), layout_lock():
+        if locate is not None:
+            worksheet = locate(False)
+        row_index, version = find_quote(worksheet, quote_no)
+        if row_index is None and locate is not None:
+            # 他のワーカーがアーカイブへ移した直後（こちらの索引のキャッシュが古い）かもしれない
+            moved = locate(True)
+            if moved is not worksheet:
+                worksheet = moved
+                row_index, version = find_quote(worksheet, quote_no)
+        if expected_version is not None and expected_version != version:
+            QUOTE_UPSERTS.inc(result="conflict")
+            raise QuoteConflict(quote_no, expected_version, version)
+
+        if row_index is None:
+            worksheet.append_row(list(row) + [1], value_input_option="USER_ENTERED")
+            QUOTE_UPSERTS.inc(result="inserted")
+            return 1
+
+        worksheet.update(f"A{row_index}:{VERSION_COLUMN}{row_index}", [list(row) + [version + 1]])
+        QUOTE_UPSERTS.inc(result="updated")
+        return version + 1
@@ -0,0 +1,359 @@
+"""
+見積（Simple Estimate_1）・カタログ請求（CatalogRequests）の一括エクスポート
+
+シートを一度に get_all_values せず、EXPORT_PAGE_ROWS 行ずつの範囲読み取りで流し読みし、
+型付きの列（日時はタイムスタンプ、金額・枚数は整数）に変換して書き出す。
+
+- 形式は Parquet（pyarrow がある場合）または gzip 圧縮 CSV。
+  ファイル名は「シート名-日時（マイクロ秒まで）」で、既存のファイルは上書きしない
+- 既定は差分エクスポート。出力先の export_state.json に前回書き出した最新の日時（ウォーターマーク）を残し、
+  次回は日時がそれより新しい行だけを書き出す。
+  見積の日時は最後に保存した日時なので、前回以降に更新された見積も含まれる
+- 見積は月別アーカイブ（quote_archive.py）のシートも対象にする。ウォーターマークより前の月のシートは
+  日時の列だけを読み、新しい行がある場合だけ読み込む
+
+    python sheet_export.py -o exports/                   # 差分（初回は全件）
+    python sheet_export.py -o exports/ --full --format csv
+    python sheet_export.py -o exports/ --sheet quotes
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import gspread.utils
+import pytz
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pyarrow は任意。無ければ CSV のみ
+    pyarrow = None
+
+import quote_archive
+from sheets_quota import sheets_priority
+
+EXPORT_PAGE_ROWS = int(os.environ.get("EXPORT_PAGE_ROWS", "1000"))
+STATE_FILE = "export_state.json"
+
+JST = pytz.timezone("Asia/Tokyo")
+TIMESTAMP_FORMAT = "%Y/%m/%d %H:%M:%S"
+TIMESTAMP_COLUMN = "日時"
+
+SIZE_COLUMNS = ("SS", "S", "M", "L", "XL", "XXL", "XXXL", "XXXXL")
+
+# title: シート名 / archive_prefix: 月別アーカイブのシート名の接頭辞 / integer_columns: 整数の列
+SheetSpec = namedtuple("SheetSpec", ["title", "archive_prefix", "integer_columns"])
+
+SHEETS = {
+    "quotes": SheetSpec(
+        title=quote_archive.HOT_TITLE,
+        archive_prefix=quote_archive.HOT_TITLE + " ",
+        integer_columns=frozenset(
+            ("合計金額", "単価", "注文数", "プリント箇所数", "パターン料金", "送料", "更新バージョン")
+            + SIZE_COLUMNS
+            + tuple(f"プリントカラー数_{i}" for i in range(1, 5))
+        ),
+    ),
+    "catalog_requests": SheetSpec(title="CatalogRequests", archive_prefix=None, integer_columns=frozenset()),
+}
+
+
+# -----------------------
+# 型変換
+# -----------------------
+def parse_timestamp(value):
+    try:
+        return JST.localize(datetime.strptime(value.strip(), TIMESTAMP_FORMAT))
+    except (AttributeError, ValueError):
+        return None
+
+
+def parse_integer(value):
+    """"145,000" / "¥145,000" / "3枚" → int。空欄・解釈できない値は None"""
+    text = value.strip().replace(",", "").lstrip("¥￥").rstrip("円枚")
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+        return int(number) if number.is_integer() else None
+
+
+class Schema:
+    """ヘッダー行 → 列ごとの型（"timestamp" / "int" / "string"）と変換"""
+
+    def __init__(self, header, spec):
+        self.names = []
+        seen = set()
+        for i, name in enumerate(header, start=1):
+            name = name.strip() or f"column_{i}"
+            if name in seen:
+                name = f"{name}_{i}"
+            seen.add(name)
+            self.names.append(name)
+        self.types = [
+            "timestamp" if name == TIMESTAMP_COLUMN else "int" if name in spec.integer_columns else "string"
+            for name in self.names
+        ]
+        self.timestamp_index = self.names.index(TIMESTAMP_COLUMN) if TIMESTAMP_COLUMN in self.names else None
+        self.invalid = {}  # 列名 → 解釈できなかった値の数
+
+    def convert(self, row):
+        row = (row + [""] * len(self.names))[:len(self.names)]
+        values = []
+        for name, kind, raw in zip(self.names, self.types, row):
+            if kind == "string":
+                values.append(raw)
+                continue
+            value = parse_timestamp(raw) if kind == "timestamp" else parse_integer(raw)
+            if value is None and raw.strip():
+                self.invalid[name] = self.invalid.get(name, 0) + 1
+            values.append(value)
+        return values
+
+    def timestamp_of(self, row):
+        """変換前の行の日時（日時の列が無い・読めない場合は None）"""
+        if self.timestamp_index is None or self.timestamp_index >= len(row):
+            return None
+        return parse_timestamp(row[self.timestamp_index])
+
+
+# -----------------------
+# 書き出し
+# -----------------------
+class CsvGzipWriter:
+    extension = ".csv.gz"
+
+    def __init__(self, path, schema):
+        self.path = path
+        self._file = gzip.open(path + ".tmp", "wt", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(schema.names)
+
+    def write_rows(self, rows):
+        self._writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+
+    def close(self):
+        self._file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+class ParquetWriter:
+    extension = ".parquet"
+
+    def __init__(self, path, schema):
+        self.path = path
+        fields = []
+        for name, kind in zip(schema.names, schema.types):
+            if kind == "timestamp":
+                arrow_type = pyarrow.timestamp("s", tz="Asia/Tokyo")
+            elif kind == "int":
+                arrow_type = pyarrow.int64()
+            else:
+                arrow_type = pyarrow.string()
+            fields.append(pyarrow.field(name, arrow_type))
+        self._schema = pyarrow.schema(fields)
+        self._writer = pyarrow.parquet.ParquetWriter(path + ".tmp", self._schema, compression="zstd")
+
+    def write_rows(self, rows):
+        # 1 ページ = 1 行グループ
+        columns = list(zip(*rows))
+        self._writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, self._schema)],
+            schema=self._schema,
+        ))
+
+    def close(self):
+        self._writer.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+WRITERS = {"csv": CsvGzipWriter, "parquet": ParquetWriter}
+
+
+def reserve_path(out_dir, name, extension):
+    """
+    出力ファイル名（シート名-日時マイクロ秒）を排他的に作って確保する。
+    同じ時刻に別のエクスポートが走っても、互いのファイルを上書きしない
+    """
+    while True:
+        path = os.path.join(out_dir, f"{name}-{datetime.now(JST):%Y%m%d%H%M%S%f}{extension}")
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            continue
+
+
+# -----------------------
+# 読み取り
+# -----------------------
+def iter_pages(worksheet, width, start_row=2, page_rows=None):
+    """start_row 行目から page_rows 行ずつ読む。空のページが返ったら終わり"""
+    page_rows = page_rows or EXPORT_PAGE_ROWS
+    last_col = gspread.utils.rowcol_to_a1(1, width)[:-1]
+    row = start_row
+    while True:
+        page = worksheet.get(f"A{row}:{last_col}{row + page_rows - 1}")
+        if not page:
+            return
+        yield [list(values) for values in page if any(values)]
+        row += page_rows
+
+
+def _shard_month(title, prefix):
+    try:
+        return datetime.strptime(title[len(prefix):], "%Y-%m")
+    except ValueError:
+        return None
+
+
+def source_worksheets(spreadsheet, spec, watermark):
+    """エクスポート対象のワークシート（見積シート本体 + 新しい行がありうる月別アーカイブ）"""
+    worksheets = spreadsheet.worksheets()
+    targets = [ws for ws in worksheets if ws.title == spec.title]
+    if spec.archive_prefix is None:
+        return targets
+
+    for ws in sorted(worksheets, key=lambda ws: ws.title):
+        if not ws.title.startswith(spec.archive_prefix):
+            continue
+        month = _shard_month(ws.title, spec.archive_prefix)
+        if month is None:
+            continue
+        if watermark is None or (month.year, month.month) >= (watermark.year, watermark.month):
+            targets.append(ws)
+            continue
+        # アーカイブ後に保存された見積がある月だけ読む（日時の列だけで判定）
+        stamps = (parse_timestamp(row[0]) for row in ws.get("A2:A") if row)
+        if any(stamp is not None and stamp > watermark for stamp in stamps):
+            targets.append(ws)
+    return targets
+
+
+def export_sheet(spreadsheet, name, out_dir, fmt, watermark=None, page_rows=None):
+    """
+    1 種類のシートを書き出し、(出力パス or None, 書き出した行数, 新しいウォーターマーク, 解釈できなかった値) を返す。
+    差分が無ければファイルは作らない。
+    """
+    spec = SHEETS[name]
+    writer = None
+    schema = None
+    exported = 0
+    newest = watermark
+    invalid = {}  # 列名 → 解釈できなかった値の数
+    path = None
+    try:
+        for ws in source_worksheets(spreadsheet, spec, watermark):
+            header = ws.row_values(1)
+            if not header:
+                continue
+            sheet_schema = Schema(header, spec)
+            if schema is None:
+                schema = sheet_schema
+            for page in iter_pages(ws, len(header), page_rows=page_rows):
+                rows = []
+                for raw in page:
+                    stamp = sheet_schema.timestamp_of(raw)
+                    if watermark is not None and (stamp is None or stamp <= watermark):
+                        continue
+                    values = sheet_schema.convert(raw)
+                    if stamp is not None and (newest is None or stamp > newest):
+                        newest = stamp
+                    # アーカイブのシートも見積シートと同じ列に揃える
+                    rows.append(values if sheet_schema.names == schema.names else
+                                [dict(zip(sheet_schema.names, values)).get(n) for n in schema.names])
+                if not rows:
+                    continue
+                if writer is None:
+                    path = reserve_path(out_dir, name, WRITERS[fmt].extension)
+                    try:
+                        writer = WRITERS[fmt](path, schema)
+                    except Exception:
+                        os.remove(path)
+                        raise
+                writer.write_rows(rows)
+                exported += len(rows)
+            for column, count in sheet_schema.invalid.items():
+                invalid[column] = invalid.get(column, 0) + count
+    finally:
+        if writer is not None:
+            writer.close()
+    return path, exported, newest, invalid
+
+
+# -----------------------
+# ウォーターマーク
+# -----------------------
+def load_state(out_dir):
+    try:
+        with open(os.path.join(out_dir, STATE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(out_dir, state):
+    path = os.path.join(out_dir, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def run_export(spreadsheet, out_dir, names=None, fmt=None, full=False, page_rows=None):
+    """指定したシートを順に書き出し、シートごとの結果を返す。成功したシートだけウォーターマークを進める"""
+    fmt = fmt or ("parquet" if pyarrow is not None else "csv")
+    if fmt == "parquet" and pyarrow is None:
+        raise RuntimeError("Parquet で書き出すには pyarrow をインストールしてください")
+    os.makedirs(out_dir, exist_ok=True)
+    state = load_state(out_dir)
+    results = {}
+    # エクスポートは Webhook の処理より後回しでよい
+    with sheets_priority("export"):
+        for name in names or SHEETS:
+            watermark = None if full else parse_timestamp(state.get(name, ""))
+            started = time.perf_counter()
+            path, exported, newest, invalid = export_sheet(spreadsheet, name, out_dir, fmt, watermark, page_rows)
+            results[name] = {
+                "path": path, "rows": exported, "seconds": time.perf_counter() - started, "invalid": invalid,
+            }
+            if newest is not None:
+                state[name] = newest.strftime(TIMESTAMP_FORMAT)
+                save_state(out_dir, state)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="見積・カタログ請求シートのエクスポート")
+    parser.add_argument("-o", "--out", default="exports", help="出力先ディレクトリ")
+    parser.add_argument("--sheet", choices=sorted(SHEETS), action="append", help="対象（既定はすべて）")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="既定は pyarrow があれば parquet、無ければ csv")
+    parser.add_argument("--full", action="store_true", help="ウォーターマークを無視して全件書き出す")
+    parser.add_argument("--page-rows", type=int, default=None, help=f"1 回に読む行数（既定 {EXPORT_PAGE_ROWS}）")
+    args = parser.parse_args(argv)
+
+    from Bro_shop_test import open_spreadsheet
+
+    results = run_export(open_spreadsheet(), args.out, args.sheet, args.format, args.full, args.page_rows)
+    for name, result in results.items():
+        where = result["path"] or "（新しい行なし）"
+        print(f"{name}: {result['rows']:,} 行 → {where}（{result['seconds']:.1f} 秒）")
+        for column, count in sorted(result["invalid"].items()):
+            print(f"  {column}: 数値・日時として読めない値が {count} 件（空欄として出力）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
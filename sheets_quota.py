@@ -0,0 +1,211 @@
+"""
+Google Sheets API のクォータ管理
+
+Sheets は「1分あたりの読み取り/書き込み回数」に上限があり、超えると 429 が返る。
+読み取り・書き込みそれぞれにトークンバケットを持ち、上限に達する前に
+呼び出し側を待たせる。429 / 5xx が返った場合はジッター付き指数バックオフで再試行する。
+
+優先度:
+    "write"   … 保存処理（書き込みと、その前提となる読み取り）。既定。
+    "prefill" … フォームの初期値読み込みなど、失敗しても致命的でない読み取り。
+                バケットの予備分（reserve）には手を付けず、待ち時間も短い。
+    "archive" … 月別アーカイブへの移動（バックグラウンド）。バケットの半分を Webhook 用に残し、
+                空くまでは長めに待つ。
+    "export"  … シートのエクスポート（sheet_export.py）。"archive" と同じ扱い。
+
+    with sheets_priority("prefill"):
+        rows = worksheet.get_all_records()
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from gspread.exceptions import APIError
+
+import metrics
+
+
+class SheetsQuotaExceeded(Exception):
+    """待ち時間の上限までにクォータが空かなかった"""
+
+
+# -----------------------
+# トークンバケット
+# -----------------------
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, reserve=0.0):
+        """
+        トークンを 1 つ取得する。取得できなければ、取得可能になるまでの秒数を返す
+        （取得できた場合は 0）。reserve 分のトークンは残したまま判定する。
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens - reserve >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 + reserve - self.tokens) / self.rate
+
+    def drain(self):
+        """サーバから 429 が返った場合、手元の見積りが楽観的すぎるので空にする"""
+        with self.lock:
+            self.tokens = 0.0
+            self.updated = time.monotonic()
+
+    def remaining(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+# -----------------------
+# クォータ予算
+# -----------------------
+READ_METHODS = frozenset([
+    "open_by_key", "worksheet", "worksheets", "get_all_values", "get_all_records",
+    "row_values", "col_values", "get", "batch_get", "acell", "cell",
+])
+WRITE_METHODS = frozenset([
+    "add_worksheet", "update", "append_row", "append_rows", "delete_rows", "batch_update",
+])
+
+PRIORITY_SETTINGS = {
+    # 優先度: (予備として残す割合, 待ち時間の上限秒)
+    "write": (0.0, 30.0),
+    "prefill": (0.2, 2.0),
+    "archive": (0.5, 120.0),
+    "export": (0.5, 120.0),
+}
+
+_priority = contextvars.ContextVar("sheets_priority", default="write")
+
+
+@contextmanager
+def sheets_priority(priority):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+QUOTA_REMAINING = metrics.gauge(
+    "sheets_quota_remaining", "Sheets クォータの残りトークン数（プロセスごと）", ["quota_class"]
+)
+QUOTA_WAIT = metrics.histogram(
+    "sheets_quota_wait_seconds", "クォータ待ちの時間（秒）", ["quota_class", "priority"]
+)
+QUOTA_REJECTED = metrics.counter(
+    "sheets_quota_rejected_total", "クォータ待ちの上限を超えて諦めた呼び出し数", ["quota_class", "priority"]
+)
+SHEETS_RETRIES = metrics.counter(
+    "sheets_retries_total", "429/5xx による再試行回数", ["quota_class", "status"]
+)
+
+
+class QuotaBudget:
+    def __init__(self, read_per_minute, write_per_minute, max_attempts=5, base_delay=1.0, max_delay=32.0):
+        self.buckets = {"read": TokenBucket(read_per_minute), "write": TokenBucket(write_per_minute)}
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        for quota_class, bucket in self.buckets.items():
+            QUOTA_REMAINING.set_function(bucket.remaining, quota_class=quota_class)
+
+    def acquire(self, quota_class):
+        priority = _priority.get()
+        reserve_ratio, max_wait = PRIORITY_SETTINGS.get(priority, PRIORITY_SETTINGS["write"])
+        bucket = self.buckets[quota_class]
+        reserve = bucket.capacity * reserve_ratio
+
+        started = time.monotonic()
+        while True:
+            wait = bucket.try_acquire(reserve)
+            if wait == 0:
+                break
+            if time.monotonic() - started + wait > max_wait:
+                QUOTA_REJECTED.inc(quota_class=quota_class, priority=priority)
+                raise SheetsQuotaExceeded(f"Sheets の{quota_class}クォータが不足しています（priority={priority}）")
+            time.sleep(wait)
+        QUOTA_WAIT.observe(time.monotonic() - started, quota_class=quota_class, priority=priority)
+
+    def backoff(self, attempt):
+        """フルジッター付き指数バックオフ"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, quota_class, func, *args, **kwargs):
+        for attempt in range(self.max_attempts):
+            self.acquire(quota_class)
+            try:
+                return func(*args, **kwargs)
+            except APIError as e:
+                status = getattr(e, "code", None) or getattr(getattr(e, "response", None), "status_code", 0)
+                retryable = status == 429 or (isinstance(status, int) and status >= 500)
+                if not retryable or attempt == self.max_attempts - 1:
+                    raise
+                if status == 429:
+                    self.buckets[quota_class].drain()
+                SHEETS_RETRIES.inc(quota_class=quota_class, status=status)
+                time.sleep(self.backoff(attempt))
+
+
+def _workers():
+    # gunicorn のワーカー数（WEB_CONCURRENCY）でプロジェクトのクォータを按分する
+    try:
+        return max(int(os.environ.get("WEB_CONCURRENCY", "1")), 1)
+    except ValueError:
+        return 1
+
+
+def budget_from_env():
+    workers = _workers()
+    read_quota = int(os.environ.get("SHEETS_READ_QUOTA_PER_MIN", "60"))
+    write_quota = int(os.environ.get("SHEETS_WRITE_QUOTA_PER_MIN", "60"))
+    return QuotaBudget(max(read_quota // workers, 1), max(write_quota // workers, 1))
+
+
+class QuotaAwareProxy:
+    """
+    gspread の Client / Spreadsheet / Worksheet をラップし、呼び出しごとに
+    クォータを消費・再試行する。戻り値が wrap_types のインスタンスならそれもラップする。
+    """
+
+    def __init__(self, target, budget, wrap_types=()):
+        self._target = target
+        self._budget = budget
+        self._wrap_types = tuple(wrap_types)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        if name in WRITE_METHODS:
+            quota_class = "write"
+        elif name in READ_METHODS:
+            quota_class = "read"
+        else:
+            return attr
+
+        def call(*args, **kwargs):
+            result = self._budget.call(quota_class, attr, *args, **kwargs)
+            if self._wrap_types and isinstance(result, self._wrap_types):
+                return QuotaAwareProxy(result, self._budget, self._wrap_types)
+            return result
+
+        return call
+
+    def __repr__(self):
+        return f"QuotaAwareProxy({self._target!r})"
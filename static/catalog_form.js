@@ -0,0 +1,23 @@
+let lastPostalCode = "";
+
+async function fetchAddress() {
+    let pcRaw = document.getElementById('postal_code').value.trim();
+    pcRaw = pcRaw.replace('-', '');
+    // keyup ごとに呼ばれるので、同じ郵便番号は引き直さない
+    if (pcRaw.length < 7 || pcRaw === lastPostalCode) {
+        return;
+    }
+    lastPostalCode = pcRaw;
+    try {
+        const response = await fetch(`/api/postal/${encodeURIComponent(pcRaw)}`);
+        if (!response.ok) {
+            return;
+        }
+        const data = await response.json();
+        const result = data.results[0];
+        // 都道府県・市区町村 部分だけを address_1 に自動入力
+        document.getElementById('address_1').value = result.prefecture + result.city + result.town;
+    } catch (error) {
+        console.log("住所検索失敗:", error);
+    }
+}
@@ -0,0 +1,62 @@
+(function () {
+const script = document.currentScript;
+const optionsUrl = script.dataset.optionsUrl;
+const version = script.dataset.optionsVersion;
+const STORAGE_KEY = "bro_shop_select_options";
+function loadCached() {
+try {
+const cached = JSON.parse(localStorage.getItem(STORAGE_KEY));
+if (cached && cached.version === version) {
+return cached.options;
+}
+} catch (e) {
+}
+return null;
+}
+function saveCached(options) {
+try {
+localStorage.setItem(STORAGE_KEY, JSON.stringify({ version: version, options: options }));
+} catch (e) {
+console.log("選択肢のキャッシュ保存失敗:", e);
+}
+}
+function fillSelects(options) {
+document.querySelectorAll("select[data-options]").forEach(function (select) {
+const values = options[select.dataset.options] || [];
+const kept = select.querySelector("option[selected]");
+const fragment = document.createDocumentFragment();
+values.forEach(function (value) {
+if (kept && String(value) === kept.value) {
+fragment.appendChild(kept);
+} else {
+fragment.appendChild(new Option(value, value));
+}
+});
+select.appendChild(fragment);
+if (kept) {
+kept.selected = true;
+}
+});
+}
+function start() {
+const cached = loadCached();
+if (cached) {
+fillSelects(cached);
+return;
+}
+fetch(optionsUrl)
+.then(function (response) { return response.json(); })
+.then(function (options) {
+fillSelects(options);
+saveCached(options);
+})
+.catch(function (error) {
+console.log("選択肢の取得失敗:", error);
+});
+}
+if (document.readyState === "loading") {
+document.addEventListener("DOMContentLoaded", start);
+} else {
+start();
+}
+})();
@@ -0,0 +1,657 @@
+document.addEventListener('DOMContentLoaded', function () {
+const draftBtn = document.getElementById('draftSubmit');
+const form = document.getElementById('orderForm');
+if (draftBtn && form) {
+draftBtn.addEventListener('click', function (e) {
+const requiredElements = form.querySelectorAll('[required]');
+requiredElements.forEach(el => el.removeAttribute('required'));
+form.submit();
+});
+}
+});
+const productTable = [
+{ productNo: "5927-01", productName: "ゲームシャツ", colorNo: "9816", colorName: "ホワイト/ホワイト/ブラック" },
+{ productNo: "5927-01", productName: "ゲームシャツ", colorNo: "9887", colorName: "レッド/ホワイト/ブラック" },
+{ productNo: "5927-01", productName: "ゲームシャツ", colorNo: "9889", colorName: "アイビーグリーン/ホワイト/ブラック" },
+{ productNo: "5927-01", productName: "ゲームシャツ", colorNo: "9888", colorName: "コバルトブルー/ホワイト/ブラック" },
+{ productNo: "5927-01", productName: "ゲームシャツ", colorNo: "9856", colorName: "ブラック/ホワイト/ブラック" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "1002", colorName: "ホワイト/ブラック" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "1095", colorName: "ホワイト/マリンブルー" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "2001", colorName: "ブラック/ホワイト" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "2002", colorName: "ブラック/ブラック" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "6901", colorName: "ラベンダー/ホワイト" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "6001", colorName: "ターコイズブルー/ホワイト" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "4801", colorName: "マリンブルー/ホワイト" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "4001", colorName: "ネイビー/ホワイト" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "2602", colorName: "カナリアイエロー/ブラック" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "6402", colorName: "オレンジ/ブラック" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "6601", colorName: "トロピカルピンク/ホワイト" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "5602", colorName: "レッド/ブラック" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "5801", colorName: "バーガンディ/ホワイト" },
+{ productNo: "5982-01", productName: "ドライベースボールシャツ", colorNo: "5001", colorName: "アイビーグリーン/ホワイト" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "001", colorName: "ホワイト" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "153", colorName: "シルバーグレー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "002", colorName: "グレー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "187", colorName: "ダークグレー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "005", colorName: "ブラック" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "133", colorName: "ライトブルー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "033", colorName: "サックス" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "034", colorName: "ターコイズブルー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "198", colorName: "ミディアムブルー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "032", colorName: "ロイヤルブルー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "171", colorName: "ジャパンブルー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "097", colorName: "インディゴ" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "027", colorName: "メロン" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "026", colorName: "ミントグリーン" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "096", colorName: "ミントブルー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "024", colorName: "ライトグリーン" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "155", colorName: "ライム" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "194", colorName: "ブライトグリーン" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "025", colorName: "グリーン" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "138", colorName: "アイビーグリーン" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "128", colorName: "オリーブ" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "037", colorName: "アーミーグリーン" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "167", colorName: "メトロブルー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "031", colorName: "ネイビー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "455", colorName: "ライトベージュ" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "134", colorName: "ライトイエロー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "020", colorName: "イエロー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "165", colorName: "デイジー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "015", colorName: "オレンジ" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "038", colorName: "サンセットオレンジ" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "132", colorName: "ライトピンク" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "011", colorName: "ピンク" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "146", colorName: "ホットピンク" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "010", colorName: "レッド" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "035", colorName: "ガーネットレッド" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "112", colorName: "バーガンディ" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "188", colorName: "ライトパープル" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "019", colorName: "ラベンダー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "014", colorName: "パープル" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "236", colorName: "コヨーテ" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "047", colorName: "蛍光イエロー" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "048", colorName: "蛍光オレンジ" },
+{ productNo: "300-ACT", productName: "ドライTシャツ", colorNo: "049", colorName: "蛍光ピンク" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "001", colorName: "ホワイト" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "002", colorName: "グレー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "187", colorName: "ダークグレー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "005", colorName: "ブラック" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "133", colorName: "ライトブルー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "033", colorName: "サックス" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "034", colorName: "ターコイズ" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "032", colorName: "ロイヤルブルー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "171", colorName: "ジャパンブルー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "167", colorName: "メトロブルー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "031", colorName: "ネイビー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "134", colorName: "ライトイエロー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "020", colorName: "イエロー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "165", colorName: "デイジー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "015", colorName: "オレンジ" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "038", colorName: "サンセットオレンジ" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "132", colorName: "ライトピンク" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "011", colorName: "ピンク" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "146", colorName: "ホットピンク" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "010", colorName: "レッド" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "035", colorName: "ガーネットレッド" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "112", colorName: "バーガンディ" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "024", colorName: "ライトグリーン" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "155", colorName: "ライム" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "025", colorName: "グリーン" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "037", colorName: "アーミーグリーン" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "026", colorName: "ミントグリーン" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "096", colorName: "ミントブルー" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "188", colorName: "ライトパープル" },
+{ productNo: "302-ADP", productName: "ドライポロシャツ", colorNo: "014", colorName: "パープル" },
+];
+const printColorOptions = [
+{ name: "ネーム＆背番号セット", attribute: "ネーム＆背番号セット" },
+{ name: "ネーム(大)", attribute: "ネーム(大)" },
+{ name: "ネーム(小)", attribute: "ネーム(小)" },
+{ name: "番号(大)", attribute: "番号(大)" },
+{ name: "番号(小)", attribute: "番号(小)" },
+{ name: "ホワイト", attribute: "レギュラーインク" },
+{ name: "ライトグレー", attribute: "レギュラーインク" },
+{ name: "ダークグレー", attribute: "レギュラーインク" },
+{ name: "ブラック", attribute: "レギュラーインク" },
+{ name: "サックス", attribute: "レギュラーインク" },
+{ name: "ブルー", attribute: "レギュラーインク" },
+{ name: "ネイビー", attribute: "レギュラーインク" },
+{ name: "ライトピンク", attribute: "レギュラーインク" },
+{ name: "ローズピンク", attribute: "レギュラーインク" },
+{ name: "ホットピンク", attribute: "レギュラーインク" },
+{ name: "レッド", attribute: "レギュラーインク" },
+{ name: "ワインレッド", attribute: "レギュラーインク" },
+{ name: "ミントグリーン", attribute: "レギュラーインク" },
+{ name: "エメラルドグリーン", attribute: "レギュラーインク" },
+{ name: "パステルイエロー", attribute: "レギュラーインク" },
+{ name: "イエロー", attribute: "レギュラーインク" },
+{ name: "ゴールドイエロー", attribute: "レギュラーインク" },
+{ name: "オレンジ", attribute: "レギュラーインク" },
+{ name: "イエローグリーン", attribute: "レギュラーインク" },
+{ name: "グリーン", attribute: "レギュラーインク" },
+{ name: "ダークグリーン", attribute: "レギュラーインク" },
+{ name: "ライトパープル", attribute: "レギュラーインク" },
+{ name: "パープル", attribute: "レギュラーインク" },
+{ name: "クリーム", attribute: "レギュラーインク" },
+{ name: "ライトブラウン", attribute: "レギュラーインク" },
+{ name: "ダークブラウン", attribute: "レギュラーインク" },
+{ name: "シルバー", attribute: "レギュラーインク" },
+{ name: "ゴールド", attribute: "レギュラーインク" },
+{ name: "グリッターシルバー", attribute: "オプションインク" },
+{ name: "グリッターゴールド", attribute: "オプションインク" },
+{ name: "グリッターブラック", attribute: "オプションインク" },
+{ name: "グリッターイエロー", attribute: "オプションインク" },
+{ name: "グリッターピンク", attribute: "オプションインク" },
+{ name: "グリッターレッド", attribute: "オプションインク" },
+{ name: "グリッターグリーン", attribute: "オプションインク" },
+{ name: "グリッターブルー", attribute: "オプションインク" },
+{ name: "グリッターパープル", attribute: "オプションインク" },
+{ name: "蛍光イエロー", attribute: "オプションインク" },
+{ name: "蛍光オレンジ", attribute: "オプションインク" },
+{ name: "蛍光ピンク", attribute: "オプションインク" },
+{ name: "蛍光グリーン", attribute: "オプションインク" }
+];
+const nameNumGroup = [
+"ネーム＆背番号セット",
+"ネーム(大)",
+"ネーム(小)",
+"番号(大)",
+"番号(小)"
+];
+const nameNumberSingleColors = [
+"ホワイト","グレー","ネイビー","ブラック","ライトブルー","ブルー","イエロー","オレンジ",
+"ピンク","ホットピンク","レッド","パープル","ライトグリーン","グリーン","シルバー","ゴールド",
+"グリッターシルバー","グリッターゴールド","グリッターピンク","グリッターピンク"
+];
+const nameNumberEdgeColors = [
+"ホワイト","グレー","ネイビー","ブラック","ライトブルー","ブルー","イエロー","オレンジ",
+"ピンク","ホットピンク","レッド","パープル","ライトグリーン","グリーン"
+];
+const productNameSelect = document.getElementById("productNameSelect");
+const productNoSelect   = document.getElementById("productNoSelect");
+const colorNameSelect   = document.getElementById("colorNameSelect");
+const colorNoSelect     = document.getElementById("colorNoSelect");
+function setProductNameOptions() {
+const names = Array.from(new Set(productTable.map(i=>i.productName)));
+productNameSelect.innerHTML = '<option value="">選択してください</option>';
+names.forEach(n => {
+const opt = document.createElement("option");
+opt.value = n;
+opt.textContent = n;
+productNameSelect.appendChild(opt);
+});
+}
+function setProductNoOptions() {
+const selectedName = productNameSelect.value;
+productNoSelect.innerHTML   = '<option value="">選択してください</option>';
+colorNameSelect.innerHTML   = '<option value="">選択してください</option>';
+colorNoSelect.innerHTML     = '<option value="">選択してください</option>';
+if (!selectedName) return;
+const nos = Array.from(
+new Set(
+productTable.filter(i=> i.productName === selectedName).map(i=> i.productNo)
+)
+);
+nos.forEach(n=>{
+const opt = document.createElement("option");
+opt.value = n;
+opt.textContent = n;
+productNoSelect.appendChild(opt);
+});
+}
+function setColorNameOptions() {
+const selectedName = productNameSelect.value;
+const selectedNo   = productNoSelect.value;
+colorNameSelect.innerHTML = '<option value="">選択してください</option>';
+colorNoSelect.innerHTML   = '<option value="">選択してください</option>';
+if(!selectedName || !selectedNo) return;
+const cNames = Array.from(
+new Set(
+productTable
+.filter(i=> i.productName===selectedName && i.productNo===selectedNo)
+.map(i=> i.colorName)
+)
+);
+cNames.forEach(cn => {
+const opt = document.createElement("option");
+opt.value = cn;
+opt.textContent = cn;
+colorNameSelect.appendChild(opt);
+});
+}
+function setColorNoOptions() {
+const selectedName    = productNameSelect.value;
+const selectedNo      = productNoSelect.value;
+const selectedCname   = colorNameSelect.value;
+colorNoSelect.innerHTML = '<option value="">選択してください</option>';
+if(!selectedName || !selectedNo || !selectedCname) return;
+const matches = productTable.filter(i=>
+i.productName===selectedName && i.productNo===selectedNo && i.colorName===selectedCname
+);
+matches.forEach(m => {
+const opt = document.createElement("option");
+opt.value = m.colorNo;
+opt.textContent = m.colorNo;
+colorNoSelect.appendChild(opt);
+});
+if(matches.length === 1) colorNoSelect.selectedIndex = 1;
+}
+function populatePrintColorSelects(baseId) {
+["1","2","3"].forEach(num=>{
+const selId = baseId + num;
+const sel = document.getElementById(selId);
+if(!sel) return;
+sel.innerHTML = `<option value="">${num}色目を選択</option>`;
+printColorOptions.forEach(col=>{
+const opt = document.createElement("option");
+opt.value = col.name;
+opt.textContent = col.name + (col.attribute==="オプションインク" ? " (オプション)" : "");
+sel.appendChild(opt);
+});
+});
+}
+function handlePrintColorChange(idx){
+const selects = document.querySelectorAll(
+`#printColorBox${idx} select`);
+const isNameNumber = [...selects].some(sel=>
+nameNumGroup.includes(sel.value));
+const box = document.getElementById(`nameNumberPrintColorBox${idx}`);
+const normalGroup = document.getElementById(`normalPrintGroup${idx}`);
+const designGroup = document.getElementById(`designGroup${idx}`);
+if(isNameNumber){
+box.classList.remove("hidden");
+if(normalGroup) normalGroup.classList.add("hidden");
+if(designGroup) designGroup.classList.add("hidden");
+} else {
+box.classList.add("hidden");
+if(normalGroup) normalGroup.classList.remove("hidden");
+if(designGroup) designGroup.classList.remove("hidden");
+}
+}
+function toggleEdgeColor(idx) {
+const radios = document.getElementsByName("nameNumberPrintType"+idx);
+let selected = "single";
+radios.forEach(r=>{ if(r.checked) selected=r.value; });
+const singleDiv = document.getElementById("singleColorSelectArea"+idx);
+const edgeDiv   = document.getElementById("edgeColorSelectArea"+idx);
+if(selected==="single"){
+singleDiv.classList.remove("hidden");
+edgeDiv.classList.add("hidden");
+} else {
+singleDiv.classList.add("hidden");
+edgeDiv.classList.remove("hidden");
+}
+}
+function changeEdgeType(idx) {
+const sel = document.getElementById("edgeType"+idx);
+const val = sel.value;
+const customArea = document.getElementById("edgeColorCustomArea"+idx);
+const textColor = document.getElementById("edgeCustomTextColor"+idx);
+const edge1 = document.getElementById("edgeCustomEdgeColor"+idx);
+const edge2 = document.getElementById("edgeCustomEdgeColor2_"+idx);
+if(val==="custom"){
+customArea.classList.remove("hidden");
+textColor.value="";
+edge1.value="";
+edge2.value="";
+} else {
+customArea.classList.add("hidden");
+switch(val){
+case "FT-1":
+textColor.value="ブラック"; edge1.value="ブラック"; edge2.value="";
+break;
+case "FT-2":
+textColor.value="ホワイト"; edge1.value="ブラック"; edge2.value="";
+break;
+case "FT-3":
+textColor.value="レッド"; edge1.value="ブラック"; edge2.value="";
+break;
+case "FT-4":
+textColor.value="パープル"; edge1.value="イエロー"; edge2.value="";
+break;
+case "FT-5":
+textColor.value="ブラック"; edge1.value="ホワイト"; edge2.value="ブラック";
+break;
+case "FT-6":
+textColor.value="レッド"; edge1.value="ホワイト"; edge2.value="ブラック";
+break;
+case "FT-7":
+textColor.value="ブルー"; edge1.value="ホワイト"; edge2.value="ブルー";
+break;
+case "FT-8":
+textColor.value="ブルー"; edge1.value="ホワイト"; edge2.value="レッド";
+break;
+}
+}
+}
+function handleFontRadio(idx) {
+const eRadio = document.querySelector(`input[name="fontType${idx}"][value="E"]`);
+const prefix = document.getElementById("fontPrefix"+idx);
+if(eRadio && eRadio.checked){
+prefix.textContent = "E-";
+} else {
+prefix.textContent = "J-";
+}
+}
+function toggleCustomSize(idx){
+const sel = document.getElementById("designSize"+idx);
+const cDiv = document.getElementById("customSizeInput"+idx);
+if(sel.value==="custom"){
+cDiv.classList.remove("hidden");
+} else {
+cDiv.classList.add("hidden");
+}
+}
+function calculateTotal(){
+const sizeIds = ["size150","sizeSS","sizeS","sizeM","sizeL","sizeXL","sizeXXL"];
+let total=0;
+sizeIds.forEach(id=>{
+const val = parseInt(document.getElementById(id).value)||0;
+total+=val;
+});
+document.getElementById("totalQuantity").value = total;
+}
+let printLocationCount = 1;
+function addPrintLocation(){
+if(printLocationCount>=4){
+alert("最大4ヵ所までです。");
+return;
+}
+printLocationCount++;
+const idx = printLocationCount;
+const html = `
+      <fieldset id="printLocation${idx}">
+        <legend style="display:flex;justify-content:space-between;align-items:center;">
+        <span>${idx}ヵ所目のプリント設定</span>
+        <!-- 削除ボタン -->
+<button type="button"
+           class="del-btn"
+            onclick="removePrintLocation(${idx})">
+      ✕ 削除
+    </button>
+  </legend>
+        <div class="sub-group">
+          <label for="printPositionNo${idx}">プリント位置No.</label>
+          <select id="printPositionNo${idx}" name="printPositionNo${idx}">
+            <option value="">選択</option>
+            <option value="1">1</option>
+            <option value="2">2</option>
+            <option value="3">3</option>
+            <option value="4">4</option>
+            <option value="5">5</option>
+            <option value="6">6</option>
+            <option value="7">7</option>
+          </select>
+        </div>
+                  <div class="sub-group" id="designGroup${idx}">
+            <label for="designCode${idx}">デザイン (例: D-001)
+            <!-- ▼ 追加 ▼ -->
+            <a href="https://saas.actibookone.com/content/detail?param=eyJjb250ZW50TnVtIjo1Njk0OTd9&detailFlg=1&pNo=18"
+              target="_blank"
+              style="margin-left:.4em; font-size:.8em; color:#4a8fd8;">カタログ</a>
+            <!-- ▲ 追加 ▲ -->
+              </label>
+            <div style="display:flex; gap:0.3em;">
+              <span>D-</span>
+              <input type="text" id="designCode${idx}" name="designCode${idx}" maxlength="3" style="width:4em;" placeholder="3桁">
+            </div>
+        </div>
+        <!-- ネーム＆番号プリントカラーオプション -->
+        <div id="nameNumberPrintColorBox${idx}" class="sub-group hidden" style="border:1px solid #ccc; padding:0.5em;">
+          <strong>ネーム・番号プリントカラーオプション</strong>
+          <button type="button"
+           class="back-btn"
+           onclick="backToNormalPrint(${idx})">
+           ← 通常のプリント設定に戻る
+          </button>
+          <div class="inline-flex mt1 mb1">
+            <label><input type="radio" name="nameNumberPrintType${idx}" value="single" checked onclick="toggleEdgeColor(${idx})"> 単色</label>
+            <label><input type="radio" name="nameNumberPrintType${idx}" value="edge" onclick="toggleEdgeColor(${idx})"> フチ付き</label>
+          </div>
+          <div id="singleColorSelectArea${idx}" class="sub-group">
+            <label>単色カラー</label>
+            <select id="singleColor${idx}" name="singleColor${idx}"></select>
+          </div>
+          <div id="edgeColorSelectArea${idx}" class="sub-group hidden">
+            <label>フチ付きタイプ</label>
+            <select id="edgeType${idx}" name="edgeType${idx}" onchange="changeEdgeType(${idx})">
+              <option value="">選択してください</option>
+              <option value="FT-1">FT-1 (文字色ブラック、フチ色1ブラック)</option>
+              <option value="FT-2">FT-2 (文字色ホワイト、フチ色1ブラック)</option>
+              <option value="FT-3">FT-3 (文字色レッド、フチ色1ブラック)</option>
+              <option value="FT-4">FT-4 (文字色パープル、フチ色1イエロー)</option>
+              <option value="FT-5">FT-5 (文字色ブラック、フチ色1ホワイト、フチ色2ブラック)</option>
+              <option value="FT-6">FT-6 (文字色レッド、フチ色1ホワイト, フチ色2ブラック)</option>
+              <option value="FT-7">FT-7 (文字色ブルー、フチ色1ホワイト、フチ色2ブルー)</option>
+              <option value="FT-8">FT-8 (文字色ブルー、フチ色1ホワイト、フチ色2レッド)</option>
+              <option value="custom">カスタム</option>
+            </select>
+            <div id="edgeColorCustomArea${idx}" class="hidden" style="margin-top:0.5em;">
+              <label>文字色</label>
+              <select id="edgeCustomTextColor${idx}" name="edgeCustomTextColor${idx}"></select>
+              <label>フチ色1</label>
+              <select id="edgeCustomEdgeColor${idx}" name="edgeCustomEdgeColor${idx}"></select>
+              <label>フチ色2 (任意)</label>
+              <select id="edgeCustomEdgeColor2_${idx}" name="edgeCustomEdgeColor2_${idx}"></select>
+            </div>
+          </div>
+          <div class="sub-group mt1">
+            <label>フォント選択</label>
+            <div class="inline-flex mb1">
+              <label><input type="radio" name="fontType${idx}" value="E" checked> 英数字対応 (E-)</label>
+              <label><input type="radio" name="fontType${idx}" value="J"> 日本語対応 (J-)</label>
+            </div>
+            <div class="inline-flex">
+              <span id="fontPrefix${idx}">E-</span>
+              <input type="text" id="fontNumber${idx}" name="fontNumber${idx}" maxlength="2" style="width:3em;" placeholder="00">
+            </div>
+          </div>
+        </div>
+
+        <!-- ▼▼▼ ここで normalPrintGroup${idx} を追加 ▼▼▼ -->
+        <div id="normalPrintGroup${idx}">
+          <div class="sub-group">
+          <label>
+            プリントカラー・オプション
+            <!-- ▼ ここを追加 ▼ -->
+            <a href="https://saas.actibookone.com/content/detail?param=eyJjb250ZW50TnVtIjo1Njk0OTd9&detailFlg=1&pNo=13"
+              target="_blank"
+              style="margin-left:.4em; font-size:.8em; color:#4a8fd8;">カタログ</a>
+            <!-- ▲ 追加ここまで ▲ -->
+          </label>
+            <!-- ★ 新しい color-box とボタン -->
+            <div id="printColorBox${idx}" class="color-box"></div>
+
+            <button type="button"
+                    class="add-color-btn"
+                    onclick="addColorSelect(${idx})">
+              ＋色を追加
+          　</button>
+            <select name="fullColorSize${idx}" class="full-color-select">
+              <option value="">フルカラーの場合はこちらを選択</option>
+              <option value="S">フルカラー(小)</option>
+              <option value="M">フルカラー(中)</option>
+              <option value="L">フルカラー(大)</option>
+            </select>
+          </div>
+          <div class="sub-group">
+            <label>デザインサイズ</label>
+            <select name="designSize${idx}" id="designSize${idx}" onchange="toggleCustomSize(${idx})">
+              <option value="max">プリント位置最大</option>
+              <option value="custom">任意のサイズ</option>
+            </select>
+            <div id="customSizeInput${idx}" class="hidden">
+              <label>X(cm)</label>
+              <input type="number" name="designSizeX${idx}" min="0" step="0.1" style="width:5em;">
+              <label>Y(cm)</label>
+              <input type="number" name="designSizeY${idx}" min="0" step="0.1" style="width:5em;">
+            </div>
+          </div>
+        </div>
+      </fieldset>
+    `;
+const container = document.getElementById("additionalPrintLocations");
+const div = document.createElement("div");
+div.innerHTML = html;
+container.appendChild(div);
+fillNameNumberColors(`singleColor${idx}`, nameNumberSingleColors);
+fillNameNumberColors(`edgeCustomTextColor${idx}`, nameNumberEdgeColors);
+fillNameNumberColors(`edgeCustomEdgeColor${idx}`, nameNumberEdgeColors);
+fillNameNumberColors(`edgeCustomEdgeColor2_${idx}`, nameNumberEdgeColors);
+const fontRadios = document.getElementsByName(`fontType${idx}`);
+fontRadios.forEach(r=>{
+r.addEventListener("change",()=>handleFontRadio(idx));
+});
+initFirstColor(idx);
+}
+function removePrintLocation(idx){
+if(!confirm("このプリント箇所を削除しますか？")) return;
+const fs = document.getElementById(`printLocation${idx}`);
+if(fs){
+fs.parentNode.removeChild(fs);
+printLocationCount = document.querySelectorAll('fieldset[id^="printLocation"]').length;
+}
+}
+function fillNameNumberColors(selectId, colorArray){
+const el = document.getElementById(selectId);
+if(!el) return;
+el.innerHTML = '<option value="">選択してください</option>';
+colorArray.forEach(c=>{
+const opt = document.createElement("option");
+opt.value = c;
+opt.textContent = c;
+el.appendChild(opt);
+});
+}
+const MAX_COLORS = 3;
+function buildColorSelect(idx, no){
+const sel = document.createElement('select');
+sel.name  = `printColorOption${idx}_${no}`;
+sel.id    = `printColorOption${idx}_${no}`;
+sel.onchange = ()=>handlePrintColorChange(idx);
+sel.innerHTML = `<option value="">${no}色目を選択</option>`;
+printColorOptions.forEach(col=>{
+const opt = document.createElement('option');
+opt.value = col.name;
+opt.textContent =
+col.name + (col.attribute==="オプションインク" ? " (オプション)" : "");
+sel.appendChild(opt);
+});
+return sel;
+}
+function initFirstColor(idx){
+const box = document.getElementById(`printColorBox${idx}`);
+box.innerHTML = '';
+box.appendChild(buildColorSelect(idx,1));
+}
+function addColorSelect(idx){
+const box  = document.getElementById(`printColorBox${idx}`);
+const next = box.children.length + 1;
+if(next > MAX_COLORS) return;
+box.appendChild(buildColorSelect(idx, next));
+if(next === MAX_COLORS){
+document.querySelector(`#printLocation${idx} .add-color-btn`).disabled = true;
+}
+}
+function autoFillAddress(){
+const zip = document.getElementById("zipCode").value.trim();
+if(!zip) return;
+fetch('/api/postal/' + encodeURIComponent(zip))
+.then(response => response.json())
+.then(data => {
+if(data.results && data.results.length > 0) {
+const result = data.results[0];
+const fullAddress = result.prefecture + result.city + result.town;
+document.getElementById("address1").value = fullAddress;
+} else {
+alert("該当する住所が見つかりませんでした。");
+}
+})
+.catch(err => {
+console.error(err);
+alert("住所検索に失敗しました。");
+});
+}
+window.addEventListener("DOMContentLoaded", function () {
+setProductNameOptions();
+document.getElementById("productNameSelect").value = initialData.productName;
+setProductNoOptions();
+document.getElementById("productNoSelect").value = initialData.productNo;
+setColorNameOptions();
+document.getElementById("colorNameSelect").value = initialData.colorName;
+setColorNoOptions();
+document.getElementById("colorNoSelect").value = initialData.colorNo;
+if (initialData.printPositionNo1) {
+document.getElementById("printPositionNo1").value = initialData.printPositionNo1;
+}
+document.getElementById("size150").value = initialData.size150;
+document.getElementById("sizeSS").value = initialData.sizeSS;
+document.getElementById("sizeS").value = initialData.sizeS;
+document.getElementById("sizeM").value = initialData.sizeM;
+document.getElementById("sizeL").value = initialData.sizeL;
+document.getElementById("sizeXL").value = initialData.sizeXL;
+document.getElementById("sizeXXL").value = initialData.sizeXXL;
+document.getElementById("totalQuantity").value = initialData.totalQuantity;
+document.getElementById("deliveryDate").value = initialData.deliveryDate;
+document.getElementById("useDate").value = initialData.useDate;
+document.getElementById("applicationDate").value = initialData.applicationDate;
+document.getElementById("discountOption").value = initialData.discountOption;
+document.getElementById("schoolName").value = initialData.schoolName;
+document.getElementById("lineName").value = initialData.lineName;
+document.getElementById("classGroupName").value = initialData.classGroupName;
+document.getElementById("zipCode").value = initialData.zipCode;
+document.getElementById("address1").value = initialData.address1;
+document.getElementById("address2").value = initialData.address2;
+document.getElementById("addresseeName").value = initialData.addresseeName;
+document.getElementById("schoolTel").value = initialData.schoolTel;
+document.getElementById("representativeName").value = initialData.representativeName;
+document.getElementById("representativeTel").value = initialData.representativeTel;
+document.getElementById("representativeEmail").value = initialData.representativeEmail;
+document.getElementById("designCheckMethod").value = initialData.designCheckMethod;
+document.getElementById("paymentMethod").value = initialData.paymentMethod;
+calculateTotal();
+productNameSelect.addEventListener("change", function() {
+setProductNoOptions();
+productNoSelect.value = "";
+setColorNameOptions();
+colorNameSelect.value = "";
+setColorNoOptions();
+colorNoSelect.value = "";
+});
+productNoSelect.addEventListener("change", function() {
+setColorNameOptions();
+colorNameSelect.value = "";
+setColorNoOptions();
+colorNoSelect.value = "";
+});
+colorNameSelect.addEventListener("change", function() {
+setColorNoOptions();
+colorNoSelect.value = "";
+});
+const fontRadios1 = document.getElementsByName("fontType1");
+fontRadios1.forEach(r=>{
+r.addEventListener("change",()=>handleFontRadio(1));
+});
+const draftBtn = document.getElementById('draftSubmit');
+const form = document.getElementById('orderForm');
+if (draftBtn && form) {
+draftBtn.addEventListener('click', function (e) {
+const requiredElements = form.querySelectorAll('[required]');
+requiredElements.forEach(el => el.removeAttribute('required'));
+form.submit();
+});
+}
+});
+window.addEventListener('pageshow', () => {
+setProductNoOptions();
+setColorNameOptions();
+setColorNoOptions();
+calculateTotal();
+});
+(function () {
+const params = new URLSearchParams(window.location.search);
+const uid = params.get('uid');
+if (uid) {
+document.getElementById('lineUserId').value = uid;
+}
+})();
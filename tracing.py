@@ -0,0 +1,287 @@
+"""
+軽量トレーシング（スパン単位の処理時間記録）
+
+    with start_span("estimate.calculate", user_id=user_id):
+        ...
+    add_trace_attributes(quote_no=quote_number)  # トレース内の全スパンに付与
+
+環境変数:
+    TRACE_EXPORTER       "jsonl" / "otlp" / 未設定（無効）
+    TRACE_JSONL_PATH     jsonl の出力先（既定: traces.jsonl）
+    TRACE_OTLP_ENDPOINT  OTLP/HTTP(JSON) の送信先（既定: http://localhost:4318/v1/traces）
+    TRACE_SAMPLE_RATE    ルートスパンのサンプリング率 0.0〜1.0（既定: 1.0）
+
+ルートスパンが終了した時点で、そのトレースのスパンをまとめて出力する。
+サンプリング対象外のトレースでは子スパンも何もしない。
+
+ローカル確認用に、OTLP を受けて jsonl に書き出すだけの簡易コレクタも起動できる:
+    python tracing.py collect --port 4318 --out spans.jsonl
+"""
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+SERVICE_NAME = "bro-shop-line-bot"
+
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = "OK"
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": {**self.trace.attributes, **self.attributes},
+        }
+
+
+class _Trace:
+    __slots__ = ("trace_id", "attributes", "spans")
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.attributes = {}
+        self.spans = []
+
+
+class _NoopSpan:
+    """サンプリング対象外のトレースで使う何もしないスパン"""
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP = _NoopSpan()
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+# -----------------------
+# 出力先
+# -----------------------
+class JsonlExporter:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        lines = "".join(json.dumps(span.to_dict(), ensure_ascii=False) + "\n" for span in spans)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class OtlpHttpExporter:
+    """
+    OTLP/HTTP(JSON) 形式で送信する。Webhook を待たせないよう、送信は別スレッドで行う。
+    """
+
+    def __init__(self, endpoint, timeout=3.0, max_queue=1000):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        threading.Thread(target=self._worker, name="otlp-exporter", daemon=True).start()
+
+    def export(self, spans):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            # 送信が詰まっている場合は捨てる（本処理を優先）
+            pass
+
+    def _worker(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                requests.post(self.endpoint, json=to_otlp(spans), timeout=self.timeout)
+            except Exception as e:
+                print("トレース送信エラー:", e)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans):
+    otlp_spans = []
+    for span in spans:
+        d = span.to_dict()
+        otlp_spans.append({
+            "traceId": d["trace_id"],
+            "spanId": d["span_id"],
+            "parentSpanId": d["parent_id"] or "",
+            "name": d["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(d["start_ns"]),
+            "endTimeUnixNano": str(d["end_ns"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in d["attributes"].items()],
+            "status": {"code": 1 if d["status"] == "OK" else 2},
+        })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": otlp_spans}],
+        }]
+    }
+
+
+def _exporter_from_env():
+    kind = os.environ.get("TRACE_EXPORTER", "").lower()
+    if kind == "jsonl":
+        return JsonlExporter(os.environ.get("TRACE_JSONL_PATH", "traces.jsonl"))
+    if kind == "otlp":
+        return OtlpHttpExporter(os.environ.get("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+    return None
+
+
+_exporter = _exporter_from_env()
+_sample_rate = float(os.environ.get("TRACE_SAMPLE_RATE", "1.0"))
+
+
+def configure(exporter=None, sample_rate=None):
+    """
+    出力先・サンプリング率を差し替える（ベンチマーク・検証用）
+    """
+    global _exporter, _sample_rate
+    _exporter = exporter
+    if sample_rate is not None:
+        _sample_rate = sample_rate
+
+
+# -----------------------
+# スパン操作
+# -----------------------
+@contextmanager
+def start_span(name, **attributes):
+    parent = _current_span.get()
+    if parent is _NOOP:
+        yield _NOOP
+        return
+
+    if parent is None:
+        # ルートスパン：ここでサンプリングを決める
+        if _exporter is None or random.random() >= _sample_rate:
+            token = _current_span.set(_NOOP)
+            try:
+                yield _NOOP
+            finally:
+                _current_span.reset(token)
+            return
+        trace, parent_id = _Trace(), None
+    else:
+        trace, parent_id = parent.trace, parent.span_id
+
+    span = Span(trace, name, parent_id, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except Exception as e:
+        span.status = "ERROR"
+        span.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span.end_ns = time.time_ns()
+        _current_span.reset(token)
+        trace.spans.append(span)
+        if parent is None:
+            try:
+                _exporter.export(trace.spans)
+            except Exception as e:
+                print("トレース出力エラー:", e)
+
+
+def add_trace_attributes(**attributes):
+    """
+    実行中のトレース全体（出力される全スパン）に属性を付与する
+    """
+    span = _current_span.get()
+    if span is not None and span is not _NOOP:
+        span.trace.attributes.update(attributes)
+
+
+def traced(name):
+    """
+    関数全体を 1 つのスパンとして記録するデコレータ
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# -----------------------
+# 簡易 OTLP コレクタ（ローカル確認用）
+# -----------------------
+def run_collector(port, out_path):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    lock = threading.Lock()
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            payload = json.loads(body or b"{}")
+            lines = []
+            for resource_spans in payload.get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for span in scope_spans.get("spans", []):
+                        lines.append(json.dumps(span, ensure_ascii=False) + "\n")
+            with lock, open(out_path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"OTLP コレクタ起動: http://localhost:{port}/v1/traces → {out_path}")
+    ThreadingHTTPServer(("0.0.0.0", port), CollectorHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OTLP/HTTP(JSON) を受けて jsonl に書き出す簡易コレクタ")
+    parser.add_argument("command", choices=["collect"])
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--out", default="spans.jsonl")
+    args = parser.parse_args()
+    sys.exit(run_collector(args.port, args.out))
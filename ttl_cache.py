@@ -0,0 +1,107 @@
+"""
+有効期限（TTL）と件数上限つきのインメモリキャッシュ
+
+プロセス（gunicorn ワーカー）ごとに保持する。ヒット/ミス数は /metrics に出力する。
+
+    cache = TTLCache("quotation_prefill", maxsize=512, ttl=60)
+    data = cache.get_or_load(quote_no, load_quotation_prefill)
+    cache.invalidate(quote_no)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+CACHE_REQUESTS = metrics.counter("cache_requests_total", "キャッシュの参照数", ["cache", "result"])
+CACHE_SIZE = metrics.gauge("cache_entries", "キャッシュの保持件数", ["cache"])
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, name, maxsize=512, ttl=60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # { key: (期限, 値) }（末尾ほど最近使われた）
+        self._lock = threading.Lock()
+        self._loading = {}  # { key: 読み込み中の目印 }（読み込み中に invalidate されたら消える）
+        self.hits = 0
+        self.misses = 0
+        CACHE_SIZE.set_function(lambda: len(self._data), cache=name)
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires, value = entry
+                if expires > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                    return value
+                del self._data[key]
+            self.misses += 1
+        CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        return default
+
+    def _store(self, key, value):
+        # self._lock を取った状態で呼ぶ
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key, loader, cache_if=bool):
+        """
+        キャッシュにあればそれを返し、なければ loader(key) の結果を保存して返す。
+        cache_if(value) が偽の値（既定では空の結果）は保存しない。
+        読み込み中に invalidate / clear された場合は、古い可能性があるので保存しない。
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        marker = object()
+        with self._lock:
+            self._loading[key] = marker
+        keep = False
+        try:
+            value = loader(key)
+            keep = cache_if(value)
+        finally:
+            with self._lock:
+                # 同じキーを後から読み込み始めたスレッドがあれば、保存はそちらに任せる
+                if self._loading.get(key) is marker:
+                    del self._loading[key]
+                    if keep:
+                        self._store(key, value)
+        return value
+
+    def items(self):
+        """期限内の (キー, 値) の一覧（参照数には数えない）"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (expires, value) in self._data.items() if expires > now]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._loading.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._loading.clear()
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self):
+        return len(self._data)